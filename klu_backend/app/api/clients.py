@@ -0,0 +1,80 @@
+"""
+Identidad del cliente (comercio) que llama a la API: identifica sus límites
+de creación, la shard de sus lotes y el alcance de sus claves de
+idempotencia.
+"""
+import functools
+import hashlib
+import ipaddress
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+
+
+@functools.cache
+def api_keys() -> dict[str, str]:
+    """sha256 de cada API key de API_KEYS → id del cliente"""
+    keys = {}
+    for entry in settings.API_KEYS.split(","):
+        client, _, digest = entry.partition(":")
+        if client.strip() and digest.strip():
+            keys[digest.strip().lower()] = client.strip()
+    return keys
+
+
+@functools.cache
+def trusted_proxies() -> tuple:
+    return tuple(
+        ipaddress.ip_network(network.strip(), strict=False)
+        for network in settings.TRUSTED_PROXIES.split(",")
+        if network.strip()
+    )
+
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies())
+
+
+def client_ip(request: Request) -> str:
+    """
+    IP del cliente. Si la conexión viene de un proxy de TRUSTED_PROXIES se
+    toma de X-Forwarded-For la última dirección que no es un proxy de
+    confianza: las anteriores las escribe el propio cliente.
+    """
+    host = request.client.host if request.client else "unknown"
+    if not is_trusted_proxy(host):
+        return host
+    forwarded = request.headers.get("x-forwarded-for", "")
+    for address in reversed([part.strip() for part in forwarded.split(",")]):
+        if not address:
+            continue
+        if not is_trusted_proxy(address):
+            return address
+        host = address
+    return host
+
+
+def client_key(request: Request) -> str:
+    """
+    Cliente que envía la petición: el de su API key si está en API_KEYS o,
+    sin ella, su IP. Sin API_KEYS configuradas la cabecera se ignora: un
+    valor inventado no abre otro límite.
+
+    Raises:
+        HTTPException: 401 si la API key no está en API_KEYS
+    """
+    api_key = request.headers.get(settings.RATE_LIMIT_API_KEY_HEADER)
+    keys = api_keys()
+    if api_key and keys:
+        client = keys.get(hashlib.sha256(api_key.encode("utf-8")).hexdigest())
+        if client is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key"
+            )
+        return f"key:{client}"
+    return f"ip:{client_ip(request)}"
@@ -1,30 +1,130 @@
-import logging
+import asyncio
+import csv
+import io
+import json
+import math
 import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Literal, Optional
 
-from app.db.session import get_db
-from app.models.transaction import Transaction
-from app.repositories.transaction_repository import TransactionRepository
+from app.api.clients import client_key
+from app.core.config import settings
+from app.core.correlation import set_transaction_id
+from app.db.async_session import AsyncSessionLocal, get_async_db
+from app.models.transaction import (
+    NON_TERMINAL_STATUSES,
+    Transaction,
+    TransactionStatus,
+    utcnow,
+)
+from app.repositories.transaction_repository import (
+    AsyncTransactionRepository,
+    InvalidCursorError,
+)
+from app.repositories.transaction_stats_repository import (
+    AsyncTransactionStatsRepository,
+)
 from app.schemas.transaction import (
+    BatchItemResult,
+    BatchTransactionResponse,
     CardPaymentRequest,
+    StatusTotals,
     TransactionCreate,
     TransactionCreateResponse,
+    TransactionStatsBucketResponse,
+    TransactionStatsResponse,
+)
+from app.schemas.serialization import (
+    dump_transaction,
+    dump_transaction_row,
+    dump_transaction_rows,
+)
+from app.services.card_bins import CardBinLookup
+from app.services.card_data import CardVault
+from app.services.idempotency import IdempotencyStore
+from app.services.outbox import OutboxRelay
+from app.services.rate_limiter import (
+    RateLimitExceeded,
+    TokenBucketRateLimiter,
+    transaction_buckets,
+)
+from app.services.transaction_cache import TransactionCache
+from app.services.transaction_events import TransactionEventBroker
+from app.services.transaction_stats import (
+    HOUR,
+    MINUTE,
+    TransactionStatsTracker,
+    as_utc,
+    hour_bucket,
+    minute_bucket,
+)
+from app.tasks.lanes import INTERACTIVE, bulk_queue, lane_queue
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
 )
-from app.services.blumonpay_service import BlumonpayService
-from app.tasks.payment_tasks import process_payment
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from redis.exceptions import RedisError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter()
-transaction_repo = TransactionRepository()
-blumonpay_service = BlumonpayService()
+transaction_repo = AsyncTransactionRepository(stats=TransactionStatsTracker())
+stats_repo = AsyncTransactionStatsRepository()
+idempotency_store = IdempotencyStore()
+rate_limiter = TokenBucketRateLimiter()
+transaction_cache = TransactionCache()
+event_broker = TransactionEventBroker()
+outbox_relay = OutboxRelay(AsyncSessionLocal)
+card_bin_lookup = CardBinLookup()
+card_vault = CardVault()
 
 
 @router.post(
     "/", response_model=TransactionCreateResponse, status_code=status.HTTP_201_CREATED
 )
 async def create_transaction(
-    payment_data: CardPaymentRequest, db: Session = Depends(get_db)
+    request: Request,
+    payment_data: CardPaymentRequest,
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", max_length=255
+    ),
+    db: AsyncSession = Depends(get_async_db),
 ):
+    client = client_key(request)
+    request_hash = None
+    if idempotency_key:
+        request_hash = idempotency_store.hash_request(
+            payment_data.model_dump(mode='json')
+        )
+        cached = await idempotency_store.get(client, idempotency_key)
+        if cached:
+            check_idempotent_request(cached["request_hash"], request_hash)
+            return transaction_response(cached["body"], replayed=True)
+
+    # Antes de escribir en la base de datos o publicar en la cola; una
+    # respuesta repetida por Idempotency-Key no consume tokens
+    await check_rate_limit(client, [payment_data.customerInformation.email])
+
+    # Después del límite: un BIN que no está en la caché se consulta en la
+    # base de datos. Una marca o tipo no aceptado se rechaza sin cobrarlo
+    card_bin = await card_bin_lookup.lookup(
+        db, payment_data.noPresentCardData.cardNumber
+    )
+    rejection = card_bin_lookup.rejection(card_bin)
+    if rejection:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=rejection
+        )
+
     payload = payment_data.model_dump(
         exclude={"noPresentCardData"},
     )
@@ -32,27 +132,471 @@ async def create_transaction(
     transaction_data = TransactionCreate(
         **payload
     )
+    (sealed_payment,) = await seal_cards([payment_data])
+
+    try:
+        transaction: Transaction = await transaction_repo.create_transaction(
+            db=db,
+            transaction=transaction_data,
+            idempotency_key=idempotency_key,
+            request_hash=request_hash,
+            # El cargo se publica desde la outbox, fuera de la petición
+            payment_data=sealed_payment,
+            queue=lane_queue(INTERACTIVE),
+            card_bin=card_bin,
+            client_key=client,
+            idempotency_ttl=timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+        )
+    except IntegrityError:
+        # Otra petición con la misma clave ganó la carrera (o Redis la olvidó)
+        await db.rollback()
+        await card_vault.discard_many([sealed_payment])
+        record = await transaction_repo.get_idempotency_key(
+            db, client, idempotency_key
+        )
+        if record is None:
+            raise
+        check_idempotent_request(record.request_hash, request_hash)
+        transaction = await transaction_repo.get_transaction(db, record.transaction_id)
+        body = dump_transaction(transaction).decode()
+        return transaction_response(body, replayed=True)
+
+    set_transaction_id(transaction.id)
+    outbox_relay.notify()
+
+    # Mismo JSON que GET /transactions/{id}
+    body = dump_transaction(transaction).decode()
+    if idempotency_key:
+        await idempotency_store.save(client, idempotency_key, request_hash, body)
+    return transaction_response(body)
+
+
+async def check_rate_limit(client: str, customer_emails: list[str]):
+    try:
+        await rate_limiter.acquire(transaction_buckets(client, customer_emails))
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many transactions for this {e.scope}",
+            headers={"Retry-After": str(max(math.ceil(e.retry_after), 1))},
+        )
+
+
+async def seal_cards(payments: list[CardPaymentRequest]) -> list[dict]:
+    """
+    Guarda las tarjetas en Redis (CardVault) y devuelve los `payment_data`
+    enmascarados que van a la outbox. Sin Redis el cargo no podría cobrarse:
+    se rechaza antes de crear la transacción.
+    """
+    try:
+        return await card_vault.seal_many(
+            [payment.model_dump(mode='json') for payment in payments]
+        )
+    except RedisError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Payments are temporarily unavailable, retry later",
+            headers={"Retry-After": "1"},
+        )
+
+
+def check_idempotent_request(stored_hash: str, request_hash: str):
+    if stored_hash != request_hash:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request",
+        )
+
+
+def transaction_response(body: str, replayed: bool = False) -> Response:
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return Response(
+        content=body,
+        status_code=status.HTTP_201_CREATED,
+        media_type="application/json",
+        headers=headers,
+    )
 
-    transaction: Transaction = transaction_repo.create_transaction(
+
+@router.post(
+    "/batch",
+    response_model=BatchTransactionResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_transaction_batch(
+    request: Request,
+    items: list[dict[str, Any]] = Body(...),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Crea varias transacciones en una sola petición. Cada elemento se valida
+    por separado: los inválidos y los de una marca o tipo de tarjeta no
+    aceptado se reportan con sus errores y el resto se inserta en un solo
+    INSERT; el relay de la outbox los publica en bloques.
+    """
+    client = client_key(request)
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"A batch accepts at most {settings.BATCH_MAX_ITEMS} items",
+        )
+
+    results: list[BatchItemResult] = []
+    valid: list[tuple[int, CardPaymentRequest]] = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, CardPaymentRequest.model_validate(item)))
+        except ValidationError as e:
+            # Sin `input` para no devolver datos de tarjeta en la respuesta
+            errors = json.loads(e.json(include_url=False, include_input=False))
+            results.append(BatchItemResult(index=index, errors=errors))
+
+    if not valid:
+        raise batch_rejected(results)
+
+    # Cada cargo válido cuenta; si falta un token el lote completo se rechaza
+    await check_rate_limit(
+        client, [payment.customerInformation.email for _, payment in valid]
+    )
+
+    card_bins = await card_bin_lookup.lookup_many(
+        db, [payment.noPresentCardData.cardNumber for _, payment in valid]
+    )
+    accepted: list[tuple[int, CardPaymentRequest]] = []
+    accepted_bins = []
+    for (index, payment), card_bin in zip(valid, card_bins):
+        rejection = card_bin_lookup.rejection(card_bin)
+        if rejection:
+            error = {
+                "type": "card_not_accepted",
+                "loc": ["noPresentCardData", "cardNumber"],
+                "msg": rejection,
+            }
+            results.append(BatchItemResult(index=index, errors=[error]))
+            continue
+        accepted.append((index, payment))
+        accepted_bins.append(card_bin)
+    if not accepted:
+        raise batch_rejected(results)
+
+    # CardPaymentRequest ya contiene los campos de TransactionCreate: se evita
+    # validar cada elemento una segunda vez
+    transactions = await transaction_repo.create_transactions(
         db=db,
-        transaction=transaction_data,
+        transactions=[payment for _, payment in accepted],
+        payloads=await seal_cards([payment for _, payment in accepted]),
+        queue=bulk_queue(client),
+        card_bins=accepted_bins,
+    )
+    outbox_relay.notify()
+
+    results.extend(
+        BatchItemResult(index=index, id=transaction.id, status=transaction.status)
+        for transaction, (index, _) in zip(transactions, accepted)
     )
+    results.sort(key=lambda result: result.index)
+    return BatchTransactionResponse(
+        accepted=len(transactions),
+        rejected=len(items) - len(transactions),
+        items=results,
+    )
+
+
+def batch_rejected(results: list[BatchItemResult]) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail=[
+            result.model_dump(exclude_none=True)
+            for result in sorted(results, key=lambda result: result.index)
+        ],
+    )
+
+
+EXPORT_COLUMNS = [column.name for column in Transaction.__table__.columns]
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
 
-    process_payment.delay(str(transaction.id), payment_data.model_dump(mode='json'))
-    return TransactionCreateResponse.model_validate(obj=transaction)
+def export_value(value: Any) -> Any:
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return as_utc(value).isoformat()
+    return value
+
+
+def encode_csv(rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows([export_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def encode_ndjson(rows) -> str:
+    return "".join(
+        json.dumps(
+            {
+                column: export_value(value)
+                for column, value in zip(EXPORT_COLUMNS, row)
+            }
+        )
+        + "\n"
+        for row in rows
+    )
+
+
+# Declarada antes de /{transaction_id} para que "export" no se tome como un id
+@router.get("/export", response_class=StreamingResponse)
+async def export_transactions(
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    status_filter: Optional[TransactionStatus] = Query(None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    """
+    Exporta las transacciones (más antiguas primero) como CSV o NDJSON. Las
+    filas se leen con un cursor del lado del servidor y se envían por bloques
+    de EXPORT_BATCH_SIZE, así que la memoria no depende del total exportado.
+    """
+
+    async def rows() -> AsyncIterator[str]:
+        if export_format == "csv":
+            yield encode_csv([], header=True)
+        # La sesión vive lo que dure la respuesta, no la de la dependencia
+        async with AsyncSessionLocal() as db:
+            async for partition in transaction_repo.stream_transactions(
+                db,
+                batch_size=settings.EXPORT_BATCH_SIZE,
+                status=status_filter,
+                created_from=created_from,
+                created_to=created_to,
+                statement_timeout_ms=settings.EXPORT_STATEMENT_TIMEOUT_MS,
+            ):
+                if export_format == "csv":
+                    yield encode_csv(partition)
+                else:
+                    yield encode_ndjson(partition)
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return StreamingResponse(
+        rows(),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="transactions-{timestamp}.{export_format}"'
+            ),
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+BUCKET_SIZES = {"minute": MINUTE, "hour": HOUR}
+
+
+def build_stats_buckets(rows) -> list[TransactionStatsBucketResponse]:
+    """Agrupa las filas del rollup (una por estado) por bucket y moneda"""
+    buckets: dict[tuple, TransactionStatsBucketResponse] = {}
+    for row in rows:
+        key = (as_utc(row.bucket_start), row.currency)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TransactionStatsBucketResponse(
+                bucket_start=key[0],
+                currency=row.currency,
+                count=0,
+                amount_total=0,
+                by_status={},
+            )
+        bucket.count += row.count
+        bucket.amount_total += row.amount_total
+        bucket.by_status[TransactionStatus(row.status)] = StatusTotals(
+            count=row.count, amount_total=row.amount_total
+        )
+    for bucket in buckets.values():
+        completed = bucket.by_status.get(TransactionStatus.COMPLETED)
+        declined = bucket.by_status.get(TransactionStatus.DECLINED)
+        finished = (completed.count if completed else 0) + (
+            declined.count if declined else 0
+        )
+        if finished:
+            bucket.approval_rate = (completed.count if completed else 0) / finished
+    return list(buckets.values())
 
 
-@router.get("/{transaction_id}", response_model=TransactionCreateResponse)
-def get_transaction(transaction_id: uuid.UUID, db: Session = Depends(get_db)):
-    transaction = transaction_repo.get_transaction(db, transaction_id)
-    if not transaction:
+# Declarada antes de /{transaction_id} para que "stats" no se tome como un id
+@router.get("/stats", response_model=TransactionStatsResponse)
+async def get_transaction_stats(
+    granularity: Literal["minute", "hour"] = "hour",
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    currency: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Volumen, montos y tasa de aprobación por minuto u hora de creación,
+    moneda y estado. Lee la tabla de rollup (transaction_stats), así que el
+    costo depende del número de buckets y no de transacciones; los datos
+    tienen el retraso del job de rollup (STATS_ROLLUP_INTERVAL_SECONDS).
+    """
+    size = BUCKET_SIZES[granularity]
+    align = minute_bucket if granularity == "minute" else hour_bucket
+    # Por defecto los últimos 24 buckets, incluido el actual
+    end = align(created_to) if created_to else align(utcnow()) + size
+    start = align(created_from) if created_from else end - size * 24
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="created_from must be before created_to",
+        )
+    if (end - start) / size > settings.STATS_MAX_BUCKETS:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found"
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.STATS_MAX_BUCKETS} {granularity} buckets "
+            "per request",
         )
-    return transaction
+    rows = await stats_repo.list_buckets(
+        db, granularity, start, end, currency=currency
+    )
+    return TransactionStatsResponse(
+        granularity=granularity,
+        created_from=start,
+        created_to=end,
+        buckets=build_stats_buckets(rows),
+    )
+
+
+async def load_transaction_body(db: AsyncSession, transaction_id: uuid.UUID) -> str:
+    """Respuesta serializada de la transacción, desde la caché o la base de datos"""
+    body = await transaction_cache.get(transaction_id)
+    if body is None:
+        row = await transaction_repo.get_transaction_row(db, transaction_id)
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found"
+            )
+        body = dump_transaction_row(row).decode()
+        await transaction_cache.set(transaction_id, body, row.status)
+    return body
+
+
+@router.get("/{transaction_id}/events", response_class=StreamingResponse)
+async def stream_transaction_events(
+    transaction_id: uuid.UUID,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Envía el estado de la transacción como Server-Sent Events: primero el
+    estado actual y luego cada cambio publicado por el worker. El stream se
+    cierra cuando la transacción llega a un estado terminal.
+    """
+    set_transaction_id(transaction_id)
+    queue = await event_broker.subscribe(transaction_id)
+    try:
+        body = await load_transaction_body(db, transaction_id)
+    except BaseException:
+        event_broker.unsubscribe(transaction_id, queue)
+        raise
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event in transaction_events(transaction_id, body, queue):
+                yield event
+        finally:
+            event_broker.unsubscribe(transaction_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def transaction_events(
+    transaction_id: uuid.UUID, body: str, queue: asyncio.Queue
+) -> AsyncIterator[str]:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.SSE_MAX_DURATION_SECONDS
+    while True:
+        yield f"event: status\ndata: {body}\n\n"
+        if json.loads(body)["status"] not in NON_TERMINAL_STATUSES:
+            return
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                body = await asyncio.wait_for(
+                    queue.get(), timeout=min(settings.SSE_HEARTBEAT_SECONDS, remaining)
+                )
+                break
+            except asyncio.TimeoutError:
+                if not event_broker.connected:
+                    # Sin Redis no llegan eventos: se consulta la caché
+                    cached = await transaction_cache.get(transaction_id)
+                    if cached is not None and cached != body:
+                        body = cached
+                        break
+                yield ": keep-alive\n\n"
+
+
+@router.get(
+    "/{transaction_id}",
+    response_model=TransactionCreateResponse,
+    responses={304: {"description": "Not modified"}},
+)
+async def get_transaction(
+    transaction_id: uuid.UUID,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    set_transaction_id(transaction_id)
+    body = await load_transaction_body(db, transaction_id)
+    etag = transaction_cache.etag(body)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        transaction_cache.record("not_modified")
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.get("/", response_model=list[TransactionCreateResponse])
-def list_transactions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    transactions = transaction_repo.list_transactions(db, skip=skip, limit=limit)
-    return transactions
+async def list_transactions(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status_filter: Optional[TransactionStatus] = Query(None, alias="status"),
+    currency: Optional[str] = None,
+    customer_email: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Lista transacciones (más recientes primero). La siguiente página se pide
+    enviando el valor de la cabecera `X-Next-Cursor` como `cursor`.
+
+    Se leen tuplas de columnas y se serializan con orjson sin pasar por
+    response_model; el JSON es el mismo que el de TransactionCreateResponse.
+    """
+    try:
+        rows, next_cursor = await transaction_repo.list_transaction_rows(
+            db,
+            limit=limit,
+            cursor=cursor,
+            status=status_filter,
+            currency=currency,
+            customer_email=customer_email,
+            created_from=created_from,
+            created_to=created_to,
+        )
+    except InvalidCursorError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(
+        content=dump_transaction_rows(rows),
+        media_type="application/json",
+        headers=headers,
+    )
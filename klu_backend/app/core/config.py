@@ -1,5 +1,7 @@
+import math
 import os
 
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 
@@ -18,6 +20,21 @@ class Settings(BaseSettings):
 
     # SQLite
     SQLITE_URI: str = os.getenv("SQLITE_URI", "sqlite:///./payments_app.db")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+    # Rol del proceso ("api" o "worker"): define el tamaño del pool de conexiones
+    PROCESS_ROLE: str = os.getenv("PROCESS_ROLE", "api")
+
+    # Pool de conexiones por proceso. La API atiende muchas peticiones
+    # concurrentes por proceso; cada hijo del worker procesa pocas tareas a la vez
+    API_DB_POOL_SIZE: int = int(os.getenv("API_DB_POOL_SIZE", 5))
+    API_DB_MAX_OVERFLOW: int = int(os.getenv("API_DB_MAX_OVERFLOW", 5))
+    WORKER_DB_POOL_SIZE: int = int(os.getenv("WORKER_DB_POOL_SIZE", 1))
+    WORKER_DB_MAX_OVERFLOW: int = int(os.getenv("WORKER_DB_MAX_OVERFLOW", 2))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 10))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 15000))
 
     # Blumonpay credentials
     BLUMONPAY_TOKEN_HOST: str = os.getenv(
@@ -30,19 +47,276 @@ class Settings(BaseSettings):
         "",
     )
 
+    # Cliente HTTP de Blumonpay (un pool de conexiones por proceso)
+    BLUMONPAY_POOL_CONNECTIONS: int = int(os.getenv("BLUMONPAY_POOL_CONNECTIONS", 4))
+    BLUMONPAY_POOL_MAXSIZE: int = int(os.getenv("BLUMONPAY_POOL_MAXSIZE", 20))
+    BLUMONPAY_CONNECT_TIMEOUT: float = float(
+        os.getenv("BLUMONPAY_CONNECT_TIMEOUT", 5)
+    )
+    BLUMONPAY_READ_TIMEOUT: float = float(os.getenv("BLUMONPAY_READ_TIMEOUT", 30))
+    # Segundos antes de `expires_in` en los que se renueva el token
+    BLUMONPAY_TOKEN_REFRESH_MARGIN: int = int(
+        os.getenv("BLUMONPAY_TOKEN_REFRESH_MARGIN", 60)
+    )
+
+    # Circuit breaker compartido (en Redis) alrededor de los cargos: se abre
+    # con al menos CIRCUIT_FAILURE_THRESHOLD fallas y CIRCUIT_FAILURE_RATIO de
+    # cargos fallidos dentro de una ventana de CIRCUIT_WINDOW_SECONDS
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 20))
+    CIRCUIT_FAILURE_RATIO: float = float(os.getenv("CIRCUIT_FAILURE_RATIO", 0.5))
+    CIRCUIT_WINDOW_SECONDS: float = float(os.getenv("CIRCUIT_WINDOW_SECONDS", 30))
+    CIRCUIT_OPEN_SECONDS: float = float(os.getenv("CIRCUIT_OPEN_SECONDS", 30))
+    # Tareas pospuestas por el circuito abierto o por el límite de concurrencia
+    CHARGE_DEFER_BASE_SECONDS: float = float(
+        os.getenv("CHARGE_DEFER_BASE_SECONDS", 2)
+    )
+    CHARGE_DEFER_MAX_SECONDS: float = float(os.getenv("CHARGE_DEFER_MAX_SECONDS", 300))
+    CHARGE_MAX_DEFERRALS: int = int(os.getenv("CHARGE_MAX_DEFERRALS", 50))
+
+    # Reintentos de cargos con errores transitorios de Blumonpay (backoff
+    # exponencial con jitter); agotados, el cargo va a la dead-letter queue
+    PAYMENT_MAX_RETRIES: int = int(os.getenv("PAYMENT_MAX_RETRIES", 5))
+    PAYMENT_RETRY_BACKOFF_SECONDS: int = int(
+        os.getenv("PAYMENT_RETRY_BACKOFF_SECONDS", 2)
+    )
+    PAYMENT_RETRY_BACKOFF_MAX_SECONDS: int = int(
+        os.getenv("PAYMENT_RETRY_BACKOFF_MAX_SECONDS", 120)
+    )
+    DEAD_LETTER_TTL_SECONDS: int = int(os.getenv("DEAD_LETTER_TTL_SECONDS", 604800))
+
+    # Límite adaptativo (AIMD) de cargos en vuelo por proceso del worker
+    BLUMONPAY_CONCURRENCY_INITIAL: int = int(
+        os.getenv("BLUMONPAY_CONCURRENCY_INITIAL", 20)
+    )
+    BLUMONPAY_CONCURRENCY_MIN: int = int(os.getenv("BLUMONPAY_CONCURRENCY_MIN", 1))
+    BLUMONPAY_CONCURRENCY_MAX: int = int(os.getenv("BLUMONPAY_CONCURRENCY_MAX", 200))
+    # Un cargo más lento que esto cuenta como sobrecarga
+    BLUMONPAY_LATENCY_TARGET_SECONDS: float = float(
+        os.getenv("BLUMONPAY_LATENCY_TARGET_SECONDS", 5)
+    )
+    # Espera máxima por un lugar antes de posponer la tarea
+    BLUMONPAY_CONCURRENCY_WAIT_SECONDS: float = float(
+        os.getenv("BLUMONPAY_CONCURRENCY_WAIT_SECONDS", 1)
+    )
+
+    # Envío de cargos en lote (POST /transactions/batch)
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", 1000))
+
+    # Carriles de la cola de cargos (`app.tasks.lanes`): interactivo
+    # (POST /transactions/), lotes y reintentos. El worker lee de cada carril
+    # en proporción a su peso cuando todos tienen mensajes. Con
+    # PAYMENT_BULK_SHARDS > 1 los lotes se reparten en colas por cliente; la
+    # API y el worker deben usar el mismo valor
+    PAYMENT_QUEUE_PREFIX: str = os.getenv("PAYMENT_QUEUE_PREFIX", "payments")
+    PAYMENT_LANE_WEIGHT_INTERACTIVE: int = int(
+        os.getenv("PAYMENT_LANE_WEIGHT_INTERACTIVE", 8)
+    )
+    PAYMENT_LANE_WEIGHT_BULK: int = int(os.getenv("PAYMENT_LANE_WEIGHT_BULK", 1))
+    PAYMENT_LANE_WEIGHT_RETRY: int = int(os.getenv("PAYMENT_LANE_WEIGHT_RETRY", 2))
+    PAYMENT_BULK_SHARDS: int = int(os.getenv("PAYMENT_BULK_SHARDS", 1))
+    # Mensajes reservados por cada lugar de concurrencia del worker: con más,
+    # un cargo interactivo espera detrás de lotes ya reservados por el worker
+    WORKER_PREFETCH_MULTIPLIER: int = int(os.getenv("WORKER_PREFETCH_MULTIPLIER", 1))
+
+    # Outbox de cargos (tabla payment_outbox): la API guarda cada cargo en la
+    # misma transacción de base de datos que su transacción y un relay por
+    # proceso de la API lo publica en la cola, fuera de la petición. Al
+    # apagarse la API espera hasta OUTBOX_RELAY_SHUTDOWN_SECONDS a que el
+    # relay termine su bloque. El job de Celery beat publica lo que quede y
+    # vuelve a publicar los cargos que ningún worker tomó después de
+    # OUTBOX_REDELIVER_AFTER_SECONDS
+    OUTBOX_RELAY_BATCH_SIZE: int = int(os.getenv("OUTBOX_RELAY_BATCH_SIZE", 100))
+    OUTBOX_RELAY_POLL_SECONDS: float = float(
+        os.getenv("OUTBOX_RELAY_POLL_SECONDS", 1)
+    )
+    OUTBOX_RELAY_SHUTDOWN_SECONDS: float = float(
+        os.getenv("OUTBOX_RELAY_SHUTDOWN_SECONDS", 10)
+    )
+    OUTBOX_SWEEP_INTERVAL_SECONDS: float = float(
+        os.getenv("OUTBOX_SWEEP_INTERVAL_SECONDS", 30)
+    )
+    OUTBOX_REDELIVER_AFTER_SECONDS: int = int(
+        os.getenv("OUTBOX_REDELIVER_AFTER_SECONDS", 900)
+    )
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+    # Las tarjetas de los cargos por cobrar sólo están en Redis (CardVault),
+    # CARD_DATA_TTL_SECONDS desde que llegan o desde el último reintento; la
+    # outbox, la cola y la dead-letter queue llevan el cargo enmascarado. El
+    # sweeper borra las filas de la outbox más antiguas (ya no se pueden
+    # cobrar) y marca sus transacciones como fallidas. Sin valor (0) es la
+    # espera más larga de un cargo (`get_card_data_min_ttl`) más
+    # CARD_DATA_TTL_MARGIN_SECONDS; un valor menor que esa espera no arranca
+    CARD_DATA_TTL_SECONDS: int = int(os.getenv("CARD_DATA_TTL_SECONDS", 0))
+    CARD_DATA_TTL_MARGIN_SECONDS: int = int(
+        os.getenv("CARD_DATA_TTL_MARGIN_SECONDS", 1800)
+    )
+
+    # Tabla card_bins (`app.services.card_bins`): cada proceso de la API
+    # guarda los BIN consultados en una caché LRU; las entradas vencen a los
+    # CARD_BIN_CACHE_TTL_SECONDS (para ver las importaciones) y las de BIN
+    # desconocidos antes. Las marcas y tipos de tarjeta de
+    # CARD_BIN_BLOCKED_* (separados por coma, sin distinguir mayúsculas) se
+    # rechazan sin publicar el cargo. El worker guarda el BIN de
+    # CARD_BIN_LEARN_LENGTH dígitos de cada respuesta de Blumonpay
+    CARD_BIN_CACHE_SIZE: int = int(os.getenv("CARD_BIN_CACHE_SIZE", 100000))
+    CARD_BIN_CACHE_TTL_SECONDS: float = float(
+        os.getenv("CARD_BIN_CACHE_TTL_SECONDS", 3600)
+    )
+    CARD_BIN_NEGATIVE_TTL_SECONDS: float = float(
+        os.getenv("CARD_BIN_NEGATIVE_TTL_SECONDS", 60)
+    )
+    CARD_BIN_BLOCKED_BRANDS: str = os.getenv("CARD_BIN_BLOCKED_BRANDS", "")
+    CARD_BIN_BLOCKED_TYPES: str = os.getenv("CARD_BIN_BLOCKED_TYPES", "")
+    CARD_BIN_LEARN_LENGTH: int = int(os.getenv("CARD_BIN_LEARN_LENGTH", 6))
+
     # Redis (para Celery)
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", 6379))
     REDIS_PASSWORD: str = os.getenv("REDIS_PASSWORD", "redis")
+    # Redis fuera de Celery es una optimización: fallar rápido si no responde
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", 1))
+
+    # Respuestas en caché por Idempotency-Key (la tabla idempotency_keys es
+    # la que garantiza la unicidad; Redis sólo evita ir a la base de datos).
+    # Las claves son de cada cliente y vencen a los IDEMPOTENCY_TTL_SECONDS;
+    # el job purge_idempotency_keys borra las vencidas. La huella del cuerpo
+    # es un HMAC con IDEMPOTENCY_HASH_SECRET de la petición sin CVV y con la
+    # tarjeta enmascarada
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400))
+    IDEMPOTENCY_HASH_SECRET: str = os.getenv("IDEMPOTENCY_HASH_SECRET", "")
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: int = int(
+        os.getenv("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", 3600)
+    )
+    IDEMPOTENCY_PURGE_BATCH_SIZE: int = int(
+        os.getenv("IDEMPOTENCY_PURGE_BATCH_SIZE", 5000)
+    )
+
+    # Límite de creación de transacciones (token bucket en Redis) por cliente
+    # y por email del cliente final. CAPACITY es la ráfaga permitida y
+    # REFILL_PER_SECOND los cargos por segundo sostenidos; cada cargo de un
+    # lote cuenta
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    # El cliente es el de su API key (en RATE_LIMIT_API_KEY_HEADER) si está
+    # en API_KEYS, una lista `cliente:sha256 de la key` separada por comas;
+    # una key desconocida responde 401. Sin key se usa la IP: detrás de los
+    # proxies de TRUSTED_PROXIES (IPs o redes) se lee de X-Forwarded-For
+    RATE_LIMIT_API_KEY_HEADER: str = os.getenv("RATE_LIMIT_API_KEY_HEADER", "X-API-Key")
+    API_KEYS: str = os.getenv("API_KEYS", "")
+    TRUSTED_PROXIES: str = os.getenv("TRUSTED_PROXIES", "")
+    RATE_LIMIT_CLIENT_CAPACITY: float = float(
+        os.getenv("RATE_LIMIT_CLIENT_CAPACITY", 1000)
+    )
+    RATE_LIMIT_CLIENT_REFILL_PER_SECOND: float = float(
+        os.getenv("RATE_LIMIT_CLIENT_REFILL_PER_SECOND", 100)
+    )
+    RATE_LIMIT_CUSTOMER_CAPACITY: float = float(
+        os.getenv("RATE_LIMIT_CUSTOMER_CAPACITY", 5)
+    )
+    RATE_LIMIT_CUSTOMER_REFILL_PER_SECOND: float = float(
+        os.getenv("RATE_LIMIT_CUSTOMER_REFILL_PER_SECOND", 0.1)
+    )
+
+    # Caché de GET /transactions/{id}
+    TRANSACTION_CACHE_TTL_SECONDS: int = int(
+        os.getenv("TRANSACTION_CACHE_TTL_SECONDS", 300)
+    )
+    TRANSACTION_CACHE_PENDING_TTL_SECONDS: int = int(
+        os.getenv("TRANSACTION_CACHE_PENDING_TTL_SECONDS", 2)
+    )
+
+    # GET /transactions/export: filas por lectura del cursor y límite de la
+    # consulta completa (0 = sin límite)
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", 2000))
+    EXPORT_STATEMENT_TIMEOUT_MS: int = int(
+        os.getenv("EXPORT_STATEMENT_TIMEOUT_MS", 0)
+    )
+
+    # Rollup de GET /transactions/stats (Celery beat)
+    STATS_ROLLUP_INTERVAL_SECONDS: float = float(
+        os.getenv("STATS_ROLLUP_INTERVAL_SECONDS", 60)
+    )
+    # Minutos marcados que se recalculan como máximo en cada ejecución
+    STATS_ROLLUP_MAX_MINUTES: int = int(os.getenv("STATS_ROLLUP_MAX_MINUTES", 1000))
+    # Buckets como máximo por consulta (7 días por minuto)
+    STATS_MAX_BUCKETS: int = int(os.getenv("STATS_MAX_BUCKETS", 10080))
+
+    # Particiones mensuales de transactions (PostgreSQL, Celery beat): meses
+    # creados por adelantado y meses que se conservan antes de archivar la
+    # partición en TRANSACTION_ARCHIVE_DIR (0 = no archivar)
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: float = float(
+        os.getenv("PARTITION_MAINTENANCE_INTERVAL_SECONDS", 3600)
+    )
+    TRANSACTION_PARTITIONS_AHEAD: int = int(
+        os.getenv("TRANSACTION_PARTITIONS_AHEAD", 3)
+    )
+    TRANSACTION_RETENTION_MONTHS: int = int(
+        os.getenv("TRANSACTION_RETENTION_MONTHS", 24)
+    )
+    TRANSACTION_ARCHIVE_DIR: str = os.getenv("TRANSACTION_ARCHIVE_DIR", "archive")
+
+    # GET /transactions/{id}/events (Server-Sent Events)
+    SSE_HEARTBEAT_SECONDS: float = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+    SSE_MAX_DURATION_SECONDS: float = float(
+        os.getenv("SSE_MAX_DURATION_SECONDS", 600)
+    )
+
+    # Escritura en bloque de transaction_gateway_results desde el worker
+    GATEWAY_RESULTS_BATCH_SIZE: int = int(os.getenv("GATEWAY_RESULTS_BATCH_SIZE", 100))
+    GATEWAY_RESULTS_FLUSH_SECONDS: float = float(
+        os.getenv("GATEWAY_RESULTS_FLUSH_SECONDS", 1)
+    )
+
+    # Escritura en bloque de los estados finales de los cargos. Con el pool
+    # gevent se agrupan los cargos en vuelo; con prefork conviene un tamaño 1
+    STATUS_UPDATE_BATCH_SIZE: int = int(os.getenv("STATUS_UPDATE_BATCH_SIZE", 50))
+    STATUS_UPDATE_FLUSH_SECONDS: float = float(
+        os.getenv("STATUS_UPDATE_FLUSH_SECONDS", 0.05)
+    )
+
+    # Métricas de Prometheus del worker (la API las expone en /metrics).
+    # 0 desactiva el servidor HTTP del worker
+    WORKER_METRICS_PORT: int = int(os.getenv("WORKER_METRICS_PORT", 9100))
 
     class Config:
         env_file = ".env"
 
+    @model_validator(mode="after")
+    def check_card_data_ttl(self):
+        min_ttl = self.get_card_data_min_ttl()
+        if not self.CARD_DATA_TTL_SECONDS:
+            self.CARD_DATA_TTL_SECONDS = min_ttl + self.CARD_DATA_TTL_MARGIN_SECONDS
+        elif self.CARD_DATA_TTL_SECONDS < min_ttl:
+            raise ValueError(
+                f"CARD_DATA_TTL_SECONDS must be at least {min_ttl}s: cards would "
+                "expire before their retries and redeliveries run"
+            )
+        return self
+
+    def get_card_data_min_ttl(self) -> int:
+        """
+        Espera más larga de un cargo entre dos renovaciones de su tarjeta: el
+        countdown de un reintento o de un cargo pospuesto (con el jitter de
+        hasta 20% de `deferral_countdown`) y, si el mensaje se pierde, todas
+        las reentregas del sweeper
+        """
+        countdown = max(
+            self.CHARGE_DEFER_MAX_SECONDS * 1.2, self.PAYMENT_RETRY_BACKOFF_MAX_SECONDS
+        )
+        redeliveries = self.OUTBOX_REDELIVER_AFTER_SECONDS * self.OUTBOX_MAX_ATTEMPTS
+        return math.ceil(countdown + redeliveries + self.OUTBOX_SWEEP_INTERVAL_SECONDS)
+
     def get_db_uri(self) -> str:
         if self.DB_TYPE.lower() == "postgres":
             return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}/{self.POSTGRES_DB}"
         return self.SQLITE_URI
 
+    def get_db_pool_size(self, role: str = None) -> tuple[int, int]:
+        """Devuelve (pool_size, max_overflow) para el rol del proceso"""
+        role = (role or self.PROCESS_ROLE).lower()
+        if role == "worker":
+            return self.WORKER_DB_POOL_SIZE, self.WORKER_DB_MAX_OVERFLOW
+        return self.API_DB_POOL_SIZE, self.API_DB_MAX_OVERFLOW
+
     def get_redis_url(self) -> str:
         return f"redis://:{self.REDIS_PASSWORD}@{self.REDIS_HOST}:{self.REDIS_PORT}/0"
 
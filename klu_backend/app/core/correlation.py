@@ -0,0 +1,35 @@
+import logging
+from contextvars import ContextVar
+from typing import Optional
+
+# Transacción que se está procesando en la petición o tarea actual. Con el
+# pool gevent cada greenlet tiene su propio contexto.
+transaction_id_var: ContextVar[Optional[str]] = ContextVar(
+    "transaction_id", default=None
+)
+
+
+def set_transaction_id(transaction_id) -> None:
+    transaction_id_var.set(str(transaction_id) if transaction_id else None)
+
+
+def get_transaction_id() -> Optional[str]:
+    return transaction_id_var.get()
+
+
+def install_log_record_factory() -> None:
+    """
+    Agrega `transaction_id` a todos los registros de logging para poder usar
+    `%(transaction_id)s` en los formatos de la API y del worker.
+    """
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "adds_transaction_id", False):
+        return
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.transaction_id = transaction_id_var.get() or "-"
+        return record
+
+    record_factory.adds_transaction_id = True
+    logging.setLogRecordFactory(record_factory)
@@ -0,0 +1,188 @@
+import functools
+import inspect
+import os
+import time
+from typing import Callable
+
+from prometheus_client import REGISTRY, CollectorRegistry, Histogram, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.exposition import choose_encoder
+
+from app.core.correlation import get_transaction_id
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+QUEUE_BUCKETS = LATENCY_BUCKETS + (120.0, 300.0, 600.0, 1800.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "klu_http_request_duration_seconds",
+    "Tiempo hasta enviar las cabeceras de la respuesta, por ruta",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "klu_db_query_duration_seconds",
+    "Duración de los métodos de los repositorios (consultas y commit)",
+    ["repository", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+TASK_QUEUE_WAIT_SECONDS = Histogram(
+    "klu_celery_task_queue_wait_seconds",
+    "Tiempo entre la publicación (o el countdown) y el inicio de la tarea",
+    ["task"],
+    buckets=QUEUE_BUCKETS,
+)
+TASK_RUN_SECONDS = Histogram(
+    "klu_celery_task_run_seconds",
+    "Duración de la ejecución de la tarea, por estado final",
+    ["task", "state"],
+    buckets=LATENCY_BUCKETS,
+)
+BLUMONPAY_REQUEST_SECONDS = Histogram(
+    "klu_blumonpay_request_duration_seconds",
+    "Latencia de las llamadas a Blumonpay, por endpoint y resultado",
+    ["endpoint", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def observe(histogram: Histogram, value: float, **labels):
+    """Registra `value` con la transacción actual como exemplar (OpenMetrics)"""
+    transaction_id = get_transaction_id()
+    exemplar = {"transaction_id": transaction_id} if transaction_id else None
+    histogram.labels(**labels).observe(value, exemplar)
+
+
+def timed_query(func: Callable) -> Callable:
+    """Mide un método de repositorio (síncrono o async) en DB_QUERY_SECONDS"""
+    repository, method = func.__qualname__.split(".")[-2:]
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                observe(
+                    DB_QUERY_SECONDS,
+                    time.perf_counter() - start,
+                    repository=repository,
+                    method=method,
+                )
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            observe(
+                DB_QUERY_SECONDS,
+                time.perf_counter() - start,
+                repository=repository,
+                method=method,
+            )
+
+    return wrapper
+
+
+class StatsCollector:
+    """
+    Publica como gauges los contadores que ya exponen los `get_stats()` de la
+    app (pool de la base de datos, caché, circuit breaker...). Los valores
+    de texto se publican como `{value="..."} 1` y los diccionarios como una
+    serie por clave, con la etiqueta `label`.
+    """
+
+    def __init__(self, name: str, get_stats: Callable[[], dict], label: str):
+        self.name = name
+        self.get_stats = get_stats
+        self.label = label
+
+    def describe(self):
+        # Evita que el registro llame a get_stats() al registrar el collector
+        return []
+
+    def collect(self):
+        for key, value in self.get_stats().items():
+            metric_name = f"klu_{self.name}_{key}"
+            if isinstance(value, (int, float)):
+                yield GaugeMetricFamily(metric_name, "", value=float(value))
+            elif isinstance(value, str):
+                gauge = GaugeMetricFamily(metric_name, "", labels=["value"])
+                gauge.add_metric([value], 1)
+                yield gauge
+            elif isinstance(value, dict):
+                # {valor de la etiqueta: número}, p. ej. por carril de la cola
+                gauge = GaugeMetricFamily(metric_name, "", labels=[self.label])
+                for label_value, number in value.items():
+                    gauge.add_metric([label_value], float(number))
+                yield gauge
+
+
+class PrometheusMiddleware:
+    """
+    Middleware ASGI que mide cada petición HTTP por plantilla de ruta (no por
+    URL, para no crear una serie por id). Se mide hasta el envío de las
+    cabeceras: en los streams (SSE, exportaciones) es el tiempo de respuesta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                observe(
+                    HTTP_REQUEST_SECONDS,
+                    time.perf_counter() - start,
+                    method=scope["method"],
+                    route=getattr(route, "path", "unmatched"),
+                    status=str(message["status"]),
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_metrics)
+
+
+_collectors: list[StatsCollector] = []
+
+
+def register_stats(name: str, get_stats: Callable[[], dict], label: str = "key"):
+    collector = StatsCollector(name, get_stats, label)
+    _collectors.append(collector)
+    REGISTRY.register(collector)
+
+
+def get_registry() -> CollectorRegistry:
+    """
+    Registro a exponer. Con PROMETHEUS_MULTIPROC_DIR (varios workers de
+    uvicorn o el pool prefork de Celery) se agregan los histogramas de todos
+    los procesos; los contadores de `register_stats` son los del proceso que
+    responde.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in _collectors:
+        registry.register(collector)
+    return registry
+
+
+def generate_metrics(accept_header: str = None) -> tuple[bytes, str]:
+    """Cuerpo y content type de /metrics"""
+    encoder, content_type = choose_encoder(accept_header)
+    return encoder(get_registry()), content_type
@@ -0,0 +1,39 @@
+from app.core.config import settings
+from app.db.pool import configure_engine, engine_options
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+# Drivers asyncio equivalentes a los del engine síncrono
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def make_async_uri(uri: str) -> str:
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Unsupported database backend for asyncio: {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(
+        hide_password=False
+    )
+
+
+async_engine = create_async_engine(
+    make_async_uri(settings.get_db_uri()),
+    **engine_options(settings.get_db_uri(), is_async=True),
+)
+configure_engine(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+# Dependency
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,181 @@
+"""
+Particiones mensuales por `created_at` (PostgreSQL). Cada mes es una tabla
+`<tabla>_pYYYYMM`; la partición `<tabla>_default` recibe las filas de meses
+que todavía no tienen partición para que el INSERT no falle.
+"""
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.config import settings
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+PARTITION_COLUMN = "created_at"
+PARTITION_SUFFIX = re.compile(r"_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+
+def month_start(value: datetime) -> datetime:
+    value = value.astimezone(timezone.utc) if value.tzinfo else value
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def partition_month(table: str, name: str) -> Optional[datetime]:
+    """Mes de una partición `<tabla>_pYYYYMM`; None si el nombre no es de una"""
+    match = PARTITION_SUFFIX.search(name)
+    if match is None or name[: match.start()] != table:
+        return None
+    return datetime(
+        int(match["year"]), int(match["month"]), 1, tzinfo=timezone.utc
+    )
+
+
+def is_partitioned(connection: Connection, table: str) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return bool(
+        connection.scalar(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = :table AND pg_table_is_visible(c.oid))"
+            ),
+            {"table": table},
+        )
+    )
+
+
+def table_exists(connection: Connection, name: str) -> bool:
+    regclass = connection.scalar(text("SELECT to_regclass(:name)"), {"name": name})
+    return regclass is not None
+
+
+def attached_partitions(connection: Connection, table: str) -> dict[str, datetime]:
+    """Particiones mensuales de `table` por nombre (sin la partición default)"""
+    names = connection.scalars(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table AND pg_table_is_visible(p.oid)"
+        ),
+        {"table": table},
+    )
+    months = {name: partition_month(table, name) for name in names}
+    return {name: month for name, month in months.items() if month is not None}
+
+
+def detached_partitions(connection: Connection, table: str) -> dict[str, datetime]:
+    """
+    Tablas `<tabla>_pYYYYMM` que ya no son particiones: quedaron separadas
+    por un archivado que no terminó
+    """
+    names = connection.scalars(
+        text(
+            "SELECT c.relname FROM pg_class c "
+            "WHERE c.relkind = 'r' AND c.relname LIKE :pattern "
+            "AND pg_table_is_visible(c.oid) "
+            "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)"
+        ),
+        {"pattern": f"{table}\\_p%"},
+    )
+    months = {name: partition_month(table, name) for name in names}
+    return {name: month for name, month in months.items() if month is not None}
+
+
+def create_partition(connection: Connection, table: str, month: datetime) -> bool:
+    """
+    Crea la partición del mes si no existe. Si la partición default ya tiene
+    filas de ese mes se mueven a la nueva partición en la misma transacción.
+
+    Returns:
+        bool: True si se creó la partición
+    """
+    name = partition_name(table, month)
+    if table_exists(connection, name):
+        return False
+    bounds = {"start": month, "end": add_months(month, 1)}
+    bounds_sql = (
+        f"FOR VALUES FROM ('{bounds['start'].isoformat()}') "
+        f"TO ('{bounds['end'].isoformat()}')"
+    )
+    in_month = f"{PARTITION_COLUMN} >= :start AND {PARTITION_COLUMN} < :end"
+    default = default_partition_name(table)
+
+    has_default_rows = table_exists(connection, default) and connection.scalar(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_month})"), bounds
+    )
+    if not has_default_rows:
+        connection.execute(
+            text(f"CREATE TABLE {name} PARTITION OF {table} {bounds_sql}")
+        )
+        return True
+
+    # Una partición nueva no puede cubrir filas que ya están en la default
+    connection.execute(
+        text(
+            f"CREATE TABLE {name} "
+            f"(LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    moved = connection.execute(
+        text(f"INSERT INTO {name} SELECT * FROM {default} WHERE {in_month}"), bounds
+    ).rowcount
+    connection.execute(text(f"DELETE FROM {default} WHERE {in_month}"), bounds)
+    connection.execute(
+        text(f"ALTER TABLE {table} ATTACH PARTITION {name} {bounds_sql}")
+    )
+    logger.warning(f"Moved {moved} rows from {default} to new partition {name}")
+    return True
+
+
+def ensure_partitions(
+    connection: Connection, table: str, months_ahead: int, now: datetime = None
+) -> list[str]:
+    """
+    Crea la partición default y las del mes actual y los `months_ahead`
+    siguientes que falten.
+
+    Returns:
+        list: nombres de las particiones creadas
+    """
+    created = []
+    default = default_partition_name(table)
+    if not table_exists(connection, default):
+        connection.execute(
+            text(f"CREATE TABLE {default} PARTITION OF {table} DEFAULT")
+        )
+        created.append(default)
+    current = month_start(now or datetime.now(timezone.utc))
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if create_partition(connection, table, month):
+            created.append(partition_name(table, month))
+    return created
+
+
+def detach_partition(connection: Connection, table: str, name: str):
+    connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+
+
+def create_initial_partitions(target, connection: Connection, **kw):
+    """Listener `after_create` de la tabla particionada"""
+    if connection.dialect.name != "postgresql":
+        return
+    ensure_partitions(connection, target.name, settings.TRANSACTION_PARTITIONS_AHEAD)
@@ -0,0 +1,186 @@
+import threading
+import time
+
+from app.core.config import settings
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolStats:
+    """Contadores del pool de conexiones de un engine"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.queries = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def increment(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "queries": self.queries,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+class TimedPoolMixin:
+    """
+    Mide cuánto espera cada checkout por una conexión libre. SQLAlchemy no
+    tiene un evento previo al checkout, así que se envuelve `_do_get`.
+    """
+
+    stats: PoolStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedQueuePool(TimedPoolMixin, QueuePool):
+    def __init__(self, *args, **kwargs):
+        self.stats = kwargs.pop("stats", None) or PoolStats()
+        super().__init__(*args, **kwargs)
+
+    def recreate(self):
+        # dispose() recrea el pool: se conservan los contadores
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        self.stats = kwargs.pop("stats", None) or PoolStats()
+        super().__init__(*args, **kwargs)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def engine_options(uri: str, role: str = None, is_async: bool = False) -> dict:
+    """
+    Argumentos de `create_engine` / `create_async_engine` según el backend y
+    el rol del proceso (ver `Settings.get_db_pool_size`).
+    """
+    url = make_url(uri)
+    poolclass = InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            return {}
+        return {
+            "poolclass": poolclass,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "connect_args": {
+                "check_same_thread": False,
+                "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+            },
+        }
+
+    pool_size, max_overflow = settings.get_db_pool_size(role)
+    if is_async:
+        # asyncpg recibe los parámetros del servidor por separado
+        connect_args = {
+            "server_settings": {
+                "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)
+            }
+        }
+    else:
+        connect_args = {
+            "options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+        }
+    return {
+        "poolclass": poolclass,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+def configure_engine(engine: Engine):
+    """Registra los pragmas de SQLite y los contadores del pool y de consultas"""
+    if engine.dialect.name == "sqlite":
+
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            # WAL permite lecturas concurrentes mientras otro proceso escribe
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+
+    stats = getattr(engine.pool, "stats", None)
+    if stats is None:
+        return
+
+    @event.listens_for(engine, "connect")
+    def count_connect(dbapi_connection, connection_record):
+        stats.increment("connects")
+
+    @event.listens_for(engine, "checkout")
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.increment("checkouts")
+
+    @event.listens_for(engine, "checkin")
+    def count_checkin(dbapi_connection, connection_record):
+        stats.increment("checkins")
+
+    @event.listens_for(engine, "invalidate")
+    def count_invalidate(dbapi_connection, connection_record, exception):
+        stats.increment("invalidations")
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        stats.increment("queries")
+
+
+def get_pool_stats(engine: Engine) -> dict:
+    """Contadores acumulados y estado actual del pool de `engine`"""
+    pool = engine.pool
+    stats = getattr(pool, "stats", None)
+    result = stats.as_dict() if stats else {}
+    if isinstance(pool, QueuePool):
+        result.update(
+            {
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            }
+        )
+    return result
@@ -0,0 +1,31 @@
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+_redis = None
+_async_redis = None
+
+
+def get_redis() -> redis.Redis:
+    """Cliente Redis síncrono compartido por el proceso (worker)"""
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(
+            settings.get_redis_url(),
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+    return _redis
+
+
+def get_async_redis() -> aioredis.Redis:
+    """Cliente Redis asyncio compartido por el proceso (API)"""
+    global _async_redis
+    if _async_redis is None:
+        _async_redis = aioredis.Redis.from_url(
+            settings.get_redis_url(),
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+    return _async_redis
@@ -1,9 +1,11 @@
 from app.core.config import settings
+from app.db.pool import configure_engine, engine_options
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-engine = create_engine(settings.SQLITE_URI)
+engine = create_engine(settings.get_db_uri(), **engine_options(settings.get_db_uri()))
+configure_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -0,0 +1,27 @@
+from app.db.session import Base
+from app.models.transaction import utcnow
+from sqlalchemy import Column, DateTime, String
+
+
+class CardBin(Base):
+    """
+    Datos del BIN (primeros 6 u 8 dígitos de la tarjeta): banco, marca, tipo
+    y producto. El worker los aprende de `binInformation` en las respuestas de
+    Blumonpay (`source = "gateway"`) y se pueden cargar en bloque desde un
+    CSV (`source = "import"`, `python -m app.tasks.card_bins import`).
+
+    La API los consulta por prefijo (`app.services.card_bins`) para rechazar
+    marcas y tipos no aceptados antes de publicar el cargo y guardar la marca
+    y el tipo en la transacción.
+    """
+
+    __tablename__ = "card_bins"
+
+    bin = Column(String(8), primary_key=True)
+    bank = Column(String(64), nullable=True)
+    brand = Column(String(32), nullable=True)
+    type = Column(String(32), nullable=True)
+    product = Column(String(64), nullable=True)
+    # Una fila importada no se reemplaza con lo que responda Blumonpay
+    source = Column(String(16), nullable=False, default="gateway")
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
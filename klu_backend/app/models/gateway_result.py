@@ -0,0 +1,46 @@
+from app.db.session import Base
+from app.models.transaction import utcnow
+from sqlalchemy import JSON, Column, DateTime, Index, String, func
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+
+class TransactionGatewayResult(Base):
+    """
+    Respuesta normalizada de Blumonpay a un cargo (aprobado o rechazado).
+    Permite conciliar con consultas locales en lugar de volver a consultar
+    la API por cada transacción. `raw_response` guarda la respuesta completa
+    (JSONB en PostgreSQL).
+    """
+
+    __tablename__ = "transaction_gateway_results"
+
+    # Sin clave foránea: en PostgreSQL transactions está particionada y su
+    # clave primaria es (id, created_at). El archivado borra estas filas
+    transaction_id = Column(UUID(as_uuid=True), primary_key=True)
+    blumonpay_transaction_id = Column(String(64), nullable=True)
+    request_id = Column(String(64), nullable=True)
+    authorization_code = Column(String(32), nullable=True)
+    error_code = Column(String(32), nullable=True)
+    message = Column(String(255), nullable=True)
+    card_brand = Column(String(32), nullable=True)
+    card_bank = Column(String(64), nullable=True)
+    card_type = Column(String(32), nullable=True)
+    card_product = Column(String(64), nullable=True)
+    card_last_four = Column(String(4), nullable=True)
+    # Fecha y hora informadas por Blumonpay, tal como llegan
+    gateway_timestamp = Column(String(32), nullable=True)
+    raw_response = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), default=utcnow, server_default=func.now()
+    )
+
+    __table_args__ = (
+        Index(
+            "ix_transaction_gateway_results_authorization_code", "authorization_code"
+        ),
+        Index(
+            "ix_transaction_gateway_results_card_brand_created_at",
+            "card_brand",
+            "created_at",
+        ),
+    )
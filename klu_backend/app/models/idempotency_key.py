@@ -0,0 +1,28 @@
+from app.db.session import Base
+from app.models.transaction import utcnow
+from sqlalchemy import Column, DateTime, String, func
+from sqlalchemy.dialects.postgresql import UUID
+
+
+class IdempotencyKey(Base):
+    """
+    Clave `Idempotency-Key` usada al crear una transacción. La clave primaria
+    (cliente, clave) garantiza que un reintento del cliente no cree una
+    segunda transacción, aunque Redis haya perdido la respuesta en caché; dos
+    clientes pueden usar la misma clave. Vencida, la clave puede reutilizarse
+    y el job `purge_idempotency_keys` la borra.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    # `client_key` de app.api.clients
+    client_key = Column(String(255), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # Sin clave foránea, como en transaction_gateway_results
+    transaction_id = Column(UUID(as_uuid=True), nullable=False)
+    # Huella del cuerpo de la petición: la misma clave con otro pago es un error
+    request_hash = Column(String(64), nullable=False)
+    created_at = Column(
+        DateTime(timezone=True), default=utcnow, server_default=func.now()
+    )
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,55 @@
+from app.db.session import Base
+from app.models.transaction import utcnow
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Index, Integer, String
+from sqlalchemy.dialects.postgresql import UUID
+
+
+class PaymentOutbox(Base):
+    """
+    Cargo por publicar en la cola, escrito en la misma transacción de base de
+    datos que su transacción (transactional outbox): si el commit se hizo, el
+    cargo se publica aunque Redis no respondiera en ese momento.
+
+    El relay (`app.services.outbox`) publica las filas y marca
+    `published_at`. La fila se borra cuando un worker toma la transacción;
+    una fila publicada que sigue aquí es un mensaje que ningún worker
+    recibió. Después de CARD_DATA_TTL_SECONDS la tarjeta ya no está en Redis
+    y el sweeper borra la fila.
+    """
+
+    __tablename__ = "payment_outbox"
+
+    # INTEGER en SQLite para que sea autoincremental
+    id = Column(
+        BigInteger().with_variant(Integer(), "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    # Sin clave foránea, como en transaction_gateway_results; created_at
+    # permite leer la transacción en su partición
+    transaction_id = Column(UUID(as_uuid=True), nullable=False)
+    transaction_created_at = Column(DateTime(timezone=True), nullable=False)
+    # Cola de destino (carril y shard), resuelta al crear la transacción
+    queue = Column(String(255), nullable=False)
+    # Argumento `payment_data` de process_payment, con la tarjeta
+    # enmascarada y su referencia en CardVault; JSON y no JSONB: no se
+    # consulta, sólo se publica
+    payload = Column(JSON, nullable=False)
+    # Publicaciones hechas, contando las repetidas por el sweeper
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    # En los reintentos de process_payment, el momento en que vence su
+    # countdown: la tarea ya publicó el mensaje y el relay no lo repite
+    published_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_payment_outbox_transaction_id", "transaction_id"),
+        # El relay sólo recorre las filas por publicar, en orden de llegada
+        Index(
+            "ix_payment_outbox_unpublished",
+            "id",
+            postgresql_where=published_at.is_(None),
+            sqlite_where=published_at.is_(None),
+        ),
+        Index("ix_payment_outbox_published_at", "published_at"),
+    )
@@ -1,26 +1,167 @@
+import enum
+import os
+import time
 import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
+from app.db.partitions import create_initial_partitions
 from app.db.session import Base
-from sqlalchemy import Column, DateTime, Float, String, func
+from sqlalchemy import Column, DateTime, Enum, Float, Index, String, event, func
 from sqlalchemy.dialects.postgresql import UUID
 
 
+class TransactionStatus(enum.StrEnum):
+    PENDING = "pending"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    DECLINED = "declined"
+    FAILED = "failed"
+    # Filas anteriores a estos estados cuya descripción de Blumonpay no dice
+    # si el cargo se aprobó, y cargos cobrados cuyo estado final no se pudo
+    # escribir; se resuelven con app.tasks.reconciliation
+    UNRECONCILED = "unreconciled"
+
+
+# Cambios de estado permitidos. `completed` y `declined` son finales; una
+# transacción `failed` sólo vuelve a `pending` al reenviarla desde la
+# dead-letter queue y una `unreconciled` sólo pasa al resultado conciliado.
+# Una `pending` falla sin cobrarse si su tarjeta venció en la outbox, y una
+# `processing` ya cobrada queda `unreconciled` si su estado no se escribió
+ALLOWED_TRANSITIONS = {
+    TransactionStatus.PENDING: {
+        TransactionStatus.PROCESSING,
+        TransactionStatus.FAILED,
+    },
+    TransactionStatus.PROCESSING: {
+        TransactionStatus.PENDING,
+        TransactionStatus.COMPLETED,
+        TransactionStatus.DECLINED,
+        TransactionStatus.FAILED,
+        TransactionStatus.UNRECONCILED,
+    },
+    TransactionStatus.FAILED: {TransactionStatus.PENDING},
+    TransactionStatus.COMPLETED: set(),
+    TransactionStatus.DECLINED: set(),
+    TransactionStatus.UNRECONCILED: {
+        TransactionStatus.COMPLETED,
+        TransactionStatus.DECLINED,
+    },
+}
+
+# Estados que el worker todavía puede cambiar
+NON_TERMINAL_STATUSES = {TransactionStatus.PENDING, TransactionStatus.PROCESSING}
+
+
+def source_statuses(status: TransactionStatus) -> set[TransactionStatus]:
+    """Estados desde los que se puede pasar a `status`"""
+    return {
+        source for source, targets in ALLOWED_TRANSITIONS.items() if status in targets
+    }
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def as_utc(value: datetime) -> datetime:
+    # SQLite devuelve las fechas sin zona horaria; se guardan en UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+# Diferencia máxima entre el instante de un id UUIDv7 y el created_at de su
+# fila: ambos se generan en Python al insertar
+ID_TIME_TOLERANCE = timedelta(minutes=5)
+
+
+def uuid7() -> uuid.UUID:
+    """
+    UUID versión 7 (RFC 9562): milisegundos Unix en los primeros 48 bits y
+    la fracción del milisegundo en los 12 siguientes. Los ids nuevos quedan
+    al final del índice de la clave primaria en lugar de repartirse por todo
+    el B-tree como con uuid4.
+    """
+    nanoseconds = time.time_ns()
+    milliseconds, remainder = divmod(nanoseconds, 1_000_000)
+    fraction = remainder * 4096 // 1_000_000
+    random_bits = int.from_bytes(os.urandom(8)) & ((1 << 62) - 1)
+    value = (
+        (milliseconds & ((1 << 48) - 1)) << 80
+        | 0x7 << 76
+        | fraction << 64
+        | 0b10 << 62
+        | random_bits
+    )
+    return uuid.UUID(int=value)
+
+
+def uuid7_time(value: uuid.UUID) -> Optional[datetime]:
+    """Instante en que se generó un id UUIDv7; None para otras versiones"""
+    if value.version != 7:
+        return None
+    return datetime.fromtimestamp((value.int >> 80) / 1000, timezone.utc)
+
+
 class Transaction(Base):
     __tablename__ = "transactions"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # En PostgreSQL la tabla está particionada por mes de created_at y la
+    # clave primaria tiene que incluirlo
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     amount = Column(Float, nullable=False)
     currency = Column(String, nullable=False)
     customer_email = Column(String, nullable=False)
     customer_name = Column(String, nullable=False)
+    # VARCHAR con CHECK en lugar de un ENUM nativo: agregar un estado no
+    # requiere ALTER TYPE y el índice por status sigue siendo compacto
     status = Column(
-        String, nullable=False, default="pending"
-    )  # pending/completed/failed
+        Enum(
+            TransactionStatus,
+            name="transaction_status",
+            native_enum=False,
+            create_constraint=True,
+            length=16,
+            values_callable=lambda statuses: [status.value for status in statuses],
+        ),
+        nullable=False,
+        default=TransactionStatus.PENDING,
+    )
     blumonpay_transaction_id = Column(String, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Marca y tipo de la tarjeta según la tabla card_bins al crear la
+    # transacción; NULL si el BIN todavía no se conocía
+    card_brand = Column(String(32), nullable=True)
+    card_type = Column(String(32), nullable=True)
+    # El default en Python garantiza microsegundos y un formato homogéneo en
+    # SQLite, necesario para que la paginación por (created_at, id) sea estable
+    created_at = Column(
+        DateTime(timezone=True),
+        primary_key=True,
+        default=utcnow,
+        server_default=func.now(),
+    )
 
-    # Índices para búsquedas frecuentes
+    # Índices para búsquedas frecuentes (paginación keyset por created_at, id)
     __table_args__ = (
+        Index("ix_transactions_created_at_id", "created_at", "id"),
         # Índice para búsquedas por status
-        {"sqlite_autoincrement": True},
+        Index("ix_transactions_status_created_at_id", "status", "created_at", "id"),
+        Index(
+            "ix_transactions_currency_created_at_id", "currency", "created_at", "id"
+        ),
+        Index(
+            "ix_transactions_customer_email_created_at_id",
+            "customer_email",
+            "created_at",
+            "id",
+        ),
+        {
+            "sqlite_autoincrement": True,
+            "postgresql_partition_by": "RANGE (created_at)",
+        },
     )
+
+
+# Con create_all (benchmarks) se crean también las particiones iniciales
+event.listen(Transaction.__table__, "after_create", create_initial_partitions)
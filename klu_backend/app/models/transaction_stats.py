@@ -0,0 +1,19 @@
+from app.db.session import Base
+from sqlalchemy import BigInteger, Column, DateTime, Float, String
+
+
+class TransactionStatsBucket(Base):
+    """
+    Totales de transacciones por minuto u hora de creación, moneda y estado.
+    Los mantiene `app.tasks.stats_tasks` a partir de la tabla transactions;
+    GET /transactions/stats sólo lee esta tabla.
+    """
+
+    __tablename__ = "transaction_stats"
+
+    granularity = Column(String(8), primary_key=True)  # minute/hour
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    currency = Column(String(8), primary_key=True)
+    status = Column(String(16), primary_key=True)
+    count = Column(BigInteger, nullable=False)
+    amount_total = Column(Float, nullable=False)
@@ -0,0 +1,82 @@
+from typing import TYPE_CHECKING, Iterable
+
+from app.core.metrics import timed_query
+from app.models.card_bin import CardBin
+from app.models.transaction import utcnow
+from app.repositories.gateway_result_repository import DIALECT_INSERTS
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+if TYPE_CHECKING:
+    from app.services.card_bins import CardBinInfo
+
+# Orden de CardBinInfo: las consultas devuelven tuplas, sin instancias ORM
+CARD_BIN_COLUMNS = (
+    CardBin.bin,
+    CardBin.bank,
+    CardBin.brand,
+    CardBin.type,
+    CardBin.product,
+)
+GATEWAY = "gateway"
+IMPORT = "import"
+
+
+def card_bin_values(info: "CardBinInfo", source: str) -> dict:
+    return {
+        "bin": info.bin,
+        "bank": info.bank,
+        "brand": info.brand,
+        "type": info.type,
+        "product": info.product,
+        "source": source,
+        "updated_at": utcnow(),
+    }
+
+
+def build_find_query(prefixes: Iterable[str]):
+    return select(*CARD_BIN_COLUMNS).where(CardBin.bin.in_(list(prefixes)))
+
+
+class CardBinRepository:
+    @timed_query
+    def upsert_bins(self, db: Session, rows: list[dict]):
+        """
+        Inserta o actualiza un lote con un solo INSERT ... ON CONFLICT. Las
+        filas aprendidas de Blumonpay no reemplazan las importadas.
+        """
+        # PostgreSQL no acepta dos filas con la misma clave en un INSERT
+        rows = list({row["bin"]: row for row in rows}.values())
+        insert = DIALECT_INSERTS[db.get_bind().dialect.name]
+        statement = insert(CardBin)
+        columns = ("bank", "brand", "type", "product", "source", "updated_at")
+        statement = statement.on_conflict_do_update(
+            index_elements=["bin"],
+            set_={column: statement.excluded[column] for column in columns},
+            # Las filas importadas siempre reemplazan; las de Blumonpay sólo
+            # a otras de Blumonpay
+            where=(statement.excluded.source == IMPORT) | (CardBin.source == GATEWAY),
+        )
+        db.execute(statement, rows)
+        db.commit()
+
+    @timed_query
+    def find_bins(self, db: Session, prefixes: Iterable[str]) -> list[tuple]:
+        return list(db.execute(build_find_query(prefixes)).all())
+
+    @timed_query
+    def count_by_source(self, db: Session) -> dict[str, int]:
+        return dict(
+            db.execute(
+                select(CardBin.source, func.count()).group_by(CardBin.source)
+            ).all()
+        )
+
+
+class AsyncCardBinRepository:
+    """Variante de CardBinRepository para AsyncSession (API)"""
+
+    @timed_query
+    async def find_bins(self, db: AsyncSession, prefixes: Iterable[str]) -> list[tuple]:
+        return list((await db.execute(build_find_query(prefixes))).all())
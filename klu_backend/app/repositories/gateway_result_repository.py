@@ -0,0 +1,66 @@
+import uuid
+from typing import Optional
+
+from app.core.metrics import timed_query
+from app.models.gateway_result import TransactionGatewayResult
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# INSERT ... ON CONFLICT DO NOTHING por dialecto
+DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def gateway_result_values(transaction_id: uuid.UUID, payment_result: dict) -> dict:
+    """Fila de transaction_gateway_results a partir de `process_payment_sync`"""
+    card_info = payment_result.get("card_info") or {}
+    return {
+        "transaction_id": transaction_id,
+        "blumonpay_transaction_id": payment_result.get("transaction_id"),
+        "request_id": payment_result.get("request_id"),
+        "authorization_code": payment_result.get("authorization_code"),
+        "error_code": payment_result.get("error_code"),
+        "message": (payment_result.get("message") or "")[:255] or None,
+        "card_brand": card_info.get("brand"),
+        "card_bank": card_info.get("bank"),
+        "card_type": card_info.get("type"),
+        "card_product": card_info.get("product"),
+        "card_last_four": card_info.get("last_four"),
+        "gateway_timestamp": payment_result.get("timestamp"),
+        "raw_response": payment_result.get("raw_response"),
+    }
+
+
+class GatewayResultRepository:
+    @timed_query
+    def insert_results(self, db: Session, rows: list[dict]):
+        """
+        Inserta un lote en un solo INSERT. Una entrega repetida del cargo no
+        duplica ni falla el lote (ON CONFLICT DO NOTHING).
+        """
+        insert = DIALECT_INSERTS[db.get_bind().dialect.name]
+        db.execute(
+            insert(TransactionGatewayResult).on_conflict_do_nothing(
+                index_elements=["transaction_id"]
+            ),
+            rows,
+        )
+        db.commit()
+
+    @timed_query
+    def get_result(
+        self, db: Session, transaction_id: uuid.UUID
+    ) -> Optional[TransactionGatewayResult]:
+        return db.get(TransactionGatewayResult, transaction_id)
+
+    @timed_query
+    def find_by_authorization_code(
+        self, db: Session, authorization_code: str
+    ) -> list[TransactionGatewayResult]:
+        return list(
+            db.scalars(
+                select(TransactionGatewayResult).where(
+                    TransactionGatewayResult.authorization_code == authorization_code
+                )
+            ).all()
+        )
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from app.core.metrics import timed_query
+from app.models.idempotency_key import IdempotencyKey
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.orm import Session
+
+
+def build_delete_expired(now: datetime, client_key: str = None, key: str = None):
+    """Borra las claves vencidas; con `client_key` y `key`, sólo esa"""
+    statement = delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now)
+    if client_key is not None:
+        statement = statement.where(
+            IdempotencyKey.client_key == client_key, IdempotencyKey.key == key
+        )
+    return statement
+
+
+class IdempotencyKeyRepository:
+    @timed_query
+    def purge_expired(self, db: Session, now: datetime, limit: int) -> int:
+        """Borra hasta `limit` claves vencidas (ix_idempotency_keys_expires_at)"""
+        expired = (
+            select(IdempotencyKey.client_key, IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at <= now)
+            .limit(limit)
+        )
+        result = db.execute(
+            delete(IdempotencyKey).where(
+                tuple_(IdempotencyKey.client_key, IdempotencyKey.key).in_(expired)
+            )
+        )
+        db.commit()
+        return result.rowcount
+
+    @timed_query
+    def count(self, db: Session, now: datetime) -> dict[str, int]:
+        total, expired = db.execute(
+            select(
+                func.count(),
+                func.count().filter(IdempotencyKey.expires_at <= now),
+            )
+        ).one()
+        return {"total": total, "expired": expired}
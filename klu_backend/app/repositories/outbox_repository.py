@@ -0,0 +1,170 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from app.core.metrics import timed_query
+from app.models.payment_outbox import PaymentOutbox
+from app.models.transaction import utcnow
+from sqlalchemy import Row, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+def outbox_values(
+    transaction_id: uuid.UUID, created_at: datetime, queue: str, payload: dict
+) -> dict:
+    return {
+        "transaction_id": transaction_id,
+        "transaction_created_at": created_at,
+        "queue": queue,
+        "payload": payload,
+        "attempts": 0,
+        "created_at": utcnow(),
+    }
+
+
+def build_claim_query(limit: int):
+    """
+    Filas por publicar, en orden de llegada, bloqueadas hasta el commit. Las
+    que otro relay ya bloqueó se saltan (SKIP LOCKED en PostgreSQL; SQLite
+    ignora el bloqueo)
+    """
+    return (
+        select(PaymentOutbox)
+        .where(PaymentOutbox.published_at.is_(None))
+        .order_by(PaymentOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def build_mark_published(ids: list[int]):
+    return (
+        update(PaymentOutbox)
+        .where(PaymentOutbox.id.in_(ids))
+        .values(published_at=utcnow(), attempts=PaymentOutbox.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def build_delete_for_transaction(transaction_id: uuid.UUID):
+    return delete(PaymentOutbox).where(
+        PaymentOutbox.transaction_id == transaction_id
+    )
+
+
+class OutboxRepository:
+    @timed_query
+    def claim_unpublished(self, db: Session, limit: int) -> list[PaymentOutbox]:
+        """Ver `build_claim_query`; el bloqueo dura hasta `mark_published`"""
+        return list(db.scalars(build_claim_query(limit)).all())
+
+    @timed_query
+    def mark_published(self, db: Session, ids: list[int]):
+        db.execute(build_mark_published(ids))
+        db.commit()
+
+    @timed_query
+    def stale_queues(
+        self, db: Session, published_before: datetime, max_attempts: int
+    ) -> list[str]:
+        """Colas con filas publicadas antes de `published_before` sin tomar"""
+        return list(
+            db.scalars(
+                select(PaymentOutbox.queue)
+                .where(
+                    PaymentOutbox.published_at < published_before,
+                    PaymentOutbox.attempts < max_attempts,
+                )
+                .distinct()
+            ).all()
+        )
+
+    @timed_query
+    def rearm_stale(
+        self,
+        db: Session,
+        published_before: datetime,
+        max_attempts: int,
+        queues: list[str],
+    ) -> int:
+        """
+        Vuelve a dejar por publicar las filas de `queues` publicadas antes de
+        `published_before`: ningún worker tomó esas transacciones, así que
+        el mensaje se perdió en el broker.
+
+        Returns:
+            int: Filas que se volverán a publicar
+        """
+        if not queues:
+            return 0
+        result = db.execute(
+            update(PaymentOutbox)
+            .where(
+                PaymentOutbox.published_at < published_before,
+                PaymentOutbox.attempts < max_attempts,
+                PaymentOutbox.queue.in_(queues),
+            )
+            .values(published_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount
+
+    @timed_query
+    def delete_expired(self, db: Session, created_before: datetime) -> list[Row]:
+        """
+        Borra las filas creadas antes de `created_before`: su tarjeta ya no
+        está en Redis y no se pueden cobrar. No hace commit: se confirma con
+        el cambio de estado de sus transacciones.
+
+        Returns:
+            list: (transaction_id, payload, attempts) de las filas borradas
+        """
+        rows = db.execute(
+            delete(PaymentOutbox)
+            .where(PaymentOutbox.created_at < created_before)
+            .returning(
+                PaymentOutbox.transaction_id,
+                PaymentOutbox.payload,
+                PaymentOutbox.attempts,
+            )
+        ).all()
+        return list(rows)
+
+    @timed_query
+    def get_backlog(self, db: Session, max_attempts: int) -> dict:
+        """Filas por publicar, publicadas sin tomar y agotadas"""
+        unpublished, published, exhausted = db.execute(
+            select(
+                func.count().filter(PaymentOutbox.published_at.is_(None)),
+                func.count().filter(PaymentOutbox.published_at.is_not(None)),
+                func.count().filter(PaymentOutbox.attempts >= max_attempts),
+            )
+        ).one()
+        oldest: Optional[datetime] = db.scalar(
+            select(func.min(PaymentOutbox.created_at)).where(
+                PaymentOutbox.published_at.is_(None)
+            )
+        )
+        return {
+            "unpublished": unpublished,
+            "published": published,
+            "exhausted": exhausted,
+            "oldest_unpublished": oldest,
+        }
+
+
+class AsyncOutboxRepository:
+    """Variante de OutboxRepository para AsyncSession (relay de la API)"""
+
+    @timed_query
+    async def claim_unpublished(
+        self, db: AsyncSession, limit: int
+    ) -> list[PaymentOutbox]:
+        return list((await db.scalars(build_claim_query(limit))).all())
+
+    @timed_query
+    async def mark_published(self, db: AsyncSession, ids: list[int]):
+        await db.execute(build_mark_published(ids))
+        await db.commit()
@@ -0,0 +1,105 @@
+from datetime import datetime
+from typing import IO
+
+from app.core.metrics import timed_query
+from app.db.partitions import (
+    add_months,
+    attached_partitions,
+    detach_partition,
+    detached_partitions,
+    ensure_partitions,
+    is_partitioned,
+)
+from app.models.gateway_result import TransactionGatewayResult
+from app.models.idempotency_key import IdempotencyKey
+from app.models.transaction import Transaction
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+class TransactionArchiveRepository:
+    """
+    Particiones mensuales de transactions (PostgreSQL): crea las de los
+    próximos meses y separa, exporta y borra las que salen del periodo de
+    retención. Los nombres de tabla vienen de `app.db.partitions`, no del
+    usuario.
+    """
+
+    table = Transaction.__tablename__
+
+    def is_partitioned(self, db: Session) -> bool:
+        return is_partitioned(db.connection(), self.table)
+
+    @timed_query
+    def ensure_partitions(
+        self, db: Session, months_ahead: int, now: datetime = None
+    ) -> list[str]:
+        created = ensure_partitions(db.connection(), self.table, months_ahead, now)
+        db.commit()
+        return created
+
+    def list_partitions(self, db: Session) -> dict[str, tuple[datetime, bool]]:
+        """(mes, adjunta) de cada partición mensual, incluidas las separadas"""
+        connection = db.connection()
+        partitions = {
+            name: (month, False)
+            for name, month in detached_partitions(connection, self.table).items()
+        }
+        for name, month in attached_partitions(connection, self.table).items():
+            partitions[name] = (month, True)
+        return dict(sorted(partitions.items(), key=lambda item: item[1][0]))
+
+    def expired_partitions(self, db: Session, cutoff: datetime) -> list[str]:
+        """Particiones cuyo mes termina antes de `cutoff`, la más antigua primero"""
+        return [
+            name
+            for name, (month, _) in self.list_partitions(db).items()
+            if add_months(month, 1) <= cutoff
+        ]
+
+    @timed_query
+    def detach_partition(self, db: Session, name: str):
+        """Separa la partición de la tabla; las consultas dejan de verla"""
+        if name in attached_partitions(db.connection(), self.table):
+            detach_partition(db.connection(), self.table, name)
+        db.commit()
+
+    def copy_partition(self, db: Session, name: str, file: IO[str]):
+        """Copia la partición (ya separada) a `file` como CSV con cabecera"""
+        self._copy(db, f"SELECT * FROM {name} ORDER BY created_at, id", file)
+
+    def copy_gateway_results(self, db: Session, name: str, file: IO[str]):
+        """Respuestas de Blumonpay de las transacciones de la partición"""
+        self._copy(
+            db,
+            f"SELECT g.* FROM {TransactionGatewayResult.__tablename__} g "
+            f"JOIN {name} t ON t.id = g.transaction_id ORDER BY g.created_at",
+            file,
+        )
+
+    def _copy(self, db: Session, query: str, file: IO[str]):
+        # COPY ... TO STDOUT escribe en el archivo sin cargar las filas en memoria
+        cursor = db.connection().connection.driver_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", file
+            )
+        finally:
+            cursor.close()
+        db.commit()
+
+    @timed_query
+    def drop_partition(self, db: Session, name: str):
+        """
+        Borra la partición separada y las filas que la referencian (no hay
+        claves foráneas hacia una tabla particionada)
+        """
+        for dependent in (TransactionGatewayResult, IdempotencyKey):
+            db.execute(
+                text(
+                    f"DELETE FROM {dependent.__tablename__} "
+                    f"WHERE transaction_id IN (SELECT id FROM {name})"
+                )
+            )
+        db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
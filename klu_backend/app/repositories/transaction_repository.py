@@ -1,47 +1,650 @@
+import base64
+import json
 import uuid
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, AsyncIterator, Optional
 
-from app.models.transaction import Transaction
-from app.schemas.transaction import TransactionCreate
+from app.core.metrics import timed_query
+from app.models.idempotency_key import IdempotencyKey
+from app.models.payment_outbox import PaymentOutbox
+from app.models.transaction import (
+    ID_TIME_TOLERANCE,
+    Transaction,
+    TransactionStatus,
+    source_statuses,
+    utcnow,
+    uuid7,
+    uuid7_time,
+)
+from app.repositories.idempotency_key_repository import build_delete_expired
+from app.repositories.outbox_repository import (
+    build_delete_for_transaction,
+    outbox_values,
+)
+from app.schemas.serialization import TRANSACTION_RESPONSE_FIELDS, dump_transaction
+from app.services.transaction_cache import TransactionCache
+from app.services.transaction_events import TransactionEventPublisher
+from app.services.transaction_stats import TransactionStatsTracker
+from sqlalchemy import (
+    Row,
+    Select,
+    column,
+    func,
+    insert,
+    select,
+    text,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+if TYPE_CHECKING:
+    # Sólo para anotaciones: el worker no carga los esquemas de la API
+    from app.schemas.transaction import TransactionBase, TransactionCreate
+    from app.services.card_bins import CardBinInfo
 
-class TransactionRepository:
-    def create_transaction(self, db: Session, transaction: TransactionCreate) -> Transaction:
-        db_transaction = Transaction(
-            amount=transaction.amount,
-            currency=transaction.currency,
-            customer_email=transaction.customerInformation.email,
-            customer_name="{first_name} {last_name}".format(
-                first_name=transaction.customerInformation.firstName,
-                last_name=transaction.customerInformation.lastName,
+# Columnas de la respuesta, en orden, para leer tuplas sin cargar entidades
+RESPONSE_COLUMNS = [
+    Transaction.__table__.c[field] for field in TRANSACTION_RESPONSE_FIELDS
+]
+
+
+class InvalidCursorError(ValueError):
+    """Cursor de paginación mal formado o manipulado"""
+    pass
+
+
+def encode_cursor(created_at: datetime, transaction_id: uuid.UUID) -> str:
+    """Codifica la posición (created_at, id) como un cursor opaco"""
+    raw = json.dumps([created_at.isoformat(), transaction_id.hex])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, transaction_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), uuid.UUID(hex=transaction_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+
+def transaction_values(
+    transaction: "TransactionBase", card_bin: Optional["CardBinInfo"] = None
+) -> dict:
+    return {
+        "amount": transaction.amount,
+        "currency": transaction.currency,
+        "customer_email": transaction.customerInformation.email,
+        "customer_name": "{first_name} {last_name}".format(
+            first_name=transaction.customerInformation.firstName,
+            last_name=transaction.customerInformation.lastName,
+        ),
+        "status": TransactionStatus.PENDING,
+        "card_brand": card_bin.brand if card_bin else None,
+        "card_type": card_bin.type if card_bin else None,
+    }
+
+
+def created_at_bounds(transaction_ids: list[uuid.UUID]) -> list:
+    """
+    Rango de created_at que corresponde a ids UUIDv7. Acotar la búsqueda por
+    id con este rango hace que PostgreSQL sólo abra las particiones del mes
+    de esas transacciones. Con ids de otra versión (uuid4 anteriores a la
+    migración) no se agrega ninguna condición.
+    """
+    times = [uuid7_time(transaction_id) for transaction_id in transaction_ids]
+    if not times or None in times:
+        return []
+    return [
+        Transaction.created_at >= min(times) - ID_TIME_TOLERANCE,
+        Transaction.created_at < max(times) + ID_TIME_TOLERANCE,
+    ]
+
+
+def transaction_id_filter(transaction_id: uuid.UUID) -> list:
+    return [Transaction.id == transaction_id, *created_at_bounds([transaction_id])]
+
+
+def build_transaction(
+    transaction: "TransactionCreate", card_bin: Optional["CardBinInfo"] = None
+) -> Transaction:
+    return Transaction(**transaction_values(transaction, card_bin))
+
+
+def build_list_query(
+    limit: int,
+    cursor: Optional[str] = None,
+    status: Optional[TransactionStatus] = None,
+    currency: Optional[str] = None,
+    customer_email: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    columns: Optional[list] = None,
+) -> Select:
+    """
+    Consulta paginada keyset sobre (created_at, id), de la más reciente a la
+    más antigua. Pide `limit + 1` filas para saber si hay otra página.
+    Con `columns` se seleccionan esas columnas en lugar de la entidad.
+    """
+    query = select(*columns) if columns else select(Transaction)
+    if status is not None:
+        query = query.where(Transaction.status == status)
+    if currency is not None:
+        query = query.where(Transaction.currency == currency)
+    if customer_email is not None:
+        query = query.where(Transaction.customer_email == customer_email)
+    if created_from is not None:
+        query = query.where(Transaction.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(Transaction.created_at < created_to)
+    if cursor is not None:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(Transaction.created_at, Transaction.id)
+            < tuple_(cursor_created_at, cursor_id)
+        )
+    return query.order_by(
+        Transaction.created_at.desc(), Transaction.id.desc()
+    ).limit(limit + 1)
+
+
+def build_status_update(
+    transaction_id: uuid.UUID,
+    status: TransactionStatus,
+    blumonpay_transaction_id: Optional[str] = None,
+):
+    """UPDATE condicional a que la transición esté permitida"""
+    new_values = {"status": status}
+    if blumonpay_transaction_id:
+        new_values["blumonpay_transaction_id"] = blumonpay_transaction_id
+    # Se devuelven columnas y no la entidad: el commit no las expira, así
+    # que leerlas después no hace otro SELECT
+    return (
+        update(Transaction)
+        .where(
+            *transaction_id_filter(transaction_id),
+            Transaction.status.in_(source_statuses(status)),
+        )
+        .values(**new_values)
+        .returning(*Transaction.__table__.columns)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def build_values_update(status: TransactionStatus, items: list[dict]):
+    """
+    Un solo UPDATE ... FROM (VALUES ...) para llevar varias transacciones a
+    `status` (PostgreSQL)
+    """
+    table = Transaction.__table__
+    updates = values(
+        column("id", table.c.id.type),
+        column("blumonpay_transaction_id", table.c.blumonpay_transaction_id.type),
+        name="updates",
+    ).data(
+        [
+            (item["transaction_id"], item.get("blumonpay_transaction_id"))
+            for item in items
+        ]
+    )
+    return (
+        update(table)
+        .where(
+            table.c.id == updates.c.id,
+            table.c.status.in_(source_statuses(status)),
+            *created_at_bounds([item["transaction_id"] for item in items]),
+        )
+        .values(
+            status=status,
+            blumonpay_transaction_id=func.coalesce(
+                updates.c.blumonpay_transaction_id, table.c.blumonpay_transaction_id
             ),
-            status="pending",
         )
+        .returning(*table.columns)
+    )
+
+
+def split_page(
+    rows: list[Transaction | Row], limit: int
+) -> tuple[list[Transaction | Row], Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.created_at, last.id)
+
+
+class TransactionRepository:
+    def __init__(
+        self,
+        cache: Optional[TransactionCache] = None,
+        events: Optional[TransactionEventPublisher] = None,
+        stats: Optional[TransactionStatsTracker] = None,
+    ):
+        self.cache = cache
+        self.events = events
+        self.stats = stats
+
+    @timed_query
+    def create_transaction(
+        self, db: Session, transaction: "TransactionCreate"
+    ) -> Transaction:
+        db_transaction = build_transaction(transaction)
         db.add(db_transaction)
         db.commit()
         db.refresh(db_transaction)
+        if self.stats is not None:
+            self.stats.mark_sync([db_transaction.created_at])
+        return db_transaction
+
+    @timed_query
+    def claim_transaction(
+        self, db: Session, transaction_id: uuid.UUID
+    ) -> Optional[Row]:
+        """
+        Toma la transacción para cobrarla (pending → processing, como
+        `update_transaction_status`) y borra en el mismo commit su fila de
+        payment_outbox: el mensaje llegó a un worker y el sweeper ya no debe
+        volver a publicarlo. Se borra también si no se pudo tomar (entrega
+        repetida o transacción inexistente).
+
+        Returns:
+            Row: La fila actualizada, o None si no estaba en `pending`
+        """
+        query = build_status_update(transaction_id, TransactionStatus.PROCESSING)
+        db_transaction = db.execute(query).one_or_none()
+        db.execute(build_delete_for_transaction(transaction_id))
+        db.commit()
+        if db_transaction is None:
+            return None
+        self.notify_updated([db_transaction])
+        return db_transaction
+
+    @timed_query
+    def requeue_transaction(
+        self,
+        db: Session,
+        transaction_id: uuid.UUID,
+        payment_data: dict,
+        queue: str,
+        available_at: datetime,
+    ) -> Optional[Row]:
+        """
+        Devuelve la transacción a `pending` y, en el mismo commit, registra
+        en payment_outbox el cargo que quien llama publica en `queue` (un
+        reintento del worker o un reenvío de la dead-letter queue). La fila
+        cuenta como publicada desde `available_at`: si la publicación falla,
+        ningún worker la toma y el sweeper la vuelve a publicar después de
+        OUTBOX_REDELIVER_AFTER_SECONDS; la transacción no queda en `pending`
+        sin mensaje.
+
+        Returns:
+            Row: La fila actualizada, o None si no podía volver a `pending`
+        """
+        query = build_status_update(transaction_id, TransactionStatus.PENDING)
+        db_transaction = db.execute(query).one_or_none()
+        if db_transaction is None:
+            db.rollback()
+            return None
+        db.execute(
+            insert(PaymentOutbox),
+            {
+                **outbox_values(
+                    transaction_id, db_transaction.created_at, queue, payment_data
+                ),
+                "attempts": 1,
+                "published_at": available_at,
+            },
+        )
+        db.commit()
+        self.notify_updated([db_transaction])
         return db_transaction
 
+    @timed_query
     def update_transaction_status(
         self,
         db: Session,
         transaction_id: uuid.UUID,
-        status: str,
+        status: TransactionStatus,
         blumonpay_transaction_id: str = None,
-    ):
-        db_transaction = (
-            db.query(Transaction).filter(Transaction.id == transaction_id).first()
-        )
-        if db_transaction:
-            db_transaction.status = status
-            if blumonpay_transaction_id:
-                db_transaction.blumonpay_transaction_id = blumonpay_transaction_id
-            db.commit()
-            db.refresh(db_transaction)
+    ) -> Optional[Row]:
+        """
+        Cambia el estado con un solo `UPDATE ... WHERE status IN (...)
+        RETURNING`, sólo si la transición está permitida desde el estado
+        actual (ALLOWED_TRANSITIONS). Una tarea repetida o concurrente no
+        puede pisar un estado final.
+
+        Returns:
+            Row: La fila actualizada, o None si no existe o la transición
+            no aplica desde su estado actual
+        """
+        query = build_status_update(transaction_id, status, blumonpay_transaction_id)
+        db_transaction = db.execute(query).one_or_none()
+        db.commit()
+        if db_transaction is None:
+            return None
+        self.notify_updated([db_transaction])
         return db_transaction
 
+    @timed_query
+    def update_transaction_statuses(
+        self, db: Session, updates: list[dict]
+    ) -> list[Row]:
+        """
+        Aplica varios cambios de estado en una sola transacción de base de
+        datos (un commit). Cada elemento tiene `transaction_id`, `status` y
+        opcionalmente `blumonpay_transaction_id`; como en
+        `update_transaction_status`, los que no aplican desde el estado
+        actual se ignoran.
+
+        En PostgreSQL cada estado destino es un solo
+        `UPDATE ... FROM (VALUES ...) RETURNING`; en otros motores, un UPDATE
+        por fila dentro de la misma transacción.
+
+        Returns:
+            list: Las filas actualizadas
+        """
+        by_status: dict[TransactionStatus, list[dict]] = {}
+        for item in updates:
+            by_status.setdefault(item["status"], []).append(item)
+
+        updated = []
+        for status, items in by_status.items():
+            if db.get_bind().dialect.name == "postgresql":
+                updated.extend(db.execute(build_values_update(status, items)).all())
+                continue
+            for item in items:
+                query = build_status_update(
+                    item["transaction_id"],
+                    status,
+                    item.get("blumonpay_transaction_id"),
+                )
+                db_transaction = db.execute(query).one_or_none()
+                if db_transaction is not None:
+                    updated.append(db_transaction)
+        db.commit()
+        self.notify_updated(updated)
+        return updated
+
+    def notify_updated(self, db_transactions: list[Row]):
+        """
+        Invalida la caché, publica el nuevo estado de cada transacción y marca
+        sus minutos para el rollup de estadísticas
+        """
+        if self.stats is not None:
+            self.stats.mark_sync(
+                [db_transaction.created_at for db_transaction in db_transactions]
+            )
+        for db_transaction in db_transactions:
+            if self.cache is not None:
+                self.cache.invalidate_sync(db_transaction.id)
+            if self.events is not None:
+                body = dump_transaction(db_transaction).decode()
+                self.events.publish_sync(db_transaction.id, body)
+
+    @timed_query
     def get_transaction(self, db: Session, transaction_id: uuid.UUID):
-        return db.query(Transaction).filter(Transaction.id == transaction_id).first()
+        return (
+            db.query(Transaction)
+            .filter(*transaction_id_filter(transaction_id))
+            .first()
+        )
+
+    @timed_query
+    def list_transactions(
+        self,
+        db: Session,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        status: Optional[TransactionStatus] = None,
+        currency: Optional[str] = None,
+        customer_email: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> tuple[list[Transaction], Optional[str]]:
+        """
+        Lista transacciones de la más reciente a la más antigua usando
+        paginación keyset sobre (created_at, id).
+
+        Returns:
+            tuple: (transacciones, cursor de la siguiente página o None)
+        """
+        query = build_list_query(
+            limit,
+            cursor=cursor,
+            status=status,
+            currency=currency,
+            customer_email=customer_email,
+            created_from=created_from,
+            created_to=created_to,
+        )
+        return split_page(list(db.scalars(query).all()), limit)
+
+
+class AsyncTransactionRepository:
+    """Variante de TransactionRepository para AsyncSession (ruta de la API)"""
+
+    def __init__(self, stats: Optional[TransactionStatsTracker] = None):
+        self.stats = stats
+
+    @timed_query
+    async def create_transaction(
+        self,
+        db: AsyncSession,
+        transaction: "TransactionCreate",
+        idempotency_key: Optional[str] = None,
+        request_hash: Optional[str] = None,
+        payment_data: Optional[dict] = None,
+        queue: Optional[str] = None,
+        card_bin: Optional["CardBinInfo"] = None,
+        client_key: Optional[str] = None,
+        idempotency_ttl: Optional[timedelta] = None,
+    ) -> Transaction:
+        """
+        Crea la transacción y, en la misma transacción de base de datos,
+        registra `idempotency_key` de `client_key` (vigente `idempotency_ttl`)
+        y el cargo a publicar en `queue` (payment_outbox) si se reciben.
+        `card_bin` completa la marca y el tipo de la tarjeta.
+
+        Raises:
+            IntegrityError: Si la clave de idempotencia ya existe y no venció
+        """
+        db_transaction = build_transaction(transaction, card_bin)
+        # Los defaults de id y created_at se aplican aquí: las filas que los
+        # referencian se insertan en el mismo flush, sin otro viaje a la base
+        # de datos
+        db_transaction.id = uuid7()
+        db_transaction.created_at = utcnow()
+        db.add(db_transaction)
+        if idempotency_key:
+            # Una clave vencida que el job todavía no borró se reutiliza
+            await db.execute(
+                build_delete_expired(
+                    db_transaction.created_at, client_key, idempotency_key
+                )
+            )
+            db.add(
+                IdempotencyKey(
+                    client_key=client_key,
+                    key=idempotency_key,
+                    transaction_id=db_transaction.id,
+                    request_hash=request_hash,
+                    created_at=db_transaction.created_at,
+                    expires_at=db_transaction.created_at + idempotency_ttl,
+                )
+            )
+        if payment_data is not None:
+            db.add(
+                PaymentOutbox(
+                    **outbox_values(
+                        db_transaction.id,
+                        db_transaction.created_at,
+                        queue,
+                        payment_data,
+                    )
+                )
+            )
+        await db.commit()
+        # id y created_at se generan en Python y la sesión no expira los
+        # atributos al hacer commit, así que no hace falta otro SELECT
+        if self.stats is not None:
+            await self.stats.mark([db_transaction.created_at])
+        return db_transaction
+
+    @timed_query
+    async def create_transactions(
+        self,
+        db: AsyncSession,
+        transactions: list["TransactionBase"],
+        payloads: Optional[list[dict]] = None,
+        queue: Optional[str] = None,
+        card_bins: Optional[list[Optional["CardBinInfo"]]] = None,
+    ) -> list[Transaction]:
+        """
+        Inserta varias transacciones en un solo INSERT ... RETURNING y un
+        solo commit. Devuelve las filas en el mismo orden de entrada.
+
+        Con `payloads` (uno por transacción) registra en el mismo commit los
+        cargos a publicar en `queue` (payment_outbox). `card_bins` (uno por
+        transacción) completa la marca y el tipo de cada tarjeta.
+        """
+        if not transactions:
+            return []
+        card_bins = card_bins or [None] * len(transactions)
+        result = await db.scalars(
+            insert(Transaction).returning(Transaction, sort_by_parameter_order=True),
+            [
+                transaction_values(transaction, card_bin)
+                for transaction, card_bin in zip(transactions, card_bins)
+            ],
+        )
+        db_transactions = list(result.all())
+        if payloads is not None:
+            await db.execute(
+                insert(PaymentOutbox),
+                [
+                    outbox_values(
+                        db_transaction.id, db_transaction.created_at, queue, payload
+                    )
+                    for db_transaction, payload in zip(db_transactions, payloads)
+                ],
+            )
+        await db.commit()
+        if self.stats is not None:
+            await self.stats.mark(
+                [db_transaction.created_at for db_transaction in db_transactions]
+            )
+        return db_transactions
+
+    @timed_query
+    async def get_transaction(
+        self, db: AsyncSession, transaction_id: uuid.UUID
+    ) -> Optional[Transaction]:
+        return await db.scalar(
+            select(Transaction).where(*transaction_id_filter(transaction_id))
+        )
+
+    @timed_query
+    async def get_idempotency_key(
+        self, db: AsyncSession, client_key: str, key: str
+    ) -> Optional[IdempotencyKey]:
+        return await db.get(IdempotencyKey, (client_key, key))
+
+    @timed_query
+    async def list_transactions(
+        self,
+        db: AsyncSession,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        status: Optional[TransactionStatus] = None,
+        currency: Optional[str] = None,
+        customer_email: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> tuple[list[Transaction], Optional[str]]:
+        query = build_list_query(
+            limit,
+            cursor=cursor,
+            status=status,
+            currency=currency,
+            customer_email=customer_email,
+            created_from=created_from,
+            created_to=created_to,
+        )
+        rows = (await db.scalars(query)).all()
+        return split_page(list(rows), limit)
+
+    @timed_query
+    async def get_transaction_row(
+        self, db: AsyncSession, transaction_id: uuid.UUID
+    ) -> Optional[Row]:
+        """Columnas RESPONSE_COLUMNS de la transacción, sin cargar la entidad"""
+        result = await db.execute(
+            select(*RESPONSE_COLUMNS).where(*transaction_id_filter(transaction_id))
+        )
+        return result.first()
+
+    @timed_query
+    async def list_transaction_rows(
+        self,
+        db: AsyncSession,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        status: Optional[TransactionStatus] = None,
+        currency: Optional[str] = None,
+        customer_email: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> tuple[list[Row], Optional[str]]:
+        """
+        Como `list_transactions` pero devuelve tuplas RESPONSE_COLUMNS: sin
+        identity map ni instancias ORM, para serializarlas directamente
+        """
+        query = build_list_query(
+            limit,
+            cursor=cursor,
+            status=status,
+            currency=currency,
+            customer_email=customer_email,
+            created_from=created_from,
+            created_to=created_to,
+            columns=RESPONSE_COLUMNS,
+        )
+        rows = (await db.execute(query)).all()
+        return split_page(list(rows), limit)
+
+    async def stream_transactions(
+        self,
+        db: AsyncSession,
+        batch_size: int,
+        status: Optional[TransactionStatus] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        statement_timeout_ms: Optional[int] = None,
+    ) -> AsyncIterator[list[Row]]:
+        """
+        Recorre las transacciones de la más antigua a la más reciente con un
+        cursor del lado del servidor, en bloques de `batch_size` filas. Se
+        leen columnas y no entidades: no pasan por el identity map de la
+        sesión y la memoria no crece con el total.
+        """
+        query = select(*Transaction.__table__.columns)
+        if status is not None:
+            query = query.where(Transaction.status == status)
+        if created_from is not None:
+            query = query.where(Transaction.created_at >= created_from)
+        if created_to is not None:
+            query = query.where(Transaction.created_at < created_to)
+        query = query.order_by(Transaction.created_at, Transaction.id)
 
-    def list_transactions(self, db: Session, skip: int = 0, limit: int = 100):
-        return db.query(Transaction).offset(skip).limit(limit).all()
+        if statement_timeout_ms is not None and db.bind.dialect.name == "postgresql":
+            # El cursor vive lo que dure la descarga, no DB_STATEMENT_TIMEOUT_MS
+            await db.execute(
+                text(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}")
+            )
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for partition in result.partitions():
+            yield partition
@@ -0,0 +1,140 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+from app.core.metrics import timed_query
+from app.models.transaction import Transaction
+from app.models.transaction_stats import TransactionStatsBucket
+from app.services.transaction_stats import HOUR, hour_bucket, minute_bucket
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+def hours_between(start: datetime, end: datetime) -> list[datetime]:
+    """Horas que se solapan con [start, end)"""
+    hours = []
+    hour = hour_bucket(start)
+    while hour < end:
+        hours.append(hour)
+        hour += HOUR
+    return hours
+
+
+class TransactionStatsRepository:
+    @timed_query
+    def rebuild(self, db: Session, start: datetime, end: datetime, batch_size=5000):
+        """
+        Recalcula los buckets de minuto de [start, end) (alineados al minuto)
+        desde transactions, y las horas que los contienen desde los minutos.
+        Cada llamada es una sola transacción de base de datos.
+        """
+        totals: dict[tuple, list] = defaultdict(lambda: [0, 0.0])
+        rows = db.execute(
+            select(
+                Transaction.created_at,
+                Transaction.currency,
+                Transaction.status,
+                Transaction.amount,
+            )
+            .where(Transaction.created_at >= start, Transaction.created_at < end)
+            .execution_options(yield_per=batch_size)
+        )
+        for created_at, currency, status, amount in rows:
+            bucket = totals[(minute_bucket(created_at), currency, str(status))]
+            bucket[0] += 1
+            bucket[1] += amount
+
+        db.execute(
+            delete(TransactionStatsBucket).where(
+                TransactionStatsBucket.granularity == "minute",
+                TransactionStatsBucket.bucket_start >= start,
+                TransactionStatsBucket.bucket_start < end,
+            )
+        )
+        if totals:
+            db.execute(
+                insert(TransactionStatsBucket),
+                [
+                    {
+                        "granularity": "minute",
+                        "bucket_start": bucket_start,
+                        "currency": currency,
+                        "status": status,
+                        "count": count,
+                        "amount_total": amount_total,
+                    }
+                    for (bucket_start, currency, status), (count, amount_total)
+                    in totals.items()
+                ],
+            )
+
+        for hour in hours_between(start, end):
+            self._rebuild_hour(db, hour)
+        db.commit()
+
+    def _rebuild_hour(self, db: Session, hour: datetime):
+        minute_rows = db.execute(
+            select(
+                TransactionStatsBucket.currency,
+                TransactionStatsBucket.status,
+                func.sum(TransactionStatsBucket.count),
+                func.sum(TransactionStatsBucket.amount_total),
+            )
+            .where(
+                TransactionStatsBucket.granularity == "minute",
+                TransactionStatsBucket.bucket_start >= hour,
+                TransactionStatsBucket.bucket_start < hour + HOUR,
+            )
+            .group_by(TransactionStatsBucket.currency, TransactionStatsBucket.status)
+        ).all()
+        db.execute(
+            delete(TransactionStatsBucket).where(
+                TransactionStatsBucket.granularity == "hour",
+                TransactionStatsBucket.bucket_start == hour,
+            )
+        )
+        if minute_rows:
+            db.execute(
+                insert(TransactionStatsBucket),
+                [
+                    {
+                        "granularity": "hour",
+                        "bucket_start": hour,
+                        "currency": currency,
+                        "status": status,
+                        "count": count,
+                        "amount_total": amount_total,
+                    }
+                    for currency, status, count, amount_total in minute_rows
+                ],
+            )
+
+    @timed_query
+    def get_first_created_at(self, db: Session) -> Optional[datetime]:
+        return db.scalar(select(func.min(Transaction.created_at)))
+
+
+class AsyncTransactionStatsRepository:
+    @timed_query
+    async def list_buckets(
+        self,
+        db: AsyncSession,
+        granularity: str,
+        start: datetime,
+        end: datetime,
+        currency: Optional[str] = None,
+    ) -> list[TransactionStatsBucket]:
+        query = select(TransactionStatsBucket).where(
+            TransactionStatsBucket.granularity == granularity,
+            TransactionStatsBucket.bucket_start >= start,
+            TransactionStatsBucket.bucket_start < end,
+        )
+        if currency is not None:
+            query = query.where(TransactionStatsBucket.currency == currency)
+        query = query.order_by(
+            TransactionStatsBucket.bucket_start,
+            TransactionStatsBucket.currency,
+            TransactionStatsBucket.status,
+        )
+        return list((await db.scalars(query)).all())
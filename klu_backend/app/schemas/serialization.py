@@ -0,0 +1,75 @@
+"""
+Serialización de filas de transactions sin pydantic. El worker publica el
+estado de cada transacción con estas funciones y no importa los esquemas
+de la API (pydantic, email-validator).
+"""
+from typing import Iterable, Sequence
+
+import orjson
+
+from app.models.transaction import as_utc
+
+# Campos de TransactionCreateResponse en orden de salida. Los repositorios
+# seleccionan estas columnas para la ruta rápida de lectura; si cambia el
+# esquema, `benchmarks.bench_serialization` compara los dos JSON
+TRANSACTION_RESPONSE_FIELDS = (
+    "amount",
+    "currency",
+    "customer_email",
+    "customer_name",
+    "id",
+    "status",
+    "blumonpay_transaction_id",
+    "created_at",
+    "card_brand",
+    "card_type",
+)
+
+
+def transaction_row_dict(row: Sequence) -> dict:
+    """
+    Fila de columnas TRANSACTION_RESPONSE_FIELDS como el dict que produce
+    TransactionCreateResponse, sin validarla: viene de la base de datos
+    """
+    (
+        amount,
+        currency,
+        customer_email,
+        customer_name,
+        transaction_id,
+        transaction_status,
+        blumonpay_transaction_id,
+        created_at,
+        card_brand,
+        card_type,
+    ) = row
+    return {
+        "amount": amount,
+        "currency": currency,
+        "customer_email": customer_email,
+        "customer_name": customer_name,
+        "id": str(transaction_id),
+        "status": str(transaction_status),
+        "blumonpay_transaction_id": blumonpay_transaction_id,
+        # Siempre en UTC con zona: SQLite la pierde al leer la fila
+        "created_at": as_utc(created_at).isoformat(),
+        "card_brand": card_brand,
+        "card_type": card_type,
+    }
+
+
+def dump_transaction_row(row: Sequence) -> bytes:
+    """Mismo JSON que TransactionCreateResponse.model_dump_json()"""
+    return orjson.dumps(transaction_row_dict(row))
+
+
+def dump_transaction_rows(rows: Iterable[Sequence]) -> bytes:
+    """Mismo JSON que la respuesta de una lista de TransactionCreateResponse"""
+    return orjson.dumps([transaction_row_dict(row) for row in rows])
+
+
+def dump_transaction(transaction) -> bytes:
+    """Entidad o fila completa de transactions (con columnas por atributo)"""
+    return dump_transaction_row(
+        [getattr(transaction, field) for field in TRANSACTION_RESPONSE_FIELDS]
+    )
@@ -1,7 +1,8 @@
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Any, Literal, Optional
 
+from app.models.transaction import TransactionStatus, as_utc
 from pydantic import BaseModel, EmailStr, Field, IPvAnyAddress
 
 
@@ -34,7 +35,8 @@ class CardInfo(BaseModel):
 
 class TransactionBase(BaseModel):
     amount: float = Field(..., gt=0)
-    currency: str
+    # Código ISO 4217; transaction_stats lo guarda en VARCHAR(8)
+    currency: str = Field(..., pattern=r"^[A-Z]{3}$")
     customerInformation: CustomerInfo
 
 
@@ -55,12 +57,49 @@ class CardPaymentRequest(TransactionBase):
 
 class TransactionCreateResponse(TransactionBaseResponse):
     id: uuid.UUID
-    status: str
+    status: TransactionStatus
     blumonpay_transaction_id: Optional[str] = None
     created_at: datetime
+    card_brand: Optional[str] = None
+    card_type: Optional[str] = None
 
     class Config:
         from_attributes = True
         json_encoders = {
-            datetime: lambda dt: dt.isoformat(),
+            datetime: lambda dt: as_utc(dt).isoformat(),
         }
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    id: Optional[uuid.UUID] = None
+    status: Optional[TransactionStatus] = None
+    errors: Optional[list[dict[str, Any]]] = None
+
+
+class BatchTransactionResponse(BaseModel):
+    accepted: int
+    rejected: int
+    items: list[BatchItemResult]
+
+
+class StatusTotals(BaseModel):
+    count: int
+    amount_total: float
+
+
+class TransactionStatsBucketResponse(BaseModel):
+    bucket_start: datetime
+    currency: str
+    count: int
+    amount_total: float
+    # completed / (completed + declined); None si no hay cargos finalizados
+    approval_rate: Optional[float] = None
+    by_status: dict[TransactionStatus, StatusTotals]
+
+
+class TransactionStatsResponse(BaseModel):
+    granularity: Literal["minute", "hour"]
+    created_from: datetime
+    created_to: datetime
+    buckets: list[TransactionStatsBucketResponse]
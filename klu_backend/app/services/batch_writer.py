@@ -0,0 +1,108 @@
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """
+    Acumula filas en memoria y las escribe en bloque con `write_batch` cuando
+    hay `batch_size` filas o cada `flush_interval` segundos, en lugar de un
+    INSERT o UPDATE y un commit por cargo.
+
+    Es por proceso: el hilo de escritura se inicia con la primera fila (ya
+    después del fork del pool prefork) y con el pool gevent es un greenlet.
+    Si la escritura falla las filas de `add` se conservan para el siguiente
+    intento, hasta `max_pending`; las más antiguas se descartan y se registra
+    el error. Las de `submit` no se reintentan: el error se entrega a quien
+    espera el resultado.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        write_batch: Callable[[list[Any]], None],
+        batch_size: int,
+        flush_interval: float,
+        max_pending: int = None,
+    ):
+        self.name = name
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending or batch_size * 10
+        self._pending: list[tuple[Any, Optional[Future]]] = []
+        self._lock = threading.Lock()
+        # Serializa las escrituras: el flush del hilo y el de un lote lleno
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.stats = {"added": 0, "written": 0, "batches": 0, "errors": 0, "dropped": 0}
+
+    def add(self, item: Any):
+        """Encola la fila sin esperar a que se escriba"""
+        self._enqueue(item, None)
+
+    def submit(self, item: Any) -> Future:
+        """Encola la fila; el Future se resuelve cuando el bloque se escribió"""
+        future = Future()
+        self._enqueue(item, future)
+        return future
+
+    def _enqueue(self, item: Any, future: Optional[Future]):
+        with self._lock:
+            self._pending.append((item, future))
+            self.stats["added"] += 1
+            full = len(self._pending) >= self.batch_size
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.name}-writer", daemon=True
+                )
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Escribe todas las filas pendientes"""
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                self.write_batch([item for item, _ in batch])
+            except Exception as e:
+                logger.exception(f"Could not write {len(batch)} {self.name} rows")
+                retained = []
+                for item, future in batch:
+                    if future is None:
+                        retained.append((item, None))
+                    else:
+                        future.set_exception(e)
+                with self._lock:
+                    self.stats["errors"] += 1
+                    self._pending = retained + self._pending
+                    overflow = len(self._pending) - self.max_pending
+                    if overflow > 0:
+                        del self._pending[:overflow]
+                        self.stats["dropped"] += overflow
+                        logger.error(f"Dropped {overflow} {self.name} rows")
+                return
+            with self._lock:
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+            for _, future in batch:
+                if future is not None:
+                    future.set_result(None)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "pending": len(self._pending)}
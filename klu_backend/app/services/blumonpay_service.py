@@ -1,22 +1,54 @@
 import hashlib
 import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
 
-import httpx
 import requests
+from requests.adapters import HTTPAdapter
 from requests_toolbelt import MultipartEncoder
+from urllib3.exceptions import NewConnectionError
 
 from app.core.config import settings
-from app.schemas.transaction import CardPaymentRequest
+from app.core.metrics import BLUMONPAY_REQUEST_SECONDS, observe
 import base64
 
+if TYPE_CHECKING:
+    from app.schemas.transaction import CardPaymentRequest
+
 logger = logging.getLogger("uvicorn")
 logger.setLevel(logging.DEBUG)
 
 
 
+# Respuestas en las que Blumonpay no procesó el cargo y se puede reintentar.
+# 502 y 504 no: el proxy pudo haber entregado el cargo antes de fallar
+RETRYABLE_STATUS_CODES = {429, 503}
+
+
 class BlumonpayAPIError(Exception):
-    """Excepción para errores de comunicación con la API de Blumonpay"""
-    pass
+    """
+    Excepción para errores de comunicación con la API de Blumonpay.
+
+    `retryable` indica que el cargo no llegó a procesarse: la conexión no se
+    pudo abrir (`charge_not_sent`) o Blumonpay respondió 429/503. Un timeout
+    de lectura, una conexión cortada después de enviar el cargo, un 500 o un
+    502/504 del proxy no son reintentables: el cargo pudo haberse aplicado.
+    """
+    def __init__(self, message, status_code=None, retryable=False):
+        self.status_code = status_code
+        self.retryable = retryable
+        super().__init__(message)
+
+    @property
+    def is_unavailable(self) -> bool:
+        """Timeout, error de red, 5xx o 429: Blumonpay no está atendiendo"""
+        return (
+            self.status_code is None
+            or self.status_code >= 500
+            or self.status_code == 429
+        )
 
 
 class PaymentDeclinedError(Exception):
@@ -28,6 +60,36 @@ class PaymentDeclinedError(Exception):
         super().__init__(message)
 
 
+def charge_not_sent(error: Exception) -> bool:
+    """
+    El error ocurrió al abrir la conexión (timeout de conexión, rechazada,
+    DNS): Blumonpay no recibió el cargo. Cualquier otro ConnectionError pudo
+    ocurrir con el cargo ya enviado.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError):
+        return False
+    # requests envuelve el MaxRetryError de urllib3, con la causa en `reason`
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, NewConnectionError)
+
+
+def error_outcome(error: Exception) -> str:
+    """Etiqueta `outcome` de las métricas para una llamada fallida"""
+    if isinstance(error, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return "connection_error"
+    response = getattr(error, "response", None)
+    if response is not None:
+        return f"http_{response.status_code}"
+    if isinstance(error, ValueError):
+        return "invalid_response"
+    return "error"
+
+
 class BlumonpayService:
     def __init__(self):
         self.token_url = settings.BLUMONPAY_TOKEN_HOST
@@ -35,6 +97,69 @@ class BlumonpayService:
         self.username = settings.BLUMONPAY_USERNAME
         self.password = settings.BLUMONPAY_PASSWORD
         self.token = None
+        self.token_expires_at = None
+        self.timeout = (
+            settings.BLUMONPAY_CONNECT_TIMEOUT,
+            settings.BLUMONPAY_READ_TIMEOUT,
+        )
+        self.stats = {"token_refreshes": 0, "unauthorized_retries": 0}
+        self._session = None
+        self._session_pid = None
+        self._token_lock = threading.Lock()
+
+    def get_session(self) -> requests.Session:
+        """
+        Devuelve la sesión HTTP con keep-alive del proceso actual.
+
+        La sesión se crea de forma perezosa y se vuelve a crear si el PID cambia,
+        para que los hijos del pool prefork de Celery no compartan sockets con el
+        proceso padre.
+        """
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            adapter = HTTPAdapter(
+                pool_connections=settings.BLUMONPAY_POOL_CONNECTIONS,
+                pool_maxsize=settings.BLUMONPAY_POOL_MAXSIZE,
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+            self._session_pid = pid
+        return self._session
+
+    def close(self):
+        """Cierra las conexiones abiertas del pool HTTP"""
+        if self._session is not None and self._session_pid == os.getpid():
+            self._session.close()
+        self._session = None
+        self._session_pid = None
+
+    def get_stats(self) -> dict:
+        """
+        Contadores del cliente: conexiones abiertas vs peticiones enviadas
+        (la diferencia son peticiones que reutilizaron una conexión) y
+        renovaciones de token.
+        """
+        connections_opened = 0
+        requests_sent = 0
+        if self._session is not None and self._session_pid == os.getpid():
+            # El mismo adapter está montado para http:// y https://
+            adapters = {id(a): a for a in self._session.adapters.values()}
+            for adapter in adapters.values():
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    connections_opened += pool.num_connections
+                    requests_sent += pool.num_requests
+        return {
+            **self.stats,
+            "connections_opened": connections_opened,
+            "requests_sent": requests_sent,
+            "connections_reused": max(requests_sent - connections_opened, 0),
+        }
 
     def get_hashed_password(self) -> str:
         return hashlib.sha256(self.password.encode('utf-8')).hexdigest()
@@ -48,6 +173,9 @@ class BlumonpayService:
 
     async def get_token(self):
         """Obtiene un token de acceso de Blumonpay"""
+        # httpx sólo lo usa la versión asíncrona; el worker usa requests
+        import httpx
+
         payload = {
             "username": self.username,
             "password": self.password,
@@ -77,8 +205,10 @@ class BlumonpayService:
                 logger.error(f"Unexpected error obtaining token: {e}")
                 raise
 
-    async def process_payment(self, payment_data: CardPaymentRequest):
+    async def process_payment(self, payment_data: "CardPaymentRequest"):
         """Procesa un pago a través de Blumonpay"""
+        import httpx
+
         if not self.token:
             await self.get_token()
 
@@ -143,17 +273,78 @@ class BlumonpayService:
             "Authorization": f"Basic {basic_token}"
         }
 
-        response = requests.post(
-            url=self.token_url,
-            data=payload,
-            headers=headers,
-        )
-        response.raise_for_status()
+        start = time.perf_counter()
+        outcome = "success"
+        try:
+            response = self.get_session().post(
+                url=self.token_url,
+                data=payload,
+                headers=headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            outcome = error_outcome(e)
+            raise
+        finally:
+            observe(
+                BLUMONPAY_REQUEST_SECONDS,
+                time.perf_counter() - start,
+                endpoint="token",
+                outcome=outcome,
+            )
 
-        data = response.json()
         self.token = data.get("access_token")
+        self.token_expires_at = None
+        expires_in = data.get("expires_in")
+        if expires_in is not None:
+            # Renovar antes de que expire para no enviar cargos con un token vencido
+            lifetime = max(
+                float(expires_in) - settings.BLUMONPAY_TOKEN_REFRESH_MARGIN, 0
+            )
+            self.token_expires_at = time.monotonic() + lifetime
+        self.stats["token_refreshes"] += 1
+        logger.debug(f"Blumonpay token refreshed (expires_in={expires_in})")
         return self.token
 
+    def get_valid_token_sync(self, rejected_token: str = None) -> str:
+        """
+        Devuelve el token en caché, renovándolo si está por expirar o si
+        Blumonpay rechazó `rejected_token`.
+        """
+        if rejected_token is None and not self._token_is_stale():
+            return self.token
+
+        with self._token_lock:
+            # Otro hilo pudo haberlo renovado mientras esperábamos el lock
+            needs_refresh = self._token_is_stale() or (
+                rejected_token is not None and self.token == rejected_token
+            )
+            if needs_refresh:
+                self.get_token_sync()
+        return self.token
+
+    def _token_is_stale(self) -> bool:
+        if not self.token:
+            return True
+        return (
+            self.token_expires_at is not None
+            and time.monotonic() >= self.token_expires_at
+        )
+
+    def _post_charge(self, payment_data: dict, token: str) -> requests.Response:
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}",
+        }
+        return self.get_session().post(
+            self.charge_url,
+            json=payment_data,
+            headers=headers,
+            timeout=self.timeout,  # Evita bloqueos indefinidos
+        )
+
     # Agregar este método a BlumonpayService
     def process_payment_sync(self, payment_data: dict):
         """
@@ -169,21 +360,17 @@ class BlumonpayService:
             BlumonpayAPIError: Si hay un error de comunicación con la API
             PaymentDeclinedError: Si el pago es rechazado por el procesador
         """
+        start = time.perf_counter()
+        outcome = "unknown"
         try:
-            if not self.token:
-                self.get_token_sync()
+            token = self.get_valid_token_sync()
+            response = self._post_charge(payment_data, token)
 
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.token}",
-            }
-
-            response = requests.post(
-                self.charge_url,
-                json=payment_data,
-                headers=headers,
-                timeout=30,  # Agregado timeout para evitar bloqueos indefinidos
-            )
+            # Token revocado o expirado antes de tiempo: renovar y reintentar una vez
+            if response.status_code == 401:
+                self.stats["unauthorized_retries"] += 1
+                token = self.get_valid_token_sync(rejected_token=token)
+                response = self._post_charge(payment_data, token)
 
             # Verificar si la respuesta HTTP es exitosa
             response.raise_for_status()
@@ -201,6 +388,7 @@ class BlumonpayService:
 
             # Procesar caso de éxito
             if result.get("status") is True and "dataResponse" in result:
+                outcome = "approved"
                 data_response = result["dataResponse"]
                 transaction_response.update(
                     {
@@ -222,6 +410,7 @@ class BlumonpayService:
 
             # Procesar caso de error
             elif "error" in result:
+                outcome = "declined"
                 error_data = result["error"]
                 transaction_response.update(
                     {
@@ -255,10 +444,28 @@ class BlumonpayService:
 
         except requests.exceptions.RequestException as e:
             # Manejar errores de comunicación HTTP
-            raise BlumonpayAPIError(f"Error de comunicación con Blumonpay: {str(e)}")
+            outcome = error_outcome(e)
+            status_code = e.response.status_code if e.response is not None else None
+            retryable = (
+                charge_not_sent(e) or status_code in RETRYABLE_STATUS_CODES
+            )
+            raise BlumonpayAPIError(
+                f"Error de comunicación con Blumonpay: {str(e)}",
+                status_code=status_code,
+                retryable=retryable,
+            )
 
         except ValueError as e:
             # Error al decodificar JSON
+            outcome = "invalid_response"
             raise BlumonpayAPIError(
                 f"Error al procesar la respuesta de Blumonpay: {str(e)}"
             )
+
+        finally:
+            observe(
+                BLUMONPAY_REQUEST_SECONDS,
+                time.perf_counter() - start,
+                endpoint="charge",
+                outcome=outcome,
+            )
@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.repositories.card_bin_repository import AsyncCardBinRepository
+
+# Largos de BIN que se buscan, del más específico al más general
+BIN_LENGTHS = (8, 6)
+# Las entradas de la caché de la API se identifican por los primeros 8 dígitos
+KEY_LENGTH = BIN_LENGTHS[0]
+# Valor de `CardBinCache.get` sin entrada vigente (None es un BIN desconocido)
+MISSING = object()
+
+
+class CardBinInfo(NamedTuple):
+    """Fila de card_bins en el orden de CARD_BIN_COLUMNS"""
+
+    bin: str
+    bank: Optional[str]
+    brand: Optional[str]
+    type: Optional[str]
+    product: Optional[str]
+
+
+def bin_prefixes(card_number: str) -> list[str]:
+    return [
+        card_number[:length] for length in BIN_LENGTHS if len(card_number) >= length
+    ]
+
+
+def match_bin(
+    card_number: str, by_bin: dict[str, CardBinInfo]
+) -> Optional[CardBinInfo]:
+    """El BIN más largo de `by_bin` con el que empieza la tarjeta"""
+    return next(
+        (by_bin[prefix] for prefix in bin_prefixes(card_number) if prefix in by_bin),
+        None,
+    )
+
+
+def learned_bin(card_number: str, card_info: Optional[dict]) -> Optional[CardBinInfo]:
+    """
+    BIN de CARD_BIN_LEARN_LENGTH dígitos con el `card_info` que devuelve
+    `process_payment_sync`; None si Blumonpay no envió `binInformation`
+    """
+    if not card_info or not card_number.isdigit():
+        return None
+    info = CardBinInfo(
+        bin=card_number[: settings.CARD_BIN_LEARN_LENGTH],
+        bank=(card_info.get("bank") or None),
+        brand=(card_info.get("brand") or None),
+        type=(card_info.get("type") or None),
+        product=(card_info.get("product") or None),
+    )
+    if info.bank is None and info.brand is None and info.type is None:
+        return None
+    return info
+
+
+def split_setting(value: str) -> frozenset[str]:
+    """Lista separada por comas, en mayúsculas"""
+    return frozenset(item.strip().upper() for item in value.split(",") if item.strip())
+
+
+class CardBinCache:
+    """
+    Caché LRU en memoria del proceso. Guarda también los BIN desconocidos
+    (None) con un TTL más corto, para no consultar la base de datos en cada
+    cargo con una tarjeta que todavía no está en card_bins.
+
+    Un acierto es una búsqueda en un dict, sin E/S ni lock: menos de un
+    microsegundo (`benchmarks.bench_card_bins`). Cada operación sobre el
+    OrderedDict es atómica con el GIL; el lock sólo ordena las escrituras y,
+    con varios hilos, los contadores de aciertos pueden perder incrementos.
+    """
+
+    def __init__(
+        self,
+        max_size: int = None,
+        ttl: float = None,
+        negative_ttl: float = None,
+    ):
+        self.max_size = max_size or settings.CARD_BIN_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else settings.CARD_BIN_CACHE_TTL_SECONDS
+        self.negative_ttl = (
+            negative_ttl
+            if negative_ttl is not None
+            else settings.CARD_BIN_NEGATIVE_TTL_SECONDS
+        )
+        self._entries: OrderedDict[str, tuple[float, Optional[CardBinInfo]]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
+
+    def get(self, key: str):
+        """CardBinInfo, None (BIN desconocido) o MISSING si hay que consultarlo"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self.misses += 1
+            return MISSING
+        try:
+            self._entries.move_to_end(key)
+        except KeyError:
+            # Otro hilo la desalojó entre las dos operaciones
+            pass
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, info: Optional[CardBinInfo]):
+        ttl = self.ttl if info is not None else self.negative_ttl
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (expires_at, info)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+class CardBinLookup:
+    """
+    Datos del BIN de las tarjetas que recibe la API: primero la caché del
+    proceso y, para las que no están, una sola consulta a card_bins por
+    petición. Un BIN que no está en la tabla no se rechaza.
+    """
+
+    def __init__(self, cache: CardBinCache = None):
+        self.cache = cache or CardBinCache()
+        self.repo = AsyncCardBinRepository()
+        self.blocked_brands = split_setting(settings.CARD_BIN_BLOCKED_BRANDS)
+        self.blocked_types = split_setting(settings.CARD_BIN_BLOCKED_TYPES)
+        self._lock = threading.Lock()
+        self.stats = {"queries": 0, "rejected": 0}
+
+    def record(self, counter: str, value: int = 1):
+        with self._lock:
+            self.stats[counter] += value
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        return {**stats, **self.cache.get_stats()}
+
+    async def lookup_many(
+        self, db: AsyncSession, card_numbers: list[str]
+    ) -> list[Optional[CardBinInfo]]:
+        keys = [card_number[:KEY_LENGTH] for card_number in card_numbers]
+        found: dict[str, Optional[CardBinInfo]] = {}
+        missing = set()
+        for key in keys:
+            info = self.cache.get(key)
+            if info is MISSING:
+                missing.add(key)
+            else:
+                found[key] = info
+        if missing:
+            self.record("queries")
+            rows = await self.repo.find_bins(
+                db, {prefix for key in missing for prefix in bin_prefixes(key)}
+            )
+            by_bin = {row[0]: CardBinInfo(*row) for row in rows}
+            for key in missing:
+                info = match_bin(key, by_bin)
+                self.cache.put(key, info)
+                found[key] = info
+        return [found[key] for key in keys]
+
+    async def lookup(
+        self, db: AsyncSession, card_number: str
+    ) -> Optional[CardBinInfo]:
+        return (await self.lookup_many(db, [card_number]))[0]
+
+    def rejection(self, info: Optional[CardBinInfo]) -> Optional[str]:
+        """Motivo para rechazar la tarjeta antes de cobrarla, o None"""
+        if info is None:
+            return None
+        if info.brand and info.brand.upper() in self.blocked_brands:
+            self.record("rejected")
+            return f"Card brand {info.brand} is not accepted"
+        if info.type and info.type.upper() in self.blocked_types:
+            self.record("rejected")
+            return f"Card type {info.type} is not accepted"
+        return None
@@ -0,0 +1,137 @@
+"""
+Datos de tarjeta de un cargo (`noPresentCardData` de CardPaymentRequest).
+Lo que se guarda o se compara fuera del cargo lleva la tarjeta enmascarada
+(primeros 6 y últimos 4 dígitos) y sin CVV.
+"""
+import json
+import logging
+import uuid
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.db.redis import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+CARD_FIELD = "noPresentCardData"
+# Referencia a la tarjeta en CardVault dentro de un `payment_data` enmascarado
+CARD_REF_FIELD = "cardRef"
+
+
+def mask_card_number(card_number: str) -> str:
+    if len(card_number) < 10:
+        return "*" * len(card_number)
+    return card_number[:6] + "*" * (len(card_number) - 10) + card_number[-4:]
+
+
+def redact_payment_data(payment_data: dict) -> dict:
+    """Copia de `payment_data` con la tarjeta enmascarada y sin CVV"""
+    card = payment_data.get(CARD_FIELD)
+    if not card:
+        return dict(payment_data)
+    card = {field: value for field, value in card.items() if field != "cvv"}
+    if card.get("cardNumber"):
+        card["cardNumber"] = mask_card_number(card["cardNumber"])
+    return {**payment_data, CARD_FIELD: card}
+
+
+class CardDataMissing(Exception):
+    """La tarjeta del cargo ya no está en Redis: no se puede cobrar"""
+
+
+class CardVault:
+    """
+    Tarjetas de los cargos por cobrar, en Redis durante CARD_DATA_TTL_SECONDS
+    desde que llegan o desde el último reintento. La outbox, los mensajes de
+    la cola y la dead-letter queue llevan el `payment_data` enmascarado con
+    la referencia `cardRef`; el worker recupera la tarjeta justo antes de
+    cobrar y la borra cuando el cargo se aprueba o se rechaza.
+    """
+
+    prefix = "payments:card:"
+
+    def __init__(self, ttl: int = None):
+        self.ttl = ttl or settings.CARD_DATA_TTL_SECONDS
+
+    async def seal_many(self, payments: list[dict]) -> list[dict]:
+        """
+        Guarda las tarjetas de `payments` y devuelve cada `payment_data`
+        enmascarado con su referencia, en el mismo orden.
+
+        Raises:
+            RedisError: Si Redis no responde; no se guardó ningún cargo
+        """
+        sealed = []
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            for payment_data in payments:
+                ref = uuid.uuid4().hex
+                card = json.dumps(payment_data[CARD_FIELD])
+                pipe.set(self.prefix + ref, card, ex=self.ttl)
+                sealed.append(
+                    {**redact_payment_data(payment_data), CARD_REF_FIELD: ref}
+                )
+            await pipe.execute()
+        return sealed
+
+    async def discard_many(self, payments: list[dict]):
+        refs = [payment[CARD_REF_FIELD] for payment in payments]
+        try:
+            await get_async_redis().delete(*[self.prefix + ref for ref in refs])
+        except RedisError as e:
+            # Vence sola a los CARD_DATA_TTL_SECONDS
+            logger.warning(f"Could not discard card data: {e}")
+
+    def reveal_sync(self, payment_data: dict) -> dict:
+        """
+        `payment_data` con la tarjeta completa, listo para Blumonpay.
+
+        Raises:
+            CardDataMissing: Si la tarjeta venció o el cargo no tiene referencia
+            RedisError: Si Redis no responde
+        """
+        ref = payment_data.get(CARD_REF_FIELD)
+        if ref is None:
+            # Mensajes publicados antes de CardVault: llevan la tarjeta completa
+            if "cvv" in payment_data.get(CARD_FIELD, {}):
+                return payment_data
+            raise CardDataMissing("Card data is not available for this payment")
+        card = get_redis().get(self.prefix + ref)
+        if card is None:
+            raise CardDataMissing(
+                f"Card data expired after {self.ttl}s without being charged"
+            )
+        payment = {
+            field: value
+            for field, value in payment_data.items()
+            if field != CARD_REF_FIELD
+        }
+        payment[CARD_FIELD] = json.loads(card)
+        return payment
+
+    def touch_sync(self, payment_data: dict) -> bool:
+        """
+        Renueva el vencimiento antes de un reintento. Devuelve si la tarjeta
+        sigue en Redis (False también si Redis no responde)
+        """
+        if payment_data.get(CARD_REF_FIELD) is None:
+            return "cvv" in payment_data.get(CARD_FIELD, {})
+        return bool(self._run_sync("expire", payment_data, self.ttl))
+
+    def exists_sync(self, payment_data: dict) -> bool:
+        """Si la tarjeta sigue en Redis, sin renovar su vencimiento"""
+        if payment_data.get(CARD_REF_FIELD) is None:
+            return "cvv" in payment_data.get(CARD_FIELD, {})
+        return bool(self._run_sync("exists", payment_data))
+
+    def discard_sync(self, payment_data: dict):
+        self._run_sync("delete", payment_data)
+
+    def _run_sync(self, command: str, payment_data: dict, *args):
+        ref = payment_data.get(CARD_REF_FIELD)
+        if ref is None:
+            return
+        try:
+            return getattr(get_redis(), command)(self.prefix + ref, *args)
+        except RedisError as e:
+            logger.warning(f"Could not {command} card data: {e}")
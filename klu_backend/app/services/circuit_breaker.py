@@ -0,0 +1,170 @@
+import logging
+import time
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.db.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = estado; ARGV = ahora (ms), duración de la prueba en half-open (ms)
+ALLOW_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state')
+if not state then
+    return {1, 0}
+end
+local now = tonumber(ARGV[1])
+local reopen_at = tonumber(redis.call('HGET', KEYS[1], 'until'))
+if now < reopen_at then
+    return {0, reopen_at - now}
+end
+redis.call('HSET', KEYS[1], 'state', 'half_open', 'until', now + tonumber(ARGV[2]))
+return {1, 0}
+"""
+
+# KEYS[1] = estado, KEYS[2] = ventana; ARGV = ahora (ms), falló (0/1),
+# ventana (ms), mínimo de fallas, proporción de fallas, tiempo abierto (ms)
+RECORD_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state')
+local now = tonumber(ARGV[1])
+if ARGV[2] == '0' then
+    if state == 'half_open' then
+        redis.call('DEL', KEYS[1], KEYS[2])
+        return 'closed'
+    end
+    if redis.call('HINCRBY', KEYS[2], 'calls', 1) == 1 then
+        redis.call('PEXPIRE', KEYS[2], ARGV[3])
+    end
+    return state or 'closed'
+end
+if state == 'half_open' then
+    redis.call('HSET', KEYS[1], 'state', 'open', 'until', now + tonumber(ARGV[6]))
+    return 'open'
+end
+local calls = redis.call('HINCRBY', KEYS[2], 'calls', 1)
+local failures = redis.call('HINCRBY', KEYS[2], 'failures', 1)
+if calls == 1 then
+    redis.call('PEXPIRE', KEYS[2], ARGV[3])
+end
+if state ~= 'open' and failures >= tonumber(ARGV[4])
+        and failures / calls >= tonumber(ARGV[5]) then
+    redis.call('HSET', KEYS[1], 'state', 'open', 'until', now + tonumber(ARGV[6]))
+    redis.call('DEL', KEYS[2])
+    return 'open'
+end
+return state or 'closed'
+"""
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto: no se debe llamar al servicio"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Circuit {name} is open (retry in {retry_after:.1f}s)")
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker compartido por todos los procesos a través de Redis.
+
+    - closed: las llamadas pasan y se cuentan en una ventana fija; si las fallas
+      superan el mínimo y la proporción configurados, el circuito se abre.
+    - open: `allow` lanza CircuitOpenError hasta que pasa CIRCUIT_OPEN_SECONDS.
+    - half_open: una sola llamada de prueba; si funciona el circuito se cierra
+      y si falla se vuelve a abrir.
+
+    Si Redis no responde el circuito se considera cerrado.
+    """
+
+    prefix = "circuit:"
+
+    def __init__(self, name: str, probe_seconds: float):
+        self.name = name
+        self.state_key = f"{self.prefix}{name}:state"
+        self.window_key = f"{self.prefix}{name}:window"
+        self.probe_ms = int(probe_seconds * 1000)
+        self._allow_script = None
+        self._record_script = None
+
+    def _scripts(self):
+        if self._allow_script is None:
+            client = get_redis()
+            self._allow_script = client.register_script(ALLOW_SCRIPT)
+            self._record_script = client.register_script(RECORD_SCRIPT)
+        return self._allow_script, self._record_script
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.time() * 1000)
+
+    def allow(self):
+        """Lanza CircuitOpenError si la llamada no debe hacerse"""
+        allow_script, _ = self._scripts()
+        try:
+            allowed, wait_ms = allow_script(
+                keys=[self.state_key], args=[self._now_ms(), self.probe_ms]
+            )
+        except RedisError as e:
+            logger.warning(f"Circuit breaker unavailable: {e}")
+            return
+        if not allowed:
+            raise CircuitOpenError(self.name, wait_ms / 1000)
+
+    def record_success(self):
+        self._record(failed=False)
+
+    def record_failure(self):
+        self._record(failed=True)
+
+    def _record(self, failed: bool):
+        _, record_script = self._scripts()
+        try:
+            state = record_script(
+                keys=[self.state_key, self.window_key],
+                args=[
+                    self._now_ms(),
+                    int(failed),
+                    int(settings.CIRCUIT_WINDOW_SECONDS * 1000),
+                    settings.CIRCUIT_FAILURE_THRESHOLD,
+                    settings.CIRCUIT_FAILURE_RATIO,
+                    int(settings.CIRCUIT_OPEN_SECONDS * 1000),
+                ],
+            )
+        except RedisError as e:
+            logger.warning(f"Circuit breaker unavailable: {e}")
+            return
+        if failed and state == b"open":
+            logger.warning(f"Circuit {self.name} is open")
+
+    def get_state(self) -> dict:
+        """Estado actual del circuito y contadores de la ventana"""
+        try:
+            client = get_redis()
+            state = client.hgetall(self.state_key)
+            window = client.hgetall(self.window_key)
+        except RedisError as e:
+            logger.warning(f"Circuit breaker unavailable: {e}")
+            return {"state": "unknown"}
+        retry_after = 0.0
+        if state:
+            retry_after = max(int(state[b"until"]) - self._now_ms(), 0) / 1000
+        return {
+            "state": state.get(b"state", b"closed").decode(),
+            "retry_after": retry_after,
+            "window_calls": int(window.get(b"calls", 0)),
+            "window_failures": int(window.get(b"failures", 0)),
+        }
+
+
+def blumonpay_circuit_breaker() -> CircuitBreaker:
+    """
+    Circuito de los cargos a Blumonpay. El estado vive en Redis: la API crea
+    su propia instancia para leerlo sin importar las tareas del worker.
+    """
+    return CircuitBreaker(
+        "blumonpay",
+        probe_seconds=settings.BLUMONPAY_CONNECT_TIMEOUT
+        + settings.BLUMONPAY_READ_TIMEOUT,
+    )
@@ -0,0 +1,81 @@
+import threading
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """No se liberó un lugar dentro del tiempo de espera"""
+
+    def __init__(self, limit: int, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Concurrency limit of {limit} reached")
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Límite de llamadas en vuelo que se ajusta con AIMD: cada respuesta rápida
+    con el límite ocupado suma 1/limit (≈ +1 por cada `limit` respuestas) y
+    cada falla o respuesta más lenta que `latency_target` multiplica el límite
+    por `backoff_ratio`. Con lugares libres el límite no crece: no se probó.
+
+    Es por proceso; con el pool gevent los locks de threading cooperan con
+    los greenlets.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        latency_target: float,
+        backoff_ratio: float = 0.9,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self.stats = {"acquired": 0, "rejected": 0, "increases": 0, "decreases": 0}
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self, timeout: float):
+        """Ocupa un lugar o lanza ConcurrencyLimitExceeded tras `timeout` segundos"""
+        with self._condition:
+            acquired = self._condition.wait_for(
+                lambda: self._in_flight < self.limit, timeout=timeout
+            )
+            if not acquired:
+                self.stats["rejected"] += 1
+                raise ConcurrencyLimitExceeded(self.limit, retry_after=timeout)
+            self._in_flight += 1
+            self.stats["acquired"] += 1
+
+    def release(self, latency: float, overloaded: bool = False):
+        """Libera el lugar y ajusta el límite según el resultado de la llamada"""
+        with self._condition:
+            at_limit = self._in_flight >= self.limit
+            self._in_flight -= 1
+            if overloaded or latency > self.latency_target:
+                self._limit = max(self._limit * self.backoff_ratio, self.minimum)
+                self.stats["decreases"] += 1
+            elif at_limit and self._limit < self.maximum:
+                self._limit = min(self._limit + 1 / self._limit, self.maximum)
+                self.stats["increases"] += 1
+            self._condition.notify_all()
+
+    def cancel(self):
+        """Libera el lugar sin ajustar el límite: la llamada no se hizo"""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            return {
+                **self.stats,
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+            }
@@ -0,0 +1,72 @@
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.db.redis import get_redis
+from app.services.card_data import redact_payment_data
+
+logger = logging.getLogger(__name__)
+
+
+class DeadLetterQueue:
+    """
+    Cargos que el worker no pudo completar, en una lista de Redis (el más
+    antiguo primero) para revisarlos y reenviarlos con
+    `python -m app.tasks.dead_letter`.
+
+    Las entradas llevan el id de la transacción y el cargo con la tarjeta
+    enmascarada y sin CVV; la tarjeta sólo se puede cobrar de nuevo mientras
+    su referencia siga en CardVault. La lista expira DEAD_LETTER_TTL_SECONDS
+    después de la última entrada.
+    """
+
+    key = "payments:dead-letter"
+
+    def push_sync(
+        self,
+        transaction_id: uuid.UUID,
+        payment_data: dict,
+        reason: str,
+        error: str,
+        attempts: int,
+    ):
+        entry = json.dumps(
+            {
+                "transaction_id": str(transaction_id),
+                "reason": reason,
+                "error": error,
+                "attempts": attempts,
+                "failed_at": datetime.now(timezone.utc).isoformat(),
+                "payment_data": redact_payment_data(payment_data),
+            }
+        )
+        try:
+            pipe = get_redis().pipeline()
+            pipe.rpush(self.key, entry)
+            pipe.expire(self.key, settings.DEAD_LETTER_TTL_SECONDS)
+            pipe.execute()
+        except RedisError as e:
+            # La transacción ya quedó marcada como fallida en la base de datos
+            logger.error(f"Could not dead-letter transaction {transaction_id}: {e}")
+
+    def peek(self, limit: int) -> list[tuple[bytes, dict]]:
+        """Las `limit` entradas más antiguas como (valor crudo, entrada)"""
+        raw_entries = get_redis().lrange(self.key, 0, limit - 1)
+        return [(raw, json.loads(raw)) for raw in raw_entries]
+
+    def remove(self, raw_entry: bytes):
+        get_redis().lrem(self.key, 1, raw_entry)
+
+    def count(self) -> int:
+        return get_redis().llen(self.key)
+
+    def purge(self) -> int:
+        pipe = get_redis().pipeline()
+        pipe.llen(self.key)
+        pipe.delete(self.key)
+        count, _ = pipe.execute()
+        return count
@@ -0,0 +1,60 @@
+import hashlib
+import hmac
+import json
+import logging
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.db.redis import get_async_redis
+from app.services.card_data import redact_payment_data
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyStore:
+    """
+    Caché en Redis de las respuestas de POST /transactions/ por cliente e
+    Idempotency-Key
+    """
+
+    prefix = "idempotency:"
+
+    def __init__(self, ttl: int = None):
+        self.ttl = ttl or settings.IDEMPOTENCY_TTL_SECONDS
+
+    @staticmethod
+    def hash_request(payment_data: dict) -> str:
+        """
+        Huella del cuerpo: HMAC con IDEMPOTENCY_HASH_SECRET, sin CVV y con la
+        tarjeta enmascarada, para que la tabla no permita recuperarla
+        """
+        body = json.dumps(redact_payment_data(payment_data), sort_keys=True)
+        return hmac.new(
+            settings.IDEMPOTENCY_HASH_SECRET.encode("utf-8"),
+            body.encode("utf-8"),
+            hashlib.sha256,
+        ).hexdigest()
+
+    def redis_key(self, client_key: str, key: str) -> str:
+        return f"{self.prefix}{client_key}:{key}"
+
+    async def get(self, client_key: str, key: str) -> Optional[dict]:
+        """Devuelve {"request_hash", "body"} o None si no hay respuesta en caché"""
+        try:
+            cached = await get_async_redis().get(self.redis_key(client_key, key))
+        except RedisError as e:
+            # La tabla idempotency_keys sigue evitando el duplicado
+            logger.warning(f"Idempotency cache unavailable: {e}")
+            return None
+        return json.loads(cached) if cached else None
+
+    async def save(self, client_key: str, key: str, request_hash: str, body: str):
+        value = json.dumps({"request_hash": request_hash, "body": body})
+        try:
+            await get_async_redis().set(
+                self.redis_key(client_key, key), value, ex=self.ttl, nx=True
+            )
+        except RedisError as e:
+            logger.warning(f"Idempotency cache unavailable: {e}")
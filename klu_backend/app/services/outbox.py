@@ -0,0 +1,157 @@
+import asyncio
+import contextlib
+import logging
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.payment_outbox import PaymentOutbox
+from app.repositories.outbox_repository import (
+    AsyncOutboxRepository,
+    OutboxRepository,
+)
+from app.tasks.lanes import BULK, queue_lane
+from app.tasks.producer import dispatch_payment_batch, publish_payment
+
+logger = logging.getLogger(__name__)
+
+
+def publish_outbox_rows(rows: list[PaymentOutbox]):
+    """
+    Publica las filas en su cola: las del carril bulk con una sola conexión
+    (`dispatch_payment_batch`), las demás un mensaje a la vez. Si falla
+    a la mitad se publican todas otra vez; process_payment ignora la entrega
+    repetida de una transacción que ya no está en `pending`.
+    """
+    by_queue: dict[str, list[tuple[str, dict]]] = {}
+    for row in rows:
+        by_queue.setdefault(row.queue, []).append(
+            (str(row.transaction_id), row.payload)
+        )
+    for queue, payments in by_queue.items():
+        if queue_lane(queue) == BULK:
+            dispatch_payment_batch(payments, queue=queue)
+            continue
+        for transaction_id, payment_data in payments:
+            publish_payment(transaction_id, payment_data, queue=queue)
+
+
+def relay_outbox(db: Session, repo: OutboxRepository, limit: int) -> int:
+    """Publica un bloque de filas pendientes (sesión síncrona, sweeper)"""
+    rows = repo.claim_unpublished(db, limit)
+    if not rows:
+        db.rollback()
+        return 0
+    publish_outbox_rows(rows)
+    repo.mark_published(db, [row.id for row in rows])
+    return len(rows)
+
+
+class OutboxRelay:
+    """
+    Publica en la cola las filas de payment_outbox desde la API. Corre como
+    una tarea asyncio por proceso, del arranque al apagado de la API
+    (`start` y `stop` en el lifespan): `notify` la despierta después de cada
+    commit y, sin avisos, revisa la tabla cada OUTBOX_RELAY_POLL_SECONDS.
+
+    Varios procesos de la API comparten la tabla: cada bloque se toma con
+    SKIP LOCKED, así que un cargo no se publica dos veces en paralelo. Si
+    Redis falla las filas quedan en la tabla y se reintentan.
+    """
+
+    def __init__(self, session_factory: Callable):
+        self.session_factory = session_factory
+        self.repo = AsyncOutboxRepository()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._lock = threading.Lock()
+        self.stats = {"published": 0, "batches": 0, "errors": 0}
+
+    def record(self, **counters: int):
+        with self._lock:
+            for counter, value in counters.items():
+                self.stats[counter] += value
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "running": self.running}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Arranca el relay en el event loop actual si no está corriendo"""
+        loop = asyncio.get_running_loop()
+        # Los benchmarks y las pruebas crean un event loop por ejecución
+        if not self.running or self._task.get_loop() is not loop:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    def notify(self):
+        """Hay filas nuevas: las publica sin esperar a la siguiente revisión"""
+        self.start()
+        self._wakeup.set()
+
+    async def stop(self, timeout: float = None):
+        """
+        Detiene el relay cuando termina el bloque en curso, que queda marcado
+        como publicado. Si no termina en `timeout` segundos se cancela: las
+        filas de ese bloque se vuelven a publicar, desde otro proceso o el
+        sweeper, y process_payment ignora la entrega repetida.
+        """
+        if not self.running:
+            return
+        timeout = settings.OUTBOX_RELAY_SHUTDOWN_SECONDS if timeout is None else timeout
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Outbox relay did not finish in {timeout}s, cancelling")
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    async def relay_once(self) -> int:
+        """Publica un bloque de hasta OUTBOX_RELAY_BATCH_SIZE filas"""
+        async with self.session_factory() as db:
+            rows = await self.repo.claim_unpublished(
+                db, settings.OUTBOX_RELAY_BATCH_SIZE
+            )
+            if not rows:
+                await db.rollback()
+                return 0
+            # La publicación en Redis es bloqueante: fuera del event loop. Las
+            # filas siguen bloqueadas hasta el commit de `mark_published`
+            await asyncio.to_thread(publish_outbox_rows, rows)
+            await self.repo.mark_published(db, [row.id for row in rows])
+        self.record(published=len(rows), batches=1)
+        return len(rows)
+
+    async def _run(self):
+        wakeup = self._wakeup
+        while not self._stopping:
+            wakeup.clear()
+            try:
+                published = await self.relay_once()
+            except Exception as e:
+                self.record(errors=1)
+                logger.warning(f"Outbox relay failed, retrying: {e}")
+                await asyncio.sleep(settings.OUTBOX_RELAY_POLL_SECONDS)
+                continue
+            if self._stopping:
+                return
+            if published >= settings.OUTBOX_RELAY_BATCH_SIZE:
+                # Puede haber más filas: se sigue sin esperar
+                continue
+            try:
+                await asyncio.wait_for(
+                    wakeup.wait(), timeout=settings.OUTBOX_RELAY_POLL_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.db.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# KEYS = cubetas; ARGV[1] = ahora (ms) y por cubeta: capacidad, tokens por
+# segundo y costo. Si a alguna le faltan tokens no se descuenta de ninguna.
+# Devuelve {permitido, espera (ms), índice de la cubeta que limitó}
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tokens = {}
+local wait, limited = 0, 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local rate = tonumber(ARGV[i * 3])
+    local cost = math.min(tonumber(ARGV[i * 3 + 1]), capacity)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local elapsed = math.max(now - (tonumber(state[2]) or now), 0)
+    available = math.min(capacity, available + elapsed * rate / 1000)
+    if available < cost then
+        local missing_ms = math.ceil((cost - available) * 1000 / rate)
+        if missing_ms > wait then
+            wait, limited = missing_ms, i
+        end
+    end
+    tokens[i] = available - cost
+end
+if limited > 0 then
+    return {0, wait, limited}
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local rate = tonumber(ARGV[i * 3])
+    redis.call('HSET', key, 'tokens', tostring(tokens[i]), 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil((capacity - tokens[i]) * 1000 / rate) + 1000)
+end
+return {1, 0, 0}
+"""
+
+
+@dataclass(frozen=True)
+class Bucket:
+    """Cubeta a descontar: `scope` identifica el límite en los logs y métricas"""
+
+    scope: str
+    key: str
+    capacity: float
+    refill_per_second: float
+    cost: float = 1
+
+
+class RateLimitExceeded(Exception):
+    """No hay tokens suficientes en la cubeta `scope`"""
+
+    def __init__(self, scope: str, retry_after: float):
+        self.scope = scope
+        self.retry_after = retry_after
+        super().__init__(f"Rate limit {scope} exceeded (retry in {retry_after:.1f}s)")
+
+
+class TokenBucketRateLimiter:
+    """
+    Token buckets compartidos por todos los procesos de la API en Redis. Cada
+    petición descuenta de varias cubetas a la vez (cliente y clientes finales)
+    con un solo script: o se descuenta de todas o de ninguna.
+
+    Si Redis no responde la petición pasa: el límite protege la cola, no es
+    una garantía.
+    """
+
+    prefix = "ratelimit:"
+
+    def __init__(self):
+        self._acquire_script = None
+        self._lock = threading.Lock()
+        self.stats = {
+            "allowed": 0,
+            "limited_client": 0,
+            "limited_customer": 0,
+            "errors": 0,
+        }
+
+    def _script(self):
+        if self._acquire_script is None:
+            self._acquire_script = get_async_redis().register_script(ACQUIRE_SCRIPT)
+        return self._acquire_script
+
+    def record(self, counter: str):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+    async def acquire(self, buckets: list[Bucket]):
+        """Descuenta `cost` de cada cubeta o lanza RateLimitExceeded"""
+        if not settings.RATE_LIMIT_ENABLED or not buckets:
+            return
+        args = [int(time.time() * 1000)]
+        for bucket in buckets:
+            args.extend([bucket.capacity, bucket.refill_per_second, bucket.cost])
+        try:
+            allowed, wait_ms, limited = await self._script()(
+                keys=[self.prefix + bucket.key for bucket in buckets], args=args
+            )
+        except RedisError as e:
+            self.record("errors")
+            logger.warning(f"Rate limiter unavailable: {e}")
+            return
+        if allowed:
+            self.record("allowed")
+            return
+        scope = buckets[limited - 1].scope
+        self.record(f"limited_{scope}")
+        raise RateLimitExceeded(scope, wait_ms / 1000)
+
+
+def hash_key(value: str) -> str:
+    # Las API keys y los emails no se guardan en claro en Redis
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:32]
+
+
+def transaction_buckets(client: str, customer_emails: list[str]) -> list[Bucket]:
+    """
+    Cubetas de la creación de transacciones: una por cliente (API key o IP)
+    y una por email de cliente final, con un token por cargo
+    """
+    buckets = [
+        Bucket(
+            scope="client",
+            key=f"client:{client}",
+            capacity=settings.RATE_LIMIT_CLIENT_CAPACITY,
+            refill_per_second=settings.RATE_LIMIT_CLIENT_REFILL_PER_SECOND,
+            cost=len(customer_emails),
+        )
+    ]
+    costs: dict[str, int] = {}
+    for email in customer_emails:
+        email = email.strip().lower()
+        costs[email] = costs.get(email, 0) + 1
+    buckets.extend(
+        Bucket(
+            scope="customer",
+            key=f"customer:{hash_key(email)}",
+            capacity=settings.RATE_LIMIT_CUSTOMER_CAPACITY,
+            refill_per_second=settings.RATE_LIMIT_CUSTOMER_REFILL_PER_SECOND,
+            cost=cost,
+        )
+        for email, cost in costs.items()
+    )
+    return buckets
+
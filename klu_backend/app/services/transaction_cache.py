@@ -0,0 +1,72 @@
+import hashlib
+import logging
+import threading
+import uuid
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.db.redis import get_async_redis, get_redis
+from app.models.transaction import NON_TERMINAL_STATUSES, TransactionStatus
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionCache:
+    """
+    Caché read-through en Redis de las respuestas serializadas de
+    GET /transactions/{id}.
+
+    El worker invalida la entrada al cambiar el estado. Como una lectura de la
+    API puede volver a escribir un estado viejo justo después de la invalidación,
+    las transacciones no terminales se guardan con un TTL corto.
+    """
+
+    prefix = "transaction:"
+
+    def __init__(self):
+        self.ttl = settings.TRANSACTION_CACHE_TTL_SECONDS
+        self.pending_ttl = settings.TRANSACTION_CACHE_PENDING_TTL_SECONDS
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "errors": 0}
+
+    @staticmethod
+    def etag(body: str) -> str:
+        return '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+
+    def record(self, counter: str):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+    async def get(self, transaction_id: uuid.UUID) -> Optional[str]:
+        try:
+            body = await get_async_redis().get(self.prefix + str(transaction_id))
+        except RedisError as e:
+            self.record("errors")
+            logger.warning(f"Transaction cache unavailable: {e}")
+            return None
+        self.record("hits" if body is not None else "misses")
+        return body.decode("utf-8") if body is not None else None
+
+    async def set(
+        self, transaction_id: uuid.UUID, body: str, status: TransactionStatus
+    ):
+        ttl = self.pending_ttl if status in NON_TERMINAL_STATUSES else self.ttl
+        try:
+            await get_async_redis().set(self.prefix + str(transaction_id), body, ex=ttl)
+        except RedisError as e:
+            self.record("errors")
+            logger.warning(f"Transaction cache unavailable: {e}")
+
+    def invalidate_sync(self, transaction_id: uuid.UUID):
+        """Elimina la entrada (versión síncrona, para el worker)"""
+        try:
+            get_redis().delete(self.prefix + str(transaction_id))
+        except RedisError as e:
+            self.record("errors")
+            logger.warning(f"Transaction cache unavailable: {e}")
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from typing import Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.db.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "transaction-events:"
+
+
+class TransactionEventPublisher:
+    """Publica en Redis pub/sub los cambios de estado hechos por el worker"""
+
+    def publish_sync(self, transaction_id: uuid.UUID, body: str):
+        try:
+            get_redis().publish(CHANNEL_PREFIX + str(transaction_id), body)
+        except RedisError as e:
+            # Los clientes conectados siguen recibiendo el estado al reconectar
+            logger.warning(f"Could not publish transaction event: {e}")
+
+
+class TransactionEventBroker:
+    """
+    Reparte los eventos de Redis entre los clientes SSE de este proceso.
+
+    Usa una sola conexión pub/sub por proceso (suscrita al patrón de todos los
+    canales) y una cola asyncio por cliente, así que miles de clientes no
+    cuestan ni un hilo ni una conexión a Redis cada uno.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._listener: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def get_stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "transactions": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+        }
+
+    async def subscribe(self, transaction_id: uuid.UUID) -> asyncio.Queue:
+        """
+        Cola con los cuerpos JSON publicados para `transaction_id`. Se debe
+        liberar con `unsubscribe`.
+        """
+        queue = asyncio.Queue(maxsize=16)
+        self._subscribers[str(transaction_id)].add(queue)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        try:
+            # Suscribirse antes de leer el estado actual para no perder eventos
+            await asyncio.wait_for(self._connected.wait(), timeout=1)
+        except asyncio.TimeoutError:
+            logger.warning("Transaction event stream not connected to Redis yet")
+        return queue
+
+    def unsubscribe(self, transaction_id: uuid.UUID, queue: asyncio.Queue):
+        key = str(transaction_id)
+        queues = self._subscribers.get(key)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[key]
+
+    def _dispatch(self, channel: bytes, data: bytes):
+        key = channel.decode()[len(CHANNEL_PREFIX):]
+        for queue in self._subscribers.get(key, ()):
+            if queue.full():
+                # Sólo importa el último estado: se descarta el más viejo
+                queue.get_nowait()
+            queue.put_nowait(data.decode())
+
+    async def _listen(self):
+        # Conexión propia sin socket_timeout: el listener pasa mucho tiempo en espera
+        client = aioredis.Redis.from_url(
+            settings.get_redis_url(), health_check_interval=30
+        )
+        while True:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(CHANNEL_PREFIX + "*")
+                self._connected.set()
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self._dispatch(message["channel"], message["data"])
+            except (RedisError, OSError) as e:
+                logger.warning(f"Transaction event stream disconnected: {e}")
+            finally:
+                self._connected.clear()
+                await pubsub.aclose()
+            await asyncio.sleep(1)
@@ -0,0 +1,60 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from redis.exceptions import RedisError
+
+from app.db.redis import get_async_redis, get_redis
+from app.models.transaction import as_utc
+
+logger = logging.getLogger(__name__)
+
+MINUTE = timedelta(minutes=1)
+HOUR = timedelta(hours=1)
+
+
+def minute_bucket(value: datetime) -> datetime:
+    return as_utc(value).replace(second=0, microsecond=0)
+
+
+def hour_bucket(value: datetime) -> datetime:
+    return as_utc(value).replace(minute=0, second=0, microsecond=0)
+
+
+class TransactionStatsTracker:
+    """
+    Minutos (por fecha de creación) con transacciones nuevas o que cambiaron
+    de estado, en un set de Redis. El job de rollup sólo recalcula esos
+    minutos en lugar de recorrer todas las transacciones.
+    """
+
+    key = "transaction-stats:dirty"
+
+    @staticmethod
+    def _members(created_ats: list[datetime]) -> set[int]:
+        return {
+            int(minute_bucket(created_at).timestamp()) for created_at in created_ats
+        }
+
+    def mark_sync(self, created_ats: list[datetime]):
+        if not created_ats:
+            return
+        try:
+            get_redis().sadd(self.key, *self._members(created_ats))
+        except RedisError as e:
+            # El job también recalcula siempre los últimos minutos
+            logger.warning(f"Could not mark transaction stats as dirty: {e}")
+
+    async def mark(self, created_ats: list[datetime]):
+        if not created_ats:
+            return
+        try:
+            await get_async_redis().sadd(self.key, *self._members(created_ats))
+        except RedisError as e:
+            logger.warning(f"Could not mark transaction stats as dirty: {e}")
+
+    def pop_sync(self, limit: int) -> list[datetime]:
+        """Saca hasta `limit` minutos pendientes de recalcular"""
+        members = get_redis().spop(self.key, limit) or []
+        return [
+            datetime.fromtimestamp(int(member), tz=timezone.utc) for member in members
+        ]
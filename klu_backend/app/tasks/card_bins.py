@@ -0,0 +1,96 @@
+"""
+Carga y consulta de la tabla card_bins.
+
+Uso:
+    uv run python -m app.tasks.card_bins import bins.csv [--batch-size 1000]
+    uv run python -m app.tasks.card_bins lookup 41111111
+    uv run python -m app.tasks.card_bins status
+
+El CSV lleva encabezado con la columna `bin` (6 u 8 dígitos) y opcionalmente
+`bank`, `brand`, `type` y `product`; las demás columnas se ignoran. Las filas
+importadas reemplazan a las existentes y las respuestas de Blumonpay ya no
+las cambian. Los procesos de la API ven los cambios cuando vence su caché
+(CARD_BIN_CACHE_TTL_SECONDS, CARD_BIN_NEGATIVE_TTL_SECONDS).
+"""
+import argparse
+import csv
+from typing import Iterator, TextIO
+
+from app.db.session import SessionLocal
+from app.repositories.card_bin_repository import (
+    IMPORT,
+    CardBinRepository,
+    card_bin_values,
+)
+from app.services.card_bins import (
+    BIN_LENGTHS,
+    CardBinInfo,
+    bin_prefixes,
+    match_bin,
+)
+
+card_bin_repo = CardBinRepository()
+
+
+def read_bins(file: TextIO) -> Iterator[CardBinInfo]:
+    """Filas válidas del CSV; las demás se reportan y se saltan"""
+    for line, row in enumerate(csv.DictReader(file), start=2):
+        bin = (row.get("bin") or "").strip()
+        if not bin.isdigit() or len(bin) not in BIN_LENGTHS:
+            print(f"Line {line}: skipping invalid BIN {bin!r}")
+            continue
+        yield CardBinInfo(
+            bin=bin,
+            bank=(row.get("bank") or "").strip() or None,
+            brand=(row.get("brand") or "").strip() or None,
+            type=(row.get("type") or "").strip() or None,
+            product=(row.get("product") or "").strip() or None,
+        )
+
+
+def import_bins(file: TextIO, batch_size: int) -> int:
+    """Inserta o actualiza las filas del CSV en bloques de `batch_size`"""
+    imported = 0
+    rows = []
+    with SessionLocal() as db:
+        for info in read_bins(file):
+            rows.append(card_bin_values(info, IMPORT))
+            if len(rows) >= batch_size:
+                card_bin_repo.upsert_bins(db, rows)
+                imported += len(rows)
+                rows = []
+        if rows:
+            card_bin_repo.upsert_bins(db, rows)
+            imported += len(rows)
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    lookup_parser = subparsers.add_parser("lookup")
+    lookup_parser.add_argument("prefix", help="BIN or first digits of the card")
+    subparsers.add_parser("status")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        with open(args.path, newline="", encoding="utf-8") as file:
+            imported = import_bins(file, args.batch_size)
+        print(f"Imported {imported} BINs")
+        return
+    with SessionLocal() as db:
+        if args.command == "status":
+            counts = card_bin_repo.count_by_source(db)
+            print(f"{sum(counts.values())} BINs", end="")
+            print(f" ({counts})" if counts else "")
+            return
+        rows = card_bin_repo.find_bins(db, bin_prefixes(args.prefix))
+    info = match_bin(args.prefix, {row[0]: CardBinInfo(*row) for row in rows})
+    print(info or f"No BIN found for {args.prefix}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Revisión y reenvío de la dead-letter queue de cargos.
+
+Uso:
+    uv run python -m app.tasks.dead_letter list [--limit 50] [--reason REASON]
+    uv run python -m app.tasks.dead_letter replay [--limit 1000] [--reason REASON]
+        [--include-gateway-errors]
+    uv run python -m app.tasks.dead_letter purge
+
+Motivos (`reason`):
+    retries_exhausted    errores transitorios hasta agotar PAYMENT_MAX_RETRIES
+    deferrals_exhausted  circuito abierto o sin lugar hasta CHARGE_MAX_DEFERRALS
+    gateway_error        error no reintentable de Blumonpay. Incluye timeouts
+                         de lectura, 500, 502 y 504: el cargo pudo haberse
+                         aplicado, concilia con Blumonpay antes de reenviarlo
+    card_data_expired    la tarjeta venció en Redis (CARD_DATA_TTL_SECONDS)
+                         antes de cobrarse; el comercio debe enviar el cargo
+                         de nuevo
+    status_update_failed el cargo se aplicó en Blumonpay pero su estado no se
+                         pudo escribir; nunca se reenvía: resuélvelo con
+                         `app.tasks.reconciliation` con el resultado del error
+    error                error inesperado del worker
+
+`replay` sólo reenvía transacciones que siguen en `failed` y sin id de pago
+de Blumonpay; las demás entradas se descartan. Las de `gateway_error` se
+omiten salvo con `--include-gateway-errors`, una vez conciliadas. Las que ya
+no tienen la tarjeta en Redis (venció o Redis se vació) no se pueden
+reenviar: `replay` lista sus transacciones para que el comercio envíe esos
+cargos de nuevo, y las entradas vencen con la lista.
+"""
+import argparse
+import uuid
+
+from app.db.session import SessionLocal
+from app.models.transaction import TransactionStatus, utcnow
+from app.tasks.lanes import bulk_queue
+from app.tasks.payment_tasks import (
+    card_vault,
+    dead_letter_queue,
+    dispatch_payment_batch,
+    transaction_repo,
+)
+
+# El cargo pudo haberse aplicado: sólo se reenvía tras conciliarlo
+UNCONFIRMED_REASONS = {"gateway_error"}
+# El cargo se aplicó: reenviarlo lo cobraría dos veces
+CHARGED_REASONS = {"status_update_failed"}
+
+
+def card_suffix(payment_data: dict) -> str:
+    card_number = payment_data.get("noPresentCardData", {}).get("cardNumber", "")
+    return f"****{card_number[-4:]}" if card_number else "-"
+
+
+def list_entries(limit: int, reason: str = None):
+    print(f"{dead_letter_queue.count()} entries in the dead-letter queue")
+    for _, entry in dead_letter_queue.peek(limit):
+        if reason and entry["reason"] != reason:
+            continue
+        card = card_suffix(entry["payment_data"])
+        if not card_vault.exists_sync(entry["payment_data"]):
+            card += " (expired)"
+        print(
+            f"{entry['failed_at']}  {entry['transaction_id']}  "
+            f"{entry['reason']:<20} attempts={entry['attempts']}  "
+            f"card={card}  {entry['error']}"
+        )
+
+
+def replay(
+    limit: int, reason: str = None, include_gateway_errors: bool = False
+) -> dict:
+    """
+    Devuelve la transacción a `pending` y vuelve a encolar el cargo, con su
+    fila en payment_outbox por si la publicación falla.
+
+    Returns:
+        dict: cargos reenviados (`replayed`), entradas descartadas
+        (`discarded`), `gateway_error` omitidas (`unconfirmed`),
+        transacciones cuya tarjeta ya no está en Redis (`expired`) y
+        transacciones cobradas por conciliar (`charged`)
+    """
+    payments = []
+    replayed_entries = []
+    discarded = 0
+    unconfirmed = 0
+    expired = []
+    charged = []
+    queue = bulk_queue()
+    with SessionLocal() as db:
+        for raw_entry, entry in dead_letter_queue.peek(limit):
+            if reason and entry["reason"] != reason:
+                continue
+            # Antes de revisar la transacción: no se descartan aunque ya
+            # no esté en `failed`, quedan para conciliarlas
+            if entry["reason"] in CHARGED_REASONS:
+                charged.append(entry["transaction_id"])
+                continue
+            if entry["reason"] in UNCONFIRMED_REASONS and not include_gateway_errors:
+                unconfirmed += 1
+                continue
+            transaction_id = uuid.UUID(entry["transaction_id"])
+            transaction = transaction_repo.get_transaction(db, transaction_id)
+            if (
+                transaction is None
+                or transaction.status != TransactionStatus.FAILED
+                or transaction.blumonpay_transaction_id
+            ):
+                dead_letter_queue.remove(raw_entry)
+                discarded += 1
+                continue
+            if not card_vault.touch_sync(entry["payment_data"]):
+                expired.append(entry["transaction_id"])
+                continue
+            requeued = transaction_repo.requeue_transaction(
+                db, transaction_id, entry["payment_data"], queue, utcnow()
+            )
+            if requeued is None:
+                dead_letter_queue.remove(raw_entry)
+                discarded += 1
+                continue
+            payments.append((entry["transaction_id"], entry["payment_data"]))
+            replayed_entries.append(raw_entry)
+
+    dispatch_payment_batch(payments, queue=queue)
+    for raw_entry in replayed_entries:
+        dead_letter_queue.remove(raw_entry)
+    return {
+        "replayed": len(payments),
+        "discarded": discarded,
+        "unconfirmed": unconfirmed,
+        "expired": expired,
+        "charged": charged,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser("list")
+    list_parser.add_argument("--limit", type=int, default=50)
+    list_parser.add_argument("--reason")
+    replay_parser = subparsers.add_parser("replay")
+    replay_parser.add_argument("--limit", type=int, default=1000)
+    replay_parser.add_argument("--reason")
+    replay_parser.add_argument(
+        "--include-gateway-errors",
+        action="store_true",
+        help="Also replay gateway_error entries, once reconciled with Blumonpay",
+    )
+    subparsers.add_parser("purge")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        list_entries(args.limit, args.reason)
+    elif args.command == "replay":
+        result = replay(args.limit, args.reason, args.include_gateway_errors)
+        print(
+            f"Replayed {result['replayed']} payments, "
+            f"discarded {result['discarded']} stale entries"
+        )
+        if result["unconfirmed"]:
+            print(
+                f"Skipped {result['unconfirmed']} gateway_error entries: reconcile "
+                "them with Blumonpay, then replay with --include-gateway-errors"
+            )
+        if result["expired"]:
+            print(
+                f"Cannot replay {len(result['expired'])} payments: their card "
+                "data is no longer in Redis. The merchant must send them again:"
+            )
+            for transaction_id in result["expired"]:
+                print(f"  {transaction_id}")
+        if result["charged"]:
+            print(
+                f"Not replaying {len(result['charged'])} payments that were "
+                "charged but whose status was not saved. Resolve them with "
+                "app.tasks.reconciliation:"
+            )
+            for transaction_id in result["charged"]:
+                print(f"  {transaction_id}")
+    else:
+        print(f"Purged {dead_letter_queue.purge()} entries")
+
+
+if __name__ == "__main__":
+    main()
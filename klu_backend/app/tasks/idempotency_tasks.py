@@ -0,0 +1,61 @@
+"""
+Limpieza de la tabla idempotency_keys.
+
+El job `purge_idempotency_keys` corre con Celery beat cada
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS y borra, en bloques de
+IDEMPOTENCY_PURGE_BATCH_SIZE, las claves vencidas (IDEMPOTENCY_TTL_SECONDS
+después de crearse). Una clave vencida que todavía no se borró ya no repite
+la respuesta: la API la reemplaza.
+
+Uso:
+    uv run python -m app.tasks.idempotency_tasks status
+    uv run python -m app.tasks.idempotency_tasks purge
+"""
+import argparse
+import logging
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.transaction import utcnow
+from app.repositories.idempotency_key_repository import IdempotencyKeyRepository
+from app.worker import celery_app
+
+logger = logging.getLogger(__name__)
+idempotency_key_repo = IdempotencyKeyRepository()
+
+
+@celery_app.task(name="app.tasks.idempotency_tasks.purge_idempotency_keys")
+def purge_idempotency_keys():
+    now = utcnow()
+    purged = 0
+    while True:
+        # Un commit por bloque: no bloquea la tabla durante toda la limpieza
+        with SessionLocal() as db:
+            batch = idempotency_key_repo.purge_expired(
+                db, now, settings.IDEMPOTENCY_PURGE_BATCH_SIZE
+            )
+        purged += batch
+        if batch < settings.IDEMPOTENCY_PURGE_BATCH_SIZE:
+            break
+    if purged:
+        logger.info(f"Purged {purged} expired idempotency keys")
+    return {"purged": purged}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status")
+    subparsers.add_parser("purge")
+    args = parser.parse_args()
+
+    if args.command == "purge":
+        print(f"Purged {purge_idempotency_keys()['purged']} expired idempotency keys")
+        return
+    with SessionLocal() as db:
+        counts = idempotency_key_repo.count(db, utcnow())
+    print(f"{counts['total']} idempotency keys, {counts['expired']} expired")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Carriles de la cola de cargos:
+
+    interactive  POST /transactions/ (un cliente esperando en el checkout)
+    bulk         POST /transactions/batch y reenvíos de la dead-letter queue
+    retry        reintentos y cargos pospuestos por el worker
+
+Cada carril es una cola de Redis (`<PAYMENT_QUEUE_PREFIX>-<carril>`). El
+carril bulk puede repartirse en PAYMENT_BULK_SHARDS colas por cliente para
+que un lote grande de un comercio no retrase los de los demás. El worker
+consume todas con `WeightedLaneCycle`.
+"""
+import hashlib
+import json
+import logging
+import time
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.db.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+RETRY = "retry"
+LANES = (INTERACTIVE, BULK, RETRY)
+# Cola única anterior a los carriles: el worker la sigue consumiendo para
+# vaciar los mensajes publicados antes del cambio
+LEGACY_QUEUE = "payments-queue"
+
+
+def lane_queue(lane: str) -> str:
+    return f"{settings.PAYMENT_QUEUE_PREFIX}-{lane}"
+
+
+def bulk_queue(client: Optional[str] = None) -> str:
+    """Cola del carril bulk; con shards, la misma para cada cliente"""
+    if settings.PAYMENT_BULK_SHARDS <= 1:
+        return lane_queue(BULK)
+    digest = hashlib.sha256((client or "").encode("utf-8")).hexdigest()
+    shard = int(digest[:8], 16) % settings.PAYMENT_BULK_SHARDS
+    return f"{lane_queue(BULK)}-{shard}"
+
+
+def payment_queues() -> list[str]:
+    """Colas de cargos que consume el worker, por carril"""
+    bulk = [lane_queue(BULK)]
+    if settings.PAYMENT_BULK_SHARDS > 1:
+        shards = range(settings.PAYMENT_BULK_SHARDS)
+        bulk = [f"{lane_queue(BULK)}-{shard}" for shard in shards]
+    return [lane_queue(INTERACTIVE), *bulk, lane_queue(RETRY), LEGACY_QUEUE]
+
+
+def queue_lane(queue: str) -> Optional[str]:
+    """Carril de una cola de cargos; None si no es una (p. ej. `celery`)"""
+    if queue == LEGACY_QUEUE:
+        return INTERACTIVE
+    prefix = f"{settings.PAYMENT_QUEUE_PREFIX}-"
+    if not queue.startswith(prefix):
+        return None
+    lane = queue[len(prefix):].split("-", 1)[0]
+    return lane if lane in LANES else None
+
+
+def lane_weights() -> dict[str, int]:
+    return {
+        INTERACTIVE: settings.PAYMENT_LANE_WEIGHT_INTERACTIVE,
+        BULK: settings.PAYMENT_LANE_WEIGHT_BULK,
+        RETRY: settings.PAYMENT_LANE_WEIGHT_RETRY,
+    }
+
+
+class WeightedLaneCycle:
+    """
+    Orden de las colas en cada BRPOP del transporte de Redis de kombu
+    (`broker_transport_options["queue_order_strategy"]`). Redis entrega el
+    mensaje de la primera cola de la lista que tenga mensajes, así que:
+
+    - los carriles se ordenan por crédito (smooth weighted round robin): con
+      todos llenos cada carril recibe lecturas en proporción a su peso, y un
+      carril vacío cede su turno al siguiente;
+    - dentro de un carril las colas rotan como en el round robin de kombu:
+      cada shard del carril bulk se lee por turnos.
+
+    Las colas que no son de cargos (`celery`) tienen peso 1.
+    """
+
+    def __init__(self, it=None):
+        self.items = []
+        self.credit: dict[str, float] = {}
+        self.update(it or [])
+
+    @staticmethod
+    def _lane(queue: str) -> str:
+        return queue_lane(queue) or queue
+
+    @staticmethod
+    def _weight(lane: str) -> int:
+        return lane_weights().get(lane, 1)
+
+    def update(self, it):
+        # kombu pasa un set: se ordena para que el orden inicial sea estable
+        self.items[:] = sorted(it)
+
+    def consume(self, n):
+        by_lane: dict[str, list[str]] = {}
+        for queue in self.items:
+            by_lane.setdefault(self._lane(queue), []).append(queue)
+        lanes = sorted(
+            by_lane,
+            key=lambda lane: (-self.credit.get(lane, 0), -self._weight(lane)),
+        )
+        return [queue for lane in lanes for queue in by_lane[lane]][:n]
+
+    def rotate(self, last_used):
+        items = self.items
+        try:
+            items.append(items.pop(items.index(last_used)))
+        except ValueError:
+            return last_used
+        lanes = {self._lane(queue) for queue in items}
+        total = sum(self._weight(lane) for lane in lanes)
+        used = self._lane(last_used)
+        for lane in lanes:
+            credit = self.credit.get(lane, 0) + self._weight(lane)
+            if lane == used:
+                credit -= total
+            # Acotado: un carril vacío no acumula turnos y uno que se leyó
+            # solo (los demás vacíos) no queda relegado después
+            self.credit[lane] = max(-total, min(credit, total))
+        return last_used
+
+
+def queue_stats() -> dict:
+    """
+    Mensajes en espera por carril y antigüedad del más antiguo (segundos
+    desde su publicación, cabecera `published_at`). Los cargos con countdown
+    ya entregados al worker no cuentan.
+    """
+    queues = payment_queues()
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            for queue in queues:
+                pipe.llen(queue)
+                # BRPOP lee por la derecha: el último elemento es el más antiguo
+                pipe.lindex(queue, -1)
+            replies = pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Queue stats unavailable: {e}")
+        return {}
+
+    now = time.time()
+    depth = {lane: 0 for lane in LANES}
+    oldest_age = {lane: 0.0 for lane in LANES}
+    for index, queue in enumerate(queues):
+        lane = queue_lane(queue)
+        length, oldest = replies[2 * index], replies[2 * index + 1]
+        depth[lane] += length
+        if oldest is None:
+            continue
+        published_at = json.loads(oldest).get("headers", {}).get("published_at")
+        if published_at is not None:
+            oldest_age[lane] = max(oldest_age[lane], now - published_at)
+    return {"depth": depth, "oldest_age_seconds": oldest_age}
@@ -0,0 +1,153 @@
+"""
+Sweeper de la outbox de cargos (tabla payment_outbox).
+
+El job `sweep_payment_outbox` corre con Celery beat cada
+OUTBOX_SWEEP_INTERVAL_SECONDS:
+
+- publica las filas que ningún relay de la API publicó (API caída o sin
+  peticiones desde que Redis volvió);
+- vuelve a publicar las filas publicadas hace más de
+  OUTBOX_REDELIVER_AFTER_SECONDS cuya transacción ningún worker tomó (el
+  mensaje se perdió en Redis), hasta OUTBOX_MAX_ATTEMPTS veces. No lo hace
+  mientras su cola tenga mensajes en espera: ahí el cargo sólo está atrasado;
+- borra las filas creadas hace más de CARD_DATA_TTL_SECONDS: su tarjeta ya
+  no está en Redis. Sus transacciones pasan a `failed` y a la dead-letter
+  queue con el motivo `card_data_expired`.
+
+Uso:
+    uv run python -m app.tasks.outbox_tasks status
+    uv run python -m app.tasks.outbox_tasks sweep
+"""
+import argparse
+import logging
+from datetime import timedelta
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.db.redis import get_redis
+from app.db.session import SessionLocal
+from app.models.transaction import TransactionStatus, utcnow
+from app.repositories.outbox_repository import OutboxRepository
+from app.services.card_data import CardDataMissing
+from app.services.outbox import relay_outbox
+from app.tasks.payment_tasks import card_vault, dead_letter_queue, transaction_repo
+from app.worker import celery_app
+
+logger = logging.getLogger(__name__)
+outbox_repo = OutboxRepository()
+
+
+def idle_queues(queues: list[str]) -> list[str]:
+    """Colas sin mensajes en espera; ninguna si Redis no responde"""
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            for queue in queues:
+                pipe.llen(queue)
+            lengths = pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Could not read payment queue lengths: {e}")
+        return []
+    return [queue for queue, length in zip(queues, lengths) if length == 0]
+
+
+def expire_payments() -> int:
+    """Borra las filas cuya tarjeta venció y marca sus transacciones fallidas"""
+    created_before = utcnow() - timedelta(seconds=settings.CARD_DATA_TTL_SECONDS)
+    with SessionLocal() as db:
+        rows = outbox_repo.delete_expired(db, created_before)
+        if not rows:
+            db.rollback()
+            return 0
+        # Un solo commit: las filas se borran junto con el cambio de estado
+        failed = TransactionStatus.FAILED
+        updated = transaction_repo.update_transaction_statuses(
+            db,
+            [{"transaction_id": row.transaction_id, "status": failed} for row in rows],
+        )
+    # Sólo las que seguían en `pending`: un worker pudo tomar alguna mientras
+    failed_ids = {transaction.id for transaction in updated}
+    rows = [row for row in rows if row.transaction_id in failed_ids]
+    error = CardDataMissing("Card data expired before a worker picked it up")
+    for row in rows:
+        card_vault.discard_sync(row.payload)
+        dead_letter_queue.push_sync(
+            row.transaction_id,
+            row.payload,
+            "card_data_expired",
+            str(error),
+            attempts=row.attempts,
+        )
+    if rows:
+        logger.error(
+            f"{len(rows)} payments expired in the outbox after "
+            f"{settings.CARD_DATA_TTL_SECONDS}s and were marked as failed"
+        )
+    return len(rows)
+
+
+@celery_app.task(name="app.tasks.outbox_tasks.sweep_payment_outbox")
+def sweep_payment_outbox():
+    expired = expire_payments()
+    published_before = utcnow() - timedelta(
+        seconds=settings.OUTBOX_REDELIVER_AFTER_SECONDS
+    )
+    with SessionLocal() as db:
+        stale = outbox_repo.stale_queues(
+            db, published_before, settings.OUTBOX_MAX_ATTEMPTS
+        )
+        rearmed = outbox_repo.rearm_stale(
+            db, published_before, settings.OUTBOX_MAX_ATTEMPTS, idle_queues(stale)
+        )
+    if rearmed:
+        logger.warning(f"Republishing {rearmed} payments no worker picked up")
+
+    published = 0
+    while True:
+        with SessionLocal() as db:
+            batch = relay_outbox(db, outbox_repo, settings.OUTBOX_RELAY_BATCH_SIZE)
+        published += batch
+        if batch < settings.OUTBOX_RELAY_BATCH_SIZE:
+            break
+
+    with SessionLocal() as db:
+        backlog = outbox_repo.get_backlog(db, settings.OUTBOX_MAX_ATTEMPTS)
+    if backlog["exhausted"]:
+        logger.error(
+            f"{backlog['exhausted']} payments were published "
+            f"{settings.OUTBOX_MAX_ATTEMPTS} times and no worker picked them up"
+        )
+    return {
+        "published": published,
+        "rearmed": rearmed,
+        "exhausted": backlog["exhausted"],
+        "expired": expired,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status")
+    subparsers.add_parser("sweep")
+    args = parser.parse_args()
+
+    if args.command == "sweep":
+        result = sweep_payment_outbox()
+        print(
+            f"Published {result['published']} payments, "
+            f"republished {result['rearmed']}, exhausted {result['exhausted']}, "
+            f"expired {result['expired']}"
+        )
+        return
+    with SessionLocal() as db:
+        backlog = outbox_repo.get_backlog(db, settings.OUTBOX_MAX_ATTEMPTS)
+    oldest = backlog["oldest_unpublished"]
+    print(f"{backlog['unpublished']} unpublished payments", end="")
+    print(f" (oldest from {oldest.isoformat()})" if oldest else "")
+    print(f"{backlog['published']} published and not picked up by a worker")
+    print(f"{backlog['exhausted']} exhausted ({settings.OUTBOX_MAX_ATTEMPTS} attempts)")
+
+
+if __name__ == "__main__":
+    main()
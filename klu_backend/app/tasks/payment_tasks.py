@@ -1,52 +1,486 @@
 import logging
+import random
+import time
 import uuid
+from datetime import timedelta
 
-from app.db.session import SessionLocal
+from app.core.config import settings
+from app.core.correlation import set_transaction_id
+from app.core.metrics import get_registry, register_stats
+from app.db.pool import get_pool_stats
+from app.db.session import SessionLocal, engine
+from app.models.transaction import TransactionStatus, utcnow
+from app.repositories.card_bin_repository import (
+    GATEWAY,
+    CardBinRepository,
+    card_bin_values,
+)
+from app.repositories.gateway_result_repository import (
+    GatewayResultRepository,
+    gateway_result_values,
+)
 from app.repositories.transaction_repository import TransactionRepository
-from app.services.blumonpay_service import BlumonpayService
+from app.services.batch_writer import BatchWriter
+from app.services.blumonpay_service import BlumonpayAPIError, BlumonpayService
+from app.services.card_bins import CardBinCache, learned_bin
+from app.services.card_data import CardDataMissing, CardVault
+from app.services.circuit_breaker import CircuitOpenError, blumonpay_circuit_breaker
+from app.services.concurrency_limiter import (
+    AdaptiveConcurrencyLimiter,
+    ConcurrencyLimitExceeded,
+)
+from app.services.dead_letter import DeadLetterQueue
+from app.services.transaction_cache import TransactionCache
+from app.services.transaction_events import TransactionEventPublisher
+from app.services.transaction_stats import TransactionStatsTracker
+from app.tasks import producer
+from app.tasks.lanes import RETRY, lane_queue, queue_stats
 from app.worker import celery_app
+from celery.signals import (
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_shutdown,
+)
+from celery.utils.time import get_exponential_backoff_interval
+from celery.worker.control import inspect_command
+from prometheus_client import start_http_server
 
 logger = logging.getLogger(__name__)
+# Una instancia por proceso: reutiliza el pool HTTP y el token entre tareas
 blumonpay_service = BlumonpayService()
-transaction_repo = TransactionRepository()
+transaction_repo = TransactionRepository(
+    cache=TransactionCache(),
+    events=TransactionEventPublisher(),
+    stats=TransactionStatsTracker(),
+)
+# El circuito se comparte entre procesos; el límite de concurrencia es local
+circuit_breaker = blumonpay_circuit_breaker()
+dead_letter_queue = DeadLetterQueue()
+card_vault = CardVault()
+charge_limiter = AdaptiveConcurrencyLimiter(
+    initial=settings.BLUMONPAY_CONCURRENCY_INITIAL,
+    minimum=settings.BLUMONPAY_CONCURRENCY_MIN,
+    maximum=settings.BLUMONPAY_CONCURRENCY_MAX,
+    latency_target=settings.BLUMONPAY_LATENCY_TARGET_SECONDS,
+)
 
+gateway_result_repo = GatewayResultRepository()
 
-@celery_app.task(name="app.tasks.payment_tasks.process_payment")
-def process_payment(transaction_id: str, payment_data: dict):
+
+def write_gateway_results(rows: list[dict]):
+    with SessionLocal() as db:
+        gateway_result_repo.insert_results(db, rows)
+
+
+# Las respuestas de Blumonpay se guardan en bloque, fuera del camino del cargo
+gateway_results = BatchWriter(
+    "gateway_results",
+    write_gateway_results,
+    batch_size=settings.GATEWAY_RESULTS_BATCH_SIZE,
+    flush_interval=settings.GATEWAY_RESULTS_FLUSH_SECONDS,
+)
+
+card_bin_repo = CardBinRepository()
+# BIN ya guardados por este proceso: cada BIN se escribe una vez por TTL y
+# cuando Blumonpay responde con otros datos, no en cada cargo
+learned_bins = CardBinCache()
+
+
+def write_card_bins(rows: list[dict]):
+    with SessionLocal() as db:
+        card_bin_repo.upsert_bins(db, rows)
+
+
+card_bins = BatchWriter(
+    "card_bins",
+    write_card_bins,
+    batch_size=settings.GATEWAY_RESULTS_BATCH_SIZE,
+    flush_interval=settings.GATEWAY_RESULTS_FLUSH_SECONDS,
+)
+
+
+def learn_card_bin(payment_data: dict, payment_result: dict):
+    """Guarda en card_bins el `binInformation` de la respuesta de Blumonpay"""
+    card_number = payment_data.get("noPresentCardData", {}).get("cardNumber", "")
+    info = learned_bin(card_number, payment_result.get("card_info"))
+    if info is None or learned_bins.get(info.bin) == info:
+        return
+    learned_bins.put(info.bin, info)
+    card_bins.add(card_bin_values(info, GATEWAY))
+
+
+def write_status_updates(updates: list[dict]):
+    with SessionLocal() as db:
+        transaction_repo.update_transaction_statuses(db, updates)
+
+
+# Estados finales de los cargos: un commit por bloque en lugar de uno por
+# cargo. La tarea espera a que su bloque se escriba antes de terminar
+status_updates = BatchWriter(
+    "status_updates",
+    write_status_updates,
+    batch_size=settings.STATUS_UPDATE_BATCH_SIZE,
+    flush_interval=settings.STATUS_UPDATE_FLUSH_SECONDS,
+)
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
     """
-    Tarea asíncrona para procesar un pago a través de Blumonpay
+    Expone /metrics del worker en WORKER_METRICS_PORT. Con el pool gevent el
+    proceso principal es el que ejecuta los cargos; con prefork los
+    histogramas de los hijos sólo se ven con PROMETHEUS_MULTIPROC_DIR.
     """
-    logger.info(f"Processing payment for transaction {transaction_id}")
+    if not settings.WORKER_METRICS_PORT:
+        return
+    register_stats("worker_db_pool", lambda: get_pool_stats(engine))
+    register_stats("blumonpay_client", blumonpay_service.get_stats)
+    register_stats("circuit_breaker", circuit_breaker.get_state)
+    register_stats("concurrency_limiter", charge_limiter.get_stats)
+    register_stats("gateway_results", gateway_results.get_stats)
+    register_stats("card_bins", card_bins.get_stats)
+    register_stats("status_updates", status_updates.get_stats)
+    register_stats("payment_queue", queue_stats, label="lane")
+    start_http_server(settings.WORKER_METRICS_PORT, registry=get_registry())
+    logger.info(f"Worker metrics on port {settings.WORKER_METRICS_PORT}")
+
 
+@worker_process_init.connect
+def reset_db_pool(**kwargs):
+    # Las conexiones heredadas del proceso padre no se comparten tras el fork
+    engine.dispose(close=False)
+
+
+@worker_process_shutdown.connect
+def close_blumonpay_client(**kwargs):
+    logger.info(f"Blumonpay client stats: {blumonpay_service.get_stats()}")
+    blumonpay_service.close()
+
+
+# Con prefork cada hijo escribe sus filas al terminar; con gevent/solo los
+# cargos se ejecutan en el proceso principal
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_batch_writers(**kwargs):
+    status_updates.flush()
+    gateway_results.flush()
+    card_bins.flush()
+
+
+@inspect_command()
+def worker_stats(state):
+    """
+    Contadores del pool de la base de datos, del cliente de Blumonpay y del
+    límite de concurrencia del worker:
+    `celery_app.control.broadcast("worker_stats", reply=True)`. Con el pool
+    prefork responde el proceso padre, que no ejecuta cargos.
+    """
+    return {
+        "db_pool": get_pool_stats(engine),
+        "blumonpay": blumonpay_service.get_stats(),
+        "circuit_breaker": circuit_breaker.get_state(),
+        "concurrency_limiter": charge_limiter.get_stats(),
+        "gateway_results": gateway_results.get_stats(),
+        "card_bins": card_bins.get_stats(),
+        "status_updates": status_updates.get_stats(),
+    }
+
+
+def charge(payment_data: dict) -> dict:
+    """
+    Envía el cargo a Blumonpay respetando el circuit breaker y el límite de
+    concurrencia.
+
+    Raises:
+        CircuitOpenError: Si el circuito está abierto
+        ConcurrencyLimitExceeded: Si no se liberó un lugar a tiempo
+        BlumonpayAPIError: Si hay un error de comunicación con la API
+    """
+    # Primero el lugar y después el circuito: en half-open `allow` entrega la
+    # única llamada de prueba, que no debe perderse esperando un lugar
+    charge_limiter.acquire(timeout=settings.BLUMONPAY_CONCURRENCY_WAIT_SECONDS)
+    try:
+        circuit_breaker.allow()
+    except CircuitOpenError:
+        charge_limiter.cancel()
+        raise
+    start = time.monotonic()
     try:
-        # Convertir a objeto UUID
-        transaction_id = uuid.UUID(transaction_id)
+        result = blumonpay_service.process_payment_sync(payment_data=payment_data)
+    except BlumonpayAPIError as e:
+        charge_limiter.release(time.monotonic() - start, overloaded=e.is_unavailable)
+        if e.is_unavailable:
+            circuit_breaker.record_failure()
+        raise
+    except Exception:
+        charge_limiter.release(time.monotonic() - start)
+        raise
+    charge_limiter.release(time.monotonic() - start)
+    circuit_breaker.record_success()
+    return result
 
-        # Procesar el pago con Blumonpay
-        payment_result = blumonpay_service.process_payment_sync(payment_data=payment_data)
-        payment_status = payment_result.get("message")
-        payment_id = payment_result.get("id")
-        # Actualizar el estado de la transacción
-        db = SessionLocal()
-        updated_transaction = transaction_repo.update_transaction_status(
-            db=db,
-            transaction_id=transaction_id,
-            status=payment_status,
-            blumonpay_transaction_id=payment_id,
-        )
-        logger.info(
-            f"Transaction {transaction_id} updated with status {payment_status} and payment id {payment_id}"
+
+def deferral_countdown(deferrals: int, retry_after: float) -> float:
+    """Backoff exponencial con jitter, nunca antes de `retry_after`"""
+    backoff = settings.CHARGE_DEFER_BASE_SECONDS * 2 ** min(deferrals, 16)
+    countdown = min(max(backoff, retry_after), settings.CHARGE_DEFER_MAX_SECONDS)
+    return countdown + random.uniform(0, countdown * 0.2)
+
+
+# Los reintentos se limitan en la tarea (PAYMENT_MAX_RETRIES y
+# CHARGE_MAX_DEFERRALS), no con el max_retries de Celery.
+#
+# acks_late: el mensaje se confirma cuando el estado final ya está escrito.
+# Si el worker muere antes, la nueva entrega no vuelve a cobrar: la
+# transacción ya no está en `pending`
+@celery_app.task(
+    bind=True,
+    max_retries=None,
+    acks_late=True,
+    name="app.tasks.payment_tasks.process_payment",
+)
+def process_payment(
+    self,
+    transaction_id: str,
+    payment_data: dict,
+    attempt: int = 0,
+    deferrals: int = 0,
+):
+    """
+    Tarea asíncrona para procesar un pago a través de Blumonpay.
+
+    La transacción pasa de `pending` a `processing` mientras se cobra y
+    termina en `completed` o `declined` (un rechazo es un estado final). Los
+    errores transitorios la devuelven a `pending` y se reintentan con backoff
+    exponencial; los demás errores y los reintentos agotados la marcan como
+    `failed` y la envían a la dead-letter queue.
+
+    Args:
+        attempt (int): Reintentos por errores transitorios ya realizados
+        deferrals (int): Veces que se pospuso sin llamar a Blumonpay
+    """
+    # Correlaciona logs y exemplars de métricas de este cargo
+    set_transaction_id(transaction_id)
+    logger.info(f"Processing payment for transaction {transaction_id}")
+
+    # Convertir a objeto UUID
+    transaction_id = uuid.UUID(transaction_id)
+
+    # Tomar la transacción (pending → processing) en un solo UPDATE: una
+    # entrega repetida del mensaje o una tarea concurrente no cobra dos veces.
+    # Borra también su fila de la outbox: el mensaje ya llegó
+    with SessionLocal() as db:
+        claimed = transaction_repo.claim_transaction(db, transaction_id)
+        if claimed is None:
+            transaction = transaction_repo.get_transaction(db, transaction_id)
+    if claimed is None:
+        if transaction is None:
+            logger.error(f"Transaction {transaction_id} not found")
+            return None
+        logger.warning(
+            f"Transaction {transaction_id} is already {transaction.status}, skipping"
         )
         return {
-            "transaction_id": str(updated_transaction.id),
-            "status": updated_transaction.status,
+            "transaction_id": str(transaction.id),
+            "status": transaction.status,
         }
+
+    # La sesión se cierra antes de llamar a Blumonpay: con el pool gevent hay
+    # cientos de cargos en vuelo por proceso y ninguno debe retener una
+    # conexión a la base de datos mientras espera la respuesta
+    try:
+        # `payment_data` sólo lleva la referencia a la tarjeta; la completa
+        # se recupera de Redis para este intento y no sale de la tarea
+        card_payment = card_vault.reveal_sync(payment_data)
+        # Procesar el pago con Blumonpay
+        payment_result = charge(card_payment)
+    except CardDataMissing as e:
+        return fail_payment(
+            transaction_id, payment_data, attempt, "card_data_expired", e
+        )
+    except (CircuitOpenError, ConcurrencyLimitExceeded) as e:
+        # No ocupar un lugar del worker esperando a un procesador caído
+        return defer_payment(
+            self, transaction_id, payment_data, attempt, deferrals, e
+        )
+    except BlumonpayAPIError as e:
+        if e.retryable and attempt < settings.PAYMENT_MAX_RETRIES:
+            countdown = get_exponential_backoff_interval(
+                factor=settings.PAYMENT_RETRY_BACKOFF_SECONDS,
+                retries=attempt,
+                maximum=settings.PAYMENT_RETRY_BACKOFF_MAX_SECONDS,
+                full_jitter=True,
+            )
+            logger.warning(
+                f"Retrying payment for transaction {transaction_id} "
+                f"in {countdown}s (attempt {attempt + 1}): {e}"
+            )
+            return requeue_payment(
+                self, transaction_id, payment_data, attempt + 1, deferrals, countdown
+            )
+        reason = "retries_exhausted" if e.retryable else "gateway_error"
+        return fail_payment(transaction_id, payment_data, attempt, reason, e)
+    except Exception as e:
+        return fail_payment(transaction_id, payment_data, attempt, "error", e)
+
+    payment_status = (
+        TransactionStatus.COMPLETED
+        if payment_result.get("success") is True
+        else TransactionStatus.DECLINED
+    )
+    payment_id = payment_result.get("transaction_id")
+    gateway_results.add(gateway_result_values(transaction_id, payment_result))
+    learn_card_bin(card_payment, payment_result)
+    # Aprobado o rechazado, el cargo no se vuelve a enviar
+    card_vault.discard_sync(payment_data)
+    logger.debug(f"Blumonpay client stats: {blumonpay_service.get_stats()}")
+    # Actualizar el estado de la transacción en el siguiente bloque y esperar
+    # a que se escriba: el mensaje se confirma (acks_late) sólo después. Si
+    # esto falla el cargo ya se aplicó: no se marca como fallido
+    update = {
+        "transaction_id": transaction_id,
+        "status": payment_status,
+        "blumonpay_transaction_id": payment_id,
+    }
+    try:
+        status_updates.submit(update).result()
+    except Exception:
+        logger.warning(
+            f"Batched status update failed for transaction {transaction_id}, "
+            "retrying on its own"
+        )
+        try:
+            with SessionLocal() as db:
+                transaction_repo.update_transaction_status(db=db, **update)
+        except Exception as e:
+            return hold_charged_payment(payment_data, update, attempt, e)
+    logger.info(
+        f"Transaction {transaction_id} updated with status {payment_status} "
+        f"({payment_result.get('message')}) and payment id {payment_id}"
+    )
+    return {"transaction_id": str(transaction_id), "status": payment_status}
+
+
+def hold_charged_payment(payment_data: dict, update: dict, attempt: int, error):
+    """
+    El cargo ya se aplicó en Blumonpay pero su estado final no se pudo
+    escribir. Se deja en `unreconciled` en lugar de `processing` y se registra
+    en la dead-letter queue para conciliarlo; nunca se reenvía
+    """
+    transaction_id = update["transaction_id"]
+    payment_id = update["blumonpay_transaction_id"]
+    logger.error(
+        f"Transaction {transaction_id} was charged as {update['status']} "
+        f"(payment id {payment_id}) but its status could not be saved: {error}"
+    )
+    try:
+        with SessionLocal() as db:
+            transaction_repo.update_transaction_status(
+                db,
+                transaction_id,
+                TransactionStatus.UNRECONCILED,
+                blumonpay_transaction_id=payment_id,
+            )
     except Exception as e:
-        logger.error(f"Error processing payment: {str(e)}")
-        # Actualizar transacción como fallida
-        db = SessionLocal()
+        # Sigue en `processing`; la entrada de la dead-letter queue lo registra
+        logger.error(
+            f"Could not mark transaction {transaction_id} as unreconciled: {e}"
+        )
+    dead_letter_queue.push_sync(
+        transaction_id,
+        payment_data,
+        "status_update_failed",
+        f"Charged as {update['status']} with payment id {payment_id}, "
+        f"do not replay: {error}",
+        attempts=attempt,
+    )
+    return {
+        "transaction_id": str(transaction_id),
+        "status": TransactionStatus.UNRECONCILED,
+    }
+
+
+def fail_payment(
+    transaction_id: uuid.UUID,
+    payment_data: dict,
+    attempt: int,
+    reason: str,
+    error: Exception,
+):
+    """Marca la transacción como fallida y la envía a la dead-letter queue"""
+    logger.error(f"Error processing payment ({reason}): {str(error)}")
+    # Actualizar transacción como fallida
+    with SessionLocal() as db:
         transaction_repo.update_transaction_status(
+            db, transaction_id, TransactionStatus.FAILED
+        )
+    dead_letter_queue.push_sync(
+        transaction_id, payment_data, reason, str(error), attempts=attempt
+    )
+    return None
+
+
+def defer_payment(
+    task,
+    transaction_id: uuid.UUID,
+    payment_data: dict,
+    attempt: int,
+    deferrals: int,
+    error,
+):
+    """Vuelve a encolar el cargo más tarde sin llamar a Blumonpay"""
+    # Contador propio: los reintentos por errores de Blumonpay no cuentan
+    if deferrals >= settings.CHARGE_MAX_DEFERRALS:
+        return fail_payment(
+            transaction_id, payment_data, attempt, "deferrals_exhausted", error
+        )
+
+    countdown = deferral_countdown(deferrals, error.retry_after)
+    logger.warning(
+        f"Deferring payment for transaction {transaction_id} "
+        f"by {countdown:.1f}s: {error}"
+    )
+    return requeue_payment(
+        task, transaction_id, payment_data, attempt, deferrals + 1, countdown
+    )
+
+
+def requeue_payment(
+    task,
+    transaction_id: uuid.UUID,
+    payment_data: dict,
+    attempt: int,
+    deferrals: int,
+    countdown,
+):
+    # Los reintentos no vuelven al carril de origen: no compiten con los
+    # cargos nuevos del checkout
+    queue = lane_queue(RETRY)
+    # El cargo no se aplicó: la transacción vuelve a pending para que la
+    # siguiente ejecución pueda tomarla, con la tarjeta vigente hasta entonces.
+    # El reintento queda en la outbox: si no se publica, el sweeper lo hace
+    card_vault.touch_sync(payment_data)
+    with SessionLocal() as db:
+        transaction_repo.requeue_transaction(
             db,
             transaction_id,
-            "failed",
+            payment_data,
+            queue,
+            available_at=utcnow() + timedelta(seconds=countdown),
         )
+    args = (str(transaction_id), payment_data)
+    kwargs = {"attempt": attempt, "deferrals": deferrals}
+    raise task.retry(args=args, kwargs=kwargs, countdown=countdown, queue=queue)
+
+
+def dispatch_payment_batch(payments: list[tuple[str, dict]], queue: str = None):
+    """
+    Publica un lote de cargos en el carril bulk con la app del worker
+    (reenvíos de la dead-letter queue); la API publica con `app.tasks.producer`
+
+    Args:
+        payments (list): Tuplas (transaction_id, payment_data)
+        queue (str): Cola ya resuelta; por defecto la shard sin cliente
+    """
+    producer.dispatch_payment_batch(payments, app=celery_app, queue=queue)
@@ -0,0 +1,84 @@
+"""
+Publicación de cargos desde el relay de la outbox (`app.services.outbox`).
+Las tareas se envían por nombre con un cliente de Celery propio: la API no
+importa `app.worker` ni los módulos de tareas (cliente de Blumonpay,
+repositorios síncronos, gevent), y celery se carga con la primera
+publicación y no al arrancar.
+"""
+import functools
+import time
+from typing import TYPE_CHECKING
+
+from app.core.config import settings
+from app.tasks.lanes import INTERACTIVE, bulk_queue, lane_queue
+
+if TYPE_CHECKING:
+    from celery import Celery
+
+PROCESS_PAYMENT_TASK = "app.tasks.payment_tasks.process_payment"
+# Compartidas con el worker (`app.worker`): sin una cola explícita los
+# cargos van al carril interactivo
+TASK_ROUTES = {"app.tasks.payment_tasks.*": lane_queue(INTERACTIVE)}
+
+
+def stamp_published_at(headers=None, **kwargs):
+    # Los reintentos se vuelven a publicar: la espera se mide desde el último
+    headers["published_at"] = time.time()
+
+
+@functools.cache
+def get_producer() -> "Celery":
+    """Cliente de Celery sin tareas registradas, creado una vez por proceso"""
+    from celery import Celery
+    from celery.signals import before_task_publish
+
+    before_task_publish.connect(stamp_published_at)
+    producer = Celery(main="producer", broker=settings.get_redis_url())
+    producer.conf.update(
+        task_serializer="json",
+        accept_content=["json"],
+        timezone="UTC",
+        enable_utc=True,
+        task_routes=TASK_ROUTES,
+    )
+    return producer
+
+
+def publish_payment(transaction_id: str, payment_data: dict, queue: str = None):
+    get_producer().send_task(
+        PROCESS_PAYMENT_TASK,
+        args=(transaction_id, payment_data),
+        queue=queue or lane_queue(INTERACTIVE),
+    )
+
+
+def dispatch_payment_batch(
+    payments: list[tuple[str, dict]],
+    client: str = None,
+    app: "Celery" = None,
+    queue: str = None,
+):
+    """
+    Publica un lote de cargos en el carril bulk: un mensaje de
+    process_payment por cargo, con una sola conexión al broker. Cada cargo
+    conserva las opciones de la tarea (acks_late, reintentos) y un Blumonpay
+    lento no detiene a los demás cargos del lote.
+
+    Args:
+        payments (list): Tuplas (transaction_id, payment_data)
+        client (str): Cliente que envía el lote; elige la shard del carril
+        app (Celery): App con la que se publica; por defecto `get_producer()`
+        queue (str): Cola ya resuelta (outbox); tiene prioridad sobre `client`
+    """
+    if not payments:
+        return
+    app = app or get_producer()
+    queue = queue or bulk_queue(client)
+    with app.producer_or_acquire() as publisher:
+        for transaction_id, payment_data in payments:
+            app.send_task(
+                PROCESS_PAYMENT_TASK,
+                args=(transaction_id, payment_data),
+                queue=queue,
+                producer=publisher,
+            )
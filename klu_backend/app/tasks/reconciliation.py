@@ -0,0 +1,72 @@
+"""
+Conciliación de las transacciones en `unreconciled`.
+
+Son filas anteriores a los estados fijos que guardaban como estado la
+descripción de Blumonpay: no se sabe si el cargo se aprobó. Busca cada una
+en el portal de Blumonpay (monto, email y fecha) y resuélvela con su
+resultado. También quedan aquí los cargos cobrados cuyo estado final el
+worker no pudo escribir: su entrada `status_update_failed` de la dead-letter
+queue dice el resultado y el id de pago de Blumonpay.
+
+Uso:
+    uv run python -m app.tasks.reconciliation list [--limit 100]
+    uv run python -m app.tasks.reconciliation resolve TRANSACTION_ID completed
+        [--blumonpay-id ID]
+    uv run python -m app.tasks.reconciliation resolve TRANSACTION_ID declined
+"""
+import argparse
+import uuid
+
+from app.db.session import SessionLocal
+from app.models.transaction import TransactionStatus
+from app.tasks.payment_tasks import transaction_repo
+
+RESOLUTIONS = (TransactionStatus.COMPLETED, TransactionStatus.DECLINED)
+
+
+def list_unreconciled(limit: int):
+    with SessionLocal() as db:
+        transactions, cursor = transaction_repo.list_transactions(
+            db, limit=limit, status=TransactionStatus.UNRECONCILED
+        )
+    for transaction in transactions:
+        print(
+            f"{transaction.created_at.isoformat()}  {transaction.id}  "
+            f"{transaction.amount} {transaction.currency}  "
+            f"{transaction.customer_email}"
+        )
+    if cursor:
+        print(f"More than {limit} unreconciled transactions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser("list")
+    list_parser.add_argument("--limit", type=int, default=100)
+    resolve_parser = subparsers.add_parser("resolve")
+    resolve_parser.add_argument("transaction_id", type=uuid.UUID)
+    resolve_parser.add_argument(
+        "status", choices=[str(status) for status in RESOLUTIONS]
+    )
+    resolve_parser.add_argument("--blumonpay-id", help="Blumonpay payment id")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        list_unreconciled(args.limit)
+        return
+    with SessionLocal() as db:
+        updated = transaction_repo.update_transaction_status(
+            db,
+            args.transaction_id,
+            TransactionStatus(args.status),
+            blumonpay_transaction_id=args.blumonpay_id,
+        )
+    if updated is None:
+        print(f"Transaction {args.transaction_id} is not unreconciled")
+        return
+    print(f"Transaction {args.transaction_id} resolved as {args.status}")
+
+
+if __name__ == "__main__":
+    main()
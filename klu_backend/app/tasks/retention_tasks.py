@@ -0,0 +1,169 @@
+"""
+Particiones mensuales y retención de la tabla transactions (PostgreSQL).
+
+El job `maintain_transaction_partitions` corre con Celery beat cada
+PARTITION_MAINTENANCE_INTERVAL_SECONDS: crea las particiones de los próximos
+TRANSACTION_PARTITIONS_AHEAD meses y archiva las que salen de los últimos
+TRANSACTION_RETENTION_MONTHS meses. Archivar una partición es separarla de
+la tabla, copiarla a TRANSACTION_ARCHIVE_DIR como CSV comprimido (junto con
+sus filas de transaction_gateway_results) y borrarla. Si el archivado se
+interrumpe, la partición separada se retoma en la siguiente ejecución.
+
+Uso:
+    uv run python -m app.tasks.retention_tasks list
+    uv run python -m app.tasks.retention_tasks maintain [--dry-run]
+"""
+import argparse
+import gzip
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.partitions import add_months, month_start
+from app.db.session import SessionLocal, engine
+from app.models.transaction import utcnow
+from app.repositories.transaction_archive_repository import (
+    TransactionArchiveRepository,
+)
+from app.worker import celery_app
+
+logger = logging.getLogger(__name__)
+archive_repo = TransactionArchiveRepository()
+
+# pg_try_advisory_lock: una sola ejecución a la vez entre workers
+MAINTENANCE_LOCK = "transactions-partition-maintenance"
+
+
+def retention_cutoff(now: datetime) -> datetime:
+    """Se conservan el mes actual y los TRANSACTION_RETENTION_MONTHS anteriores"""
+    return add_months(month_start(now), -settings.TRANSACTION_RETENTION_MONTHS)
+
+
+def archive_paths(name: str, archive_dir: Path) -> tuple[Path, Path]:
+    """Archivos de la partición y de sus respuestas de Blumonpay"""
+    suffix = name.removeprefix(f"{archive_repo.table}_")
+    return (
+        archive_dir / f"{name}.csv.gz",
+        archive_dir / f"transaction_gateway_results_{suffix}.csv.gz",
+    )
+
+
+def write_archive(path: Path, copy):
+    """Escribe en un archivo temporal y lo renombra cuando está en disco"""
+    partial = path.with_name(f"{path.name}.partial")
+    with open(partial, "wb") as raw:
+        with gzip.open(raw, "wt", encoding="utf-8", compresslevel=6) as file:
+            copy(file)
+        raw.flush()
+        os.fsync(raw.fileno())
+    partial.replace(path)
+
+
+def archive_partition(db, name: str, archive_dir: Path) -> list[Path]:
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    transactions_path, gateway_results_path = archive_paths(name, archive_dir)
+    archive_repo.detach_partition(db, name)
+    write_archive(
+        transactions_path, lambda file: archive_repo.copy_partition(db, name, file)
+    )
+    write_archive(
+        gateway_results_path,
+        lambda file: archive_repo.copy_gateway_results(db, name, file),
+    )
+    # Sólo se borra cuando los dos archivos están completos
+    archive_repo.drop_partition(db, name)
+    logger.info(f"Archived partition {name} to {transactions_path}")
+    return [transactions_path, gateway_results_path]
+
+
+@celery_app.task(name="app.tasks.retention_tasks.maintain_transaction_partitions")
+def maintain_transaction_partitions(dry_run: bool = False):
+    if engine.dialect.name != "postgresql":
+        return {"partitioned": False}
+    with engine.connect() as lock_connection:
+        locked = lock_connection.scalar(
+            text("SELECT pg_try_advisory_lock(hashtext(:key))"),
+            {"key": MAINTENANCE_LOCK},
+        )
+        if not locked:
+            logger.info("Partition maintenance already running, skipping")
+            return {"skipped": True}
+        try:
+            return maintain_partitions(dry_run)
+        finally:
+            lock_connection.execute(
+                text("SELECT pg_advisory_unlock(hashtext(:key))"),
+                {"key": MAINTENANCE_LOCK},
+            )
+            lock_connection.commit()
+
+
+def maintain_partitions(dry_run: bool) -> dict:
+    with SessionLocal() as db:
+        if not archive_repo.is_partitioned(db):
+            return {"partitioned": False}
+        expired = []
+        if settings.TRANSACTION_RETENTION_MONTHS > 0:
+            expired = archive_repo.expired_partitions(db, retention_cutoff(utcnow()))
+        if dry_run:
+            return {"expired": expired}
+
+        created = archive_repo.ensure_partitions(
+            db, settings.TRANSACTION_PARTITIONS_AHEAD
+        )
+        for name in created:
+            logger.info(f"Created partition {name}")
+        archive_dir = Path(settings.TRANSACTION_ARCHIVE_DIR)
+        for name in expired:
+            archive_partition(db, name, archive_dir)
+    return {"created": created, "archived": expired}
+
+
+def list_partitions():
+    with SessionLocal() as db:
+        if not archive_repo.is_partitioned(db):
+            print("transactions is not partitioned (PostgreSQL only)")
+            return
+        cutoff = retention_cutoff(utcnow())
+        for name, (month, attached) in archive_repo.list_partitions(db).items():
+            state = "attached" if attached else "detached"
+            if settings.TRANSACTION_RETENTION_MONTHS > 0 and add_months(
+                month, 1
+            ) <= cutoff:
+                state += ", expired"
+            print(f"{name}  {month:%Y-%m}  {state}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list")
+    maintain_parser = subparsers.add_parser("maintain")
+    maintain_parser.add_argument(
+        "--dry-run", action="store_true", help="Only list expired partitions"
+    )
+    args = parser.parse_args()
+
+    if args.command == "list":
+        list_partitions()
+        return
+    result = maintain_transaction_partitions(dry_run=args.dry_run)
+    if result.get("partitioned") is False:
+        print("transactions is not partitioned (PostgreSQL only)")
+    elif result.get("skipped"):
+        print("Partition maintenance is already running")
+    elif args.dry_run:
+        print(f"Would archive: {', '.join(result['expired']) or 'nothing'}")
+    else:
+        print(
+            f"Created {len(result['created'])} partitions, "
+            f"archived {len(result['archived'])}: {', '.join(result['archived'])}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Rollup de estadísticas de transacciones (tabla transaction_stats).
+
+El job `rollup_transaction_stats` corre con Celery beat cada
+STATS_ROLLUP_INTERVAL_SECONDS y recalcula sólo los minutos marcados al crear
+o actualizar transacciones, más los dos últimos minutos.
+
+Uso (carga inicial o reconstrucción de un rango):
+    uv run python -m app.tasks.stats_tasks backfill [--from 2026-01-01] \\
+        [--to 2026-02-01]
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+from redis.exceptions import RedisError
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.transaction import utcnow
+from app.repositories.transaction_stats_repository import TransactionStatsRepository
+from app.services.transaction_stats import (
+    HOUR,
+    MINUTE,
+    TransactionStatsTracker,
+    as_utc,
+    hour_bucket,
+    minute_bucket,
+)
+from app.worker import celery_app
+
+logger = logging.getLogger(__name__)
+stats_tracker = TransactionStatsTracker()
+stats_repo = TransactionStatsRepository()
+
+
+def contiguous_ranges(minutes: set[datetime]) -> list[tuple[datetime, datetime]]:
+    """Agrupa minutos consecutivos en rangos [inicio, fin)"""
+    ranges = []
+    for minute in sorted(minutes):
+        if ranges and ranges[-1][1] == minute:
+            ranges[-1] = (ranges[-1][0], minute + MINUTE)
+        else:
+            ranges.append((minute, minute + MINUTE))
+    return ranges
+
+
+def rebuild_range(db: Session, start: datetime, end: datetime) -> list[datetime]:
+    """
+    Recalcula [start, end). Si los datos de algún minuto no caben en
+    transaction_stats (p. ej. una moneda de más de 8 caracteres anterior a la
+    validación de la API), recalcula el rango minuto a minuto y devuelve los
+    minutos que se omitieron: el resto del rango se actualiza igual.
+    """
+    try:
+        stats_repo.rebuild(db, start, end)
+        return []
+    except (DataError, IntegrityError):
+        db.rollback()
+    if end - start <= MINUTE:
+        return [start]
+    skipped = []
+    minute = start
+    while minute < end:
+        skipped += rebuild_range(db, minute, minute + MINUTE)
+        minute += MINUTE
+    return skipped
+
+
+def log_skipped(skipped: list[datetime]):
+    for minute in skipped:
+        logger.error(
+            f"Skipped transaction stats for {minute.isoformat()}: "
+            "its transactions do not fit in transaction_stats"
+        )
+
+
+@celery_app.task(name="app.tasks.stats_tasks.rollup_transaction_stats")
+def rollup_transaction_stats():
+    try:
+        dirty = stats_tracker.pop_sync(settings.STATS_ROLLUP_MAX_MINUTES)
+    except RedisError as e:
+        logger.warning(f"Could not read dirty transaction stats: {e}")
+        dirty = []
+    now = minute_bucket(utcnow())
+    minutes = set(dirty) | {now - MINUTE, now}
+    skipped = []
+    try:
+        with SessionLocal() as db:
+            for start, end in contiguous_ranges(minutes):
+                skipped += rebuild_range(db, start, end)
+    except Exception:
+        # Errores de conexión o de Redis: se vuelven a marcar para el
+        # siguiente ciclo. Los minutos con datos inválidos no se marcan: no
+        # se arreglan reintentando
+        stats_tracker.mark_sync(dirty)
+        raise
+    log_skipped(skipped)
+    return {"minutes": len(minutes), "skipped": len(skipped)}
+
+
+def backfill(start: datetime, end: datetime):
+    """Recalcula [start, end) hora por hora"""
+    hour = hour_bucket(start)
+    with SessionLocal() as db:
+        while hour < end:
+            log_skipped(rebuild_range(db, hour, hour + HOUR))
+            hour += HOUR
+            if hour.hour == 0:
+                print(f"Rebuilt transaction stats up to {hour.isoformat()}")
+
+
+def parse_date(value: str) -> datetime:
+    return as_utc(datetime.fromisoformat(value))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill")
+    backfill_parser.add_argument(
+        "--from", dest="start", type=parse_date, help="Default: first transaction"
+    )
+    backfill_parser.add_argument(
+        "--to", dest="end", type=parse_date, help="Default: now"
+    )
+    args = parser.parse_args()
+
+    start = args.start
+    if start is None:
+        with SessionLocal() as db:
+            first = stats_repo.get_first_created_at(db)
+        if first is None:
+            print("No transactions to backfill")
+            return
+        start = as_utc(first)
+    end = args.end or minute_bucket(utcnow()) + timedelta(minutes=1)
+    backfill(start, end)
+    print(f"Backfilled transaction stats from {start.isoformat()} to {end.isoformat()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,43 @@
 import logging
+import sys
+import time
+from datetime import datetime
+
 from celery import Celery
+from celery.signals import before_task_publish, task_postrun, task_prerun
+from kombu import Exchange, Queue
+
 from app.core.config import settings
+from app.core.correlation import install_log_record_factory, set_transaction_id
+from app.core.metrics import TASK_QUEUE_WAIT_SECONDS, TASK_RUN_SECONDS, observe
+from app.tasks.lanes import payment_queues
+from app.tasks.producer import TASK_ROUTES, stamp_published_at
 
 logger = logging.getLogger(__name__)
 
+
+def patch_psycopg_for_gevent():
+    """
+    Con el pool gevent (`celery worker -P gevent`) Celery parchea los sockets
+    antes de importar la app, pero psycopg2 es una extensión en C que bloquea
+    el proceso completo mientras espera a PostgreSQL. psycogreen hace que esas
+    esperas cedan el control a los demás greenlets.
+    """
+    # Si gevent no está cargado nadie parcheó los sockets: importarlo sólo
+    # retrasaría el arranque (prefork, API, CLIs)
+    if "gevent" not in sys.modules:
+        return
+    from gevent import monkey
+    if monkey.is_module_patched("socket"):
+        from psycogreen.gevent import patch_psycopg
+
+        patch_psycopg()
+        logger.info("psycopg2 patched for gevent")
+
+
+patch_psycopg_for_gevent()
+install_log_record_factory()
+
 celery_app = Celery(
     main="worker",
     broker=settings.get_redis_url(),
@@ -16,13 +50,86 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
-    task_routes={
-        "app.tasks.payment_tasks.*": "payments-queue"
+    task_routes=TASK_ROUTES,
+    # Sin -Q el worker consume la cola por defecto y todos los carriles de
+    # cargos; en cada lectura el carril lo elige WeightedLaneCycle
+    task_queues=[
+        Queue(name, Exchange(name), routing_key=name)
+        for name in ("celery", *payment_queues())
+    ],
+    broker_transport_options={
+        "queue_order_strategy": "app.tasks.lanes:WeightedLaneCycle",
+    },
+    worker_prefetch_multiplier=settings.WORKER_PREFETCH_MULTIPLIER,
+    beat_schedule={
+        "rollup-transaction-stats": {
+            "task": "app.tasks.stats_tasks.rollup_transaction_stats",
+            "schedule": settings.STATS_ROLLUP_INTERVAL_SECONDS,
+        },
+        "maintain-transaction-partitions": {
+            "task": "app.tasks.retention_tasks.maintain_transaction_partitions",
+            "schedule": settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+        },
+        "sweep-payment-outbox": {
+            "task": "app.tasks.outbox_tasks.sweep_payment_outbox",
+            "schedule": settings.OUTBOX_SWEEP_INTERVAL_SECONDS,
+        },
+        "purge-idempotency-keys": {
+            "task": "app.tasks.idempotency_tasks.purge_idempotency_keys",
+            "schedule": settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS,
+        },
     },
+    # Los logs de los módulos de la app no pasan por el logger de tareas
+    worker_log_format=(
+        "[%(asctime)s: %(levelname)s/%(processName)s] "
+        "[tx=%(transaction_id)s] %(message)s"
+    ),
 )
 
+# Inicio de las tareas en ejecución en este proceso, por id de tarea
+_task_started_at: dict[str, float] = {}
+
+
+before_task_publish.connect(stamp_published_at)
+
+
+@task_prerun.connect
+def observe_queue_wait(task_id=None, task=None, **kwargs):
+    now = time.time()
+    _task_started_at[task_id] = time.perf_counter()
+    published_at = task.request.get("published_at")
+    if published_at is None:
+        return
+    # Con countdown la tarea no puede empezar antes de su eta
+    ready_at = published_at
+    if task.request.eta:
+        ready_at = max(ready_at, datetime.fromisoformat(task.request.eta).timestamp())
+    observe(TASK_QUEUE_WAIT_SECONDS, max(now - ready_at, 0), task=task.name)
+
+
+@task_postrun.connect
+def observe_task_run(task_id=None, task=None, state=None, **kwargs):
+    started_at = _task_started_at.pop(task_id, None)
+    if started_at is not None:
+        observe(
+            TASK_RUN_SECONDS,
+            time.perf_counter() - started_at,
+            task=task.name,
+            state=state or "UNKNOWN",
+        )
+    # El proceso (o greenlet) puede ejecutar otra transacción a continuación
+    set_transaction_id(None)
+
 try:
-    celery_app.autodiscover_tasks(["app.tasks.payment_tasks"])
+    celery_app.autodiscover_tasks(
+        [
+            "app.tasks.payment_tasks",
+            "app.tasks.stats_tasks",
+            "app.tasks.retention_tasks",
+            "app.tasks.outbox_tasks",
+            "app.tasks.idempotency_tasks",
+        ]
+    )
     logger.info("Tareas de Celery descubiertas exitosamente.")
 except Exception as e:
     logger.exception("Error al descubrir tareas de Celery")
@@ -0,0 +1,133 @@
+"""
+Benchmark de throughput: POST /transactions/ uno por uno vs POST /transactions/batch.
+
+Ambas rutas usan la app real con un SQLite temporal. La publicación a Celery
+(desde el relay de la outbox, fuera de la petición) se simula con un
+`time.sleep` bloqueante por mensaje publicado: un mensaje por cargo en ambas
+rutas.
+
+Uso:
+    uv run python -m benchmarks.bench_batch --charges 2000 --batch-size 500
+"""
+import argparse
+import asyncio
+import time
+from unittest import mock
+
+from benchmarks.common import (
+    PAYMENT,
+    create_tables,
+    disable_rate_limit,
+    report,
+    use_temporary_database,
+)
+
+use_temporary_database()
+disable_rate_limit()
+
+import httpx  # noqa: E402
+import app.api.endpoints.transactions as transactions_endpoint  # noqa: E402
+import app.services.outbox as outbox  # noqa: E402
+from app.db.async_session import async_engine  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+
+def build_app() -> FastAPI:
+    bench_app = FastAPI()
+    bench_app.include_router(transactions_endpoint.router, prefix="/transactions")
+    return bench_app
+
+
+async def run_single(client: httpx.AsyncClient, charges: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_request():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/transactions/", json=PAYMENT)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    await asyncio.gather(*(one_request() for _ in range(charges)))
+    return latencies
+
+
+async def run_batch(
+    client: httpx.AsyncClient, charges: int, batch_size: int, concurrency: int
+):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    sizes = [
+        min(batch_size, charges - offset) for offset in range(0, charges, batch_size)
+    ]
+
+    async def one_request(size: int):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/transactions/batch", json=[PAYMENT] * size)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    await asyncio.gather(*(one_request(size) for size in sizes))
+    return latencies
+
+
+async def measure(mode: str, args) -> tuple[list[float], float]:
+    transport = httpx.ASGITransport(app=build_app())
+    client = httpx.AsyncClient(transport=transport, base_url="http://bench")
+    async with client:
+        start = time.perf_counter()
+        if mode == "single":
+            latencies = await run_single(client, args.charges, args.concurrency)
+        else:
+            latencies = await run_batch(
+                client, args.charges, args.batch_size, args.concurrency
+            )
+        elapsed = time.perf_counter() - start
+    await transactions_endpoint.outbox_relay.stop()
+    await async_engine.dispose()
+    return latencies, elapsed
+
+
+async def measure_all(args):
+    return await measure("single", args), await measure("batch", args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--charges", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--publish-latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    create_tables()
+    publish_latency = args.publish_latency_ms / 1000
+
+    def fake_delay(*task_args, **task_kwargs):
+        time.sleep(publish_latency)
+
+    def fake_dispatch(payments, client=None, queue=None):
+        time.sleep(publish_latency * len(payments))
+
+    with (
+        mock.patch.object(outbox, "publish_payment", side_effect=fake_delay),
+        mock.patch.object(
+            outbox, "dispatch_payment_batch", side_effect=fake_dispatch
+        ),
+    ):
+        # Un solo event loop: los clientes asyncio de Redis (estadísticas) y
+        # el relay de la outbox quedan ligados al loop en que se crean
+        (single_latencies, single_elapsed), (batch_latencies, batch_elapsed) = (
+            asyncio.run(measure_all(args))
+        )
+
+    print("latencias por petición HTTP; rps = cargos por segundo")
+    report("single", single_latencies, single_elapsed, count=args.charges)
+    report("batch", batch_latencies, batch_elapsed, count=args.charges)
+    print(f"speedup: {single_elapsed / batch_elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Micro-benchmark de la consulta de BIN de POST /transactions/: acierto en la
+caché del proceso (`CardBinCache`), la consulta completa de la API con la
+caché llena y vacía (una consulta a card_bins por tarjeta) y la revisión de
+marcas y tipos rechazados.
+
+Los aciertos se reportan en nanosegundos por operación; la consulta a la
+base de datos, con los percentiles de `report`. Usa un SQLite temporal salvo
+que se configure otra base de datos.
+
+Uso:
+    uv run python -m benchmarks.bench_card_bins --bins 50000 --cards 1000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import create_tables, report, use_temporary_database
+
+use_temporary_database()
+
+from app.db.async_session import AsyncSessionLocal, async_engine  # noqa: E402
+from app.db.session import SessionLocal  # noqa: E402
+from app.repositories.card_bin_repository import (  # noqa: E402
+    IMPORT,
+    CardBinRepository,
+    card_bin_values,
+)
+from app.services.card_bins import (  # noqa: E402
+    KEY_LENGTH,
+    CardBinCache,
+    CardBinInfo,
+    CardBinLookup,
+)
+
+BRANDS = ("VISA", "MASTERCARD", "AMEX", "CARNET")
+TYPES = ("CREDITO", "DEBITO", "PREPAGO")
+
+
+def seed(bins: int) -> list[str]:
+    """BIN de 6 dígitos (y algunos de 8) en card_bins"""
+    prefixes = random.sample(range(100000, 1000000), bins)
+    infos = [
+        CardBinInfo(
+            bin=str(prefix) + ("00" if i % 10 == 0 else ""),
+            bank=f"BANK {i % 50}",
+            brand=random.choice(BRANDS),
+            type=random.choice(TYPES),
+            product="CLASICA",
+        )
+        for i, prefix in enumerate(prefixes)
+    ]
+    repo = CardBinRepository()
+    with SessionLocal() as db:
+        for start in range(0, len(infos), 1000):
+            batch = infos[start : start + 1000]
+            repo.upsert_bins(db, [card_bin_values(info, IMPORT) for info in batch])
+    return [info.bin for info in infos]
+
+
+def card_numbers(bins: list[str], count: int) -> list[str]:
+    """Tarjetas con BIN conocido y, una de cada cinco, desconocido"""
+    cards = []
+    for i in range(count):
+        prefix = random.choice(bins) if i % 5 else "999999"
+        digits = random.choices("0123456789", k=16 - len(prefix))
+        cards.append(prefix + "".join(digits))
+    return cards
+
+
+def ns_per_op(iterations: int, func, *args) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        func(*args)
+    return (time.perf_counter_ns() - start) / iterations
+
+
+async def timed_lookups(lookup: CardBinLookup, cards: list[str]):
+    latencies = []
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        for card in cards:
+            t0 = time.perf_counter()
+            await lookup.lookup(db, card)
+            latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - start
+
+
+async def run(args):
+    create_tables()
+    bins = seed(args.bins)
+    cards = card_numbers(bins, args.cards)
+    lookup = CardBinLookup(cache=CardBinCache(max_size=args.bins * 2))
+    lookup.blocked_brands = frozenset({"AMEX"})
+
+    print(f"Consulta con la caché vacía ({args.cards} tarjetas, {args.bins} BIN)")
+    report("db", *await timed_lookups(lookup, cards))
+    print("\nConsulta con la caché llena")
+    report("cache", *await timed_lookups(lookup, cards))
+
+    # Un BIN conocido y aceptado (el caso de casi todos los cargos) y uno
+    # desconocido, guardado como None en la caché
+    infos = {card[:KEY_LENGTH]: lookup.cache.get(card[:KEY_LENGTH]) for card in cards}
+    key = next(key for key, info in infos.items() if info and info.brand != "AMEX")
+    unknown = cards[0][:KEY_LENGTH]
+    operations = {
+        "cache.get (conocido)": (lookup.cache.get, key),
+        "cache.get (desconocido)": (lookup.cache.get, unknown),
+        "rejection": (lookup.rejection, lookup.cache.get(key)),
+    }
+    print(f"\nPor operación ({args.iterations} iteraciones)")
+    for name, (func, arg) in operations.items():
+        print(f"{name:<24}{ns_per_op(args.iterations, func, arg):7.0f} ns")
+    print(f"\n{lookup.get_stats()}")
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bins", type=int, default=50000)
+    parser.add_argument("--cards", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
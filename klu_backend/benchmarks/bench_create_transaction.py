@@ -0,0 +1,136 @@
+"""
+Benchmark de latencia de POST /transactions/ con peticiones concurrentes.
+
+Compara la ruta anterior (repositorio síncrono y publicación en Redis dentro del
+event loop) con la ruta actual (AsyncSession; el cargo se guarda en la outbox
+en el mismo commit y el relay lo publica fuera de la petición). La
+publicación a Celery se simula con un `time.sleep` bloqueante para no
+depender de Redis. Por defecto usa un SQLite temporal; exporta
+`DB_TYPE=postgres` y las variables `POSTGRES_*` para medir contra Postgres.
+
+Con una concurrencia mayor que el pool síncrono (API_DB_POOL_SIZE +
+API_DB_MAX_OVERFLOW conexiones) la ruta anterior se bloquea: el handler espera
+una conexión en el event loop y las sesiones que la liberarían necesitan ese
+mismo loop para cerrarse. Usa `--skip-before` para medir sólo la ruta actual
+en ese caso.
+
+Uso:
+    uv run python -m benchmarks.bench_create_transaction --requests 500 --concurrency 8
+"""
+import argparse
+import asyncio
+import time
+from unittest import mock
+
+from benchmarks.common import (
+    PAYMENT,
+    create_tables,
+    disable_rate_limit,
+    report,
+    use_temporary_database,
+)
+
+# La base de datos del benchmark debe configurarse antes de importar la app
+use_temporary_database()
+disable_rate_limit()
+
+import httpx  # noqa: E402
+import app.services.outbox as outbox  # noqa: E402
+from app.api.endpoints.transactions import outbox_relay, router  # noqa: E402
+from app.db.async_session import async_engine  # noqa: E402
+from app.db.session import get_db  # noqa: E402
+from app.repositories.transaction_repository import (  # noqa: E402
+    TransactionRepository,
+)
+from app.schemas.transaction import (  # noqa: E402
+    CardPaymentRequest,
+    TransactionCreate,
+    TransactionCreateResponse,
+)
+from app.tasks.payment_tasks import process_payment  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+def build_legacy_app() -> FastAPI:
+    """Reproduce el endpoint previo: todo el trabajo bloqueante en el loop"""
+    legacy_app = FastAPI()
+    legacy_repo = TransactionRepository()
+
+    @legacy_app.post("/transactions/", status_code=201)
+    async def create_transaction(
+        payment_data: CardPaymentRequest, db: Session = Depends(get_db)
+    ):
+        transaction_data = TransactionCreate(
+            **payment_data.model_dump(exclude={"noPresentCardData"})
+        )
+        transaction = legacy_repo.create_transaction(
+            db=db, transaction=transaction_data
+        )
+        process_payment.delay(str(transaction.id), payment_data.model_dump(mode="json"))
+        return TransactionCreateResponse.model_validate(obj=transaction)
+
+    return legacy_app
+
+
+def build_async_app() -> FastAPI:
+    async_app = FastAPI()
+    async_app.include_router(router, prefix="/transactions")
+    return async_app
+
+
+async def run_load(app: FastAPI, total: int, concurrency: int) -> list[float]:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    client = httpx.AsyncClient(transport=transport, base_url="http://bench")
+    async with client:
+
+        async def one_request():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/transactions/", json=PAYMENT)
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        await asyncio.gather(*(one_request() for _ in range(total)))
+
+    # Las conexiones de aiosqlite viven en hilos ligados a este event loop
+    await outbox_relay.stop()
+    await async_engine.dispose()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--publish-latency-ms",
+        type=float,
+        default=2.0,
+        help="Latencia simulada de la publicación en el broker",
+    )
+    parser.add_argument("--skip-before", action="store_true")
+    args = parser.parse_args()
+
+    create_tables()
+
+    def fake_delay(*task_args, **task_kwargs):
+        time.sleep(args.publish_latency_ms / 1000)
+
+    with (
+        mock.patch.object(process_payment, "delay", side_effect=fake_delay),
+        mock.patch.object(outbox, "publish_payment", side_effect=fake_delay),
+    ):
+        apps = [("after", build_async_app())]
+        if not args.skip_before:
+            apps.insert(0, ("before", build_legacy_app()))
+        for name, app in apps:
+            start = time.perf_counter()
+            latencies = asyncio.run(run_load(app, args.requests, args.concurrency))
+            report(name, latencies, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark de punta a punta: POST /transactions/ → worker de Celery → Blumonpay falso.
+
+Levanta `benchmarks.fake_blumonpay` y un worker de Celery que consume colas
+exclusivas del benchmark (PAYMENT_QUEUE_PREFIX propio), envía `--charges`
+peticiones a la API (en proceso, con `--concurrency` peticiones simultáneas)
+y espera a que el worker publique el estado final de cada transacción en
+Redis (los mismos eventos que usa GET /transactions/{id}/events).
+
+Reporta la latencia de POST /transactions/, la latencia de punta a punta
+(desde el POST hasta el estado final), el throughput, los estados finales y
+las consultas a la base de datos por cargo de la API y del worker.
+
+Necesita el Redis configurado en REDIS_*. Por defecto usa un SQLite temporal;
+exporta `DB_TYPE=postgres` y las variables `POSTGRES_*` para medir contra
+Postgres.
+
+Uso:
+    uv run python -m benchmarks.bench_end_to_end --charges 1000 --concurrency 32 \\
+        --worker-concurrency 200 --latency-ms 200 --decline-rate 0.1
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from collections import Counter
+
+from benchmarks.common import (
+    PAYMENT,
+    CompletionListener,
+    create_tables,
+    disable_rate_limit,
+    report,
+    start_fake_blumonpay,
+    start_worker,
+    stop,
+    use_fake_blumonpay,
+    use_temporary_database,
+    wait_until,
+)
+
+use_temporary_database()
+disable_rate_limit()
+FAKE_BLUMONPAY_URL = use_fake_blumonpay()
+os.environ.setdefault("PAYMENT_QUEUE_PREFIX", f"bench-{uuid.uuid4().hex[:8]}")
+
+import httpx  # noqa: E402
+from app.api.endpoints.transactions import outbox_relay, router  # noqa: E402
+from app.db.async_session import async_engine  # noqa: E402
+from app.db.pool import get_pool_stats  # noqa: E402
+from app.tasks.lanes import LEGACY_QUEUE, payment_queues  # noqa: E402
+from app.worker import celery_app  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+
+async def post_charges(charges: int, concurrency: int) -> dict[str, tuple]:
+    """Envía los cargos y devuelve {id: (inicio, latencia del POST)}"""
+    bench_app = FastAPI()
+    bench_app.include_router(router, prefix="/transactions")
+    transport = httpx.ASGITransport(app=bench_app)
+    semaphore = asyncio.Semaphore(concurrency)
+    sent = {}
+
+    async def one_request(client: httpx.AsyncClient):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/transactions/", json=PAYMENT)
+            response.raise_for_status()
+            sent[response.json()["id"]] = (start, time.perf_counter() - start)
+
+    client = httpx.AsyncClient(transport=transport, base_url="http://bench")
+    async with client:
+        await asyncio.gather(*(one_request(client) for _ in range(charges)))
+    # El relay de la outbox corre en este event loop: se espera a que publique
+    # todos los cargos antes de cerrarlo
+    while outbox_relay.get_stats()["published"] < charges:
+        await asyncio.sleep(0.01)
+    await outbox_relay.stop()
+    await async_engine.dispose()
+    return sent
+
+
+def worker_stats(hostname: str) -> dict:
+    replies = celery_app.control.broadcast(
+        "worker_stats", reply=True, destination=[hostname], timeout=5
+    )
+    return replies[0][hostname] if replies else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--charges", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pool", default="gevent")
+    parser.add_argument("--worker-concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--decline-rate", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--token-ttl", type=float, default=3600)
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    create_tables()
+    queues = ",".join(queue for queue in payment_queues() if queue != LEGACY_QUEUE)
+
+    fake_server = start_fake_blumonpay(
+        FAKE_BLUMONPAY_URL,
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--decline-rate", str(args.decline_rate),
+        "--error-rate", str(args.error_rate),
+        "--token-ttl", str(args.token_ttl),
+    )
+    worker = None
+    listener = CompletionListener()
+    try:
+        worker, hostname = start_worker(
+            celery_app, args.pool, args.worker_concurrency, queues
+        )
+        listener.start()
+        api_queries = get_pool_stats(async_engine.sync_engine).get("queries", 0)
+
+        start = time.perf_counter()
+        sent = asyncio.run(post_charges(args.charges, args.concurrency))
+        post_elapsed = time.perf_counter() - start
+        api_queries = (
+            get_pool_stats(async_engine.sync_engine).get("queries", 0) - api_queries
+        )
+
+        wait_until(
+            lambda: all(i in listener.completed for i in sent), timeout=args.timeout
+        )
+        stats = worker_stats(hostname)
+    finally:
+        listener.stop()
+        if worker is not None:
+            stop(worker)
+        stop(fake_server)
+
+    completed = {i: listener.completed[i] for i in sent if i in listener.completed}
+    if not completed:
+        raise RuntimeError("no transaction was completed")
+    end_to_end = [finished - sent[i][0] for i, (finished, _) in completed.items()]
+    elapsed = max(finished for finished, _ in completed.values()) - start
+
+    print(
+        f"Blumonpay: {args.latency_ms:.0f}±{args.jitter_ms:.0f}ms, "
+        f"rechazos {args.decline_rate:.0%}, errores {args.error_rate:.0%}; "
+        f"worker {args.pool}:{args.worker_concurrency}"
+    )
+    report("post", [latency for _, latency in sent.values()], post_elapsed)
+    report("e2e", end_to_end, elapsed)
+    statuses = Counter(status for _, status in completed.values())
+    print(f"estados: {dict(statuses)}  sin terminar: {len(sent) - len(completed)}")
+    worker_queries = stats.get("db_pool", {}).get("queries", 0)
+    print(
+        f"consultas por cargo: api={api_queries / len(sent):.2f}  "
+        f"worker={worker_queries / len(sent):.2f}"
+    )
+    print(f"cliente de Blumonpay: {stats.get('blumonpay', {})}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark del costo de arranque (imports) de la API y del worker.
+
+Importa el punto de entrada de cada proceso en un intérprete nuevo con
+`python -X importtime`, varias veces, y reporta la mediana del tiempo total
+y de los paquetes que más pesan (tiempo propio de sus módulos), además de
+si se cargaron módulos que ese proceso no debería necesitar.
+
+Uso:
+    uv run python -m benchmarks.bench_import_time --runs 5 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+TARGETS = {
+    # uvicorn main:app
+    "api": ["main"],
+    # celery -A app.worker worker: el worker importa los módulos de tareas
+    "worker": [
+        "app.worker",
+        "app.tasks.payment_tasks",
+        "app.tasks.stats_tasks",
+        "app.tasks.retention_tasks",
+        "app.tasks.outbox_tasks",
+        "app.tasks.idempotency_tasks",
+    ],
+}
+# Módulos que no deberían cargarse en cada proceso
+UNEXPECTED = {
+    "api": [
+        "app.worker",
+        "app.tasks.payment_tasks",
+        "app.services.blumonpay_service",
+        "requests",
+        "requests_toolbelt",
+        "gevent",
+    ],
+    "worker": ["fastapi", "starlette", "email_validator", "app.schemas.transaction"],
+}
+
+
+def import_times(modules: list[str]) -> tuple[float, dict[str, float], set[str]]:
+    """
+    Un intérprete nuevo importando `modules`.
+
+    Returns:
+        tuple: (total en segundos, tiempo propio por paquete, módulos cargados)
+    """
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+        check=True,
+    )
+    total = 0
+    by_package: dict[str, float] = defaultdict(float)
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        module = name.strip()
+        loaded.add(module)
+        by_package[module.split(".")[0]] += int(self_us) / 1e6
+        # Los módulos de primer nivel (sin sangría) suman el total
+        if not name[1:].startswith(" "):
+            total += int(cumulative_us) / 1e6
+    return total, by_package, loaded
+
+
+def run(target: str, runs: int, top: int):
+    # La primera ejecución compila los .pyc
+    import_times(TARGETS[target])
+    totals = []
+    packages: dict[str, list[float]] = defaultdict(list)
+    for _ in range(runs):
+        total, by_package, loaded = import_times(TARGETS[target])
+        totals.append(total)
+        for package, seconds in by_package.items():
+            packages[package].append(seconds)
+
+    print(f"\n{target}: import total p50={statistics.median(totals) * 1000:.0f}ms")
+    medians = {package: statistics.median(times) for package, times in packages.items()}
+    for package, seconds in sorted(medians.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:<24} {seconds * 1000:7.1f}ms")
+    unexpected = [module for module in UNEXPECTED[target] if module in loaded]
+    print(f"  unexpected modules: {', '.join(unexpected) or 'none'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--target", choices=sorted(TARGETS), action="append")
+    args = parser.parse_args()
+    for target in args.target or sorted(TARGETS):
+        run(target, args.runs, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark de los carriles de la cola de cargos: latencia de los cargos
+interactivos mientras un lote grande satura el worker.
+
+Levanta `benchmarks.fake_blumonpay` y un worker de Celery, publica `--bulk`
+cargos como un lote (carril bulk) y, con el worker ya ocupado, `--interactive`
+cargos individuales a `--rate` por segundo. Con `--single-queue` reproduce el
+enrutamiento anterior: el lote y los cargos interactivos en la misma cola.
+
+Reporta la latencia de punta a punta (publicación → estado final) de los
+cargos interactivos y del lote. Las colas usan un PAYMENT_QUEUE_PREFIX propio
+para no mezclarse con un worker de desarrollo. Necesita el Redis configurado
+en REDIS_*.
+
+Uso:
+    uv run python -m benchmarks.bench_lanes --bulk 2000 --interactive 50 --rate 10
+    uv run python -m benchmarks.bench_lanes --bulk 2000 --interactive 50 --rate 10 \\
+        --single-queue
+"""
+import argparse
+import os
+import time
+import uuid
+
+from benchmarks.common import (
+    PAYMENT,
+    CompletionListener,
+    create_tables,
+    report,
+    start_fake_blumonpay,
+    start_worker,
+    stop,
+    use_fake_blumonpay,
+    use_temporary_database,
+    wait_until,
+)
+
+use_temporary_database()
+FAKE_BLUMONPAY_URL = use_fake_blumonpay()
+os.environ.setdefault("PAYMENT_QUEUE_PREFIX", f"bench-{uuid.uuid4().hex[:8]}")
+
+from app.db.session import SessionLocal  # noqa: E402
+from app.models.transaction import Transaction  # noqa: E402
+from app.tasks.lanes import (  # noqa: E402
+    INTERACTIVE,
+    LEGACY_QUEUE,
+    lane_queue,
+    payment_queues,
+)
+from app.tasks.producer import (  # noqa: E402
+    dispatch_payment_batch,
+    publish_payment,
+)
+from app.worker import celery_app  # noqa: E402
+
+
+def create_transactions(count: int) -> list[str]:
+    """Transacciones en `pending` listas para cobrar"""
+    customer = PAYMENT["customerInformation"]
+    with SessionLocal() as db:
+        transactions = [
+            Transaction(
+                amount=PAYMENT["amount"],
+                currency=PAYMENT["currency"],
+                customer_email=customer["email"],
+                customer_name=f"{customer['firstName']} {customer['lastName']}",
+            )
+            for _ in range(count)
+        ]
+        db.add_all(transactions)
+        db.flush()
+        ids = [str(transaction.id) for transaction in transactions]
+        db.commit()
+    return ids
+
+
+def dispatch_single_queue(payments: list[tuple[str, dict]]):
+    """Enrutamiento anterior: el lote en la misma cola que los interactivos"""
+    dispatch_payment_batch(payments, queue=lane_queue(INTERACTIVE))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bulk", type=int, default=2000)
+    parser.add_argument("--interactive", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=10)
+    parser.add_argument("--pool", default="gevent")
+    parser.add_argument("--worker-concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--single-queue", action="store_true")
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    create_tables()
+    bulk_ids = create_transactions(args.bulk)
+    interactive_ids = create_transactions(args.interactive)
+    queues = ",".join(queue for queue in payment_queues() if queue != LEGACY_QUEUE)
+
+    fake_server = start_fake_blumonpay(
+        FAKE_BLUMONPAY_URL,
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--decline-rate", "0",
+        "--error-rate", "0",
+    )
+    worker = None
+    listener = CompletionListener()
+    sent = {}
+    try:
+        worker, _ = start_worker(
+            celery_app, args.pool, args.worker_concurrency, queues
+        )
+        listener.start()
+
+        bulk_payments = [(transaction_id, PAYMENT) for transaction_id in bulk_ids]
+        bulk_start = time.perf_counter()
+        if args.single_queue:
+            dispatch_single_queue(bulk_payments)
+        else:
+            dispatch_payment_batch(bulk_payments, client="bench-bulk")
+        # Los cargos interactivos llegan con el worker ya ocupado por el lote
+        wait_until(lambda: len(listener.completed) > 0, timeout=60)
+
+        for transaction_id in interactive_ids:
+            sent[transaction_id] = time.perf_counter()
+            publish_payment(transaction_id, PAYMENT)
+            time.sleep(1 / args.rate)
+
+        wait_until(
+            lambda: all(i in listener.completed for i in bulk_ids + interactive_ids),
+            timeout=args.timeout,
+        )
+    finally:
+        listener.stop()
+        if worker is not None:
+            stop(worker)
+        stop(fake_server)
+
+    completed = listener.completed
+    interactive = [completed[i][0] - sent[i] for i in interactive_ids if i in completed]
+    bulk = [completed[i][0] - bulk_start for i in bulk_ids if i in completed]
+    if not interactive or not bulk:
+        raise RuntimeError("no transaction was completed")
+    elapsed = max(finished for finished, _ in completed.values()) - bulk_start
+
+    mode = "una cola" if args.single_queue else "carriles"
+    print(
+        f"{mode}: lote de {args.bulk} + {args.interactive} interactivos a "
+        f"{args.rate:g}/s; Blumonpay {args.latency_ms:.0f}ms; "
+        f"worker {args.pool}:{args.worker_concurrency}"
+    )
+    report("interactive", interactive, elapsed)
+    report("bulk", bulk, elapsed)
+    missing = len(bulk_ids) + len(interactive_ids) - len(interactive) - len(bulk)
+    print(f"sin terminar: {missing}")
+
+
+if __name__ == "__main__":
+    main()
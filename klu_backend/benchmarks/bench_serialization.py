@@ -0,0 +1,159 @@
+"""
+Micro-benchmark de serialización de las lecturas: GET /transactions/ y
+GET /transactions/{id} con la ruta anterior (entidades ORM validadas con
+TransactionCreateResponse) vs la ruta rápida (tuplas de columnas serializadas
+con orjson).
+
+Mide por separado la serialización sola y la lectura completa (consulta más
+serialización) contra un SQLite temporal, y comprueba que ambas rutas
+producen exactamente los mismos bytes.
+
+Uso:
+    uv run python -m benchmarks.bench_serialization --rows 5000 --limit 100
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from benchmarks.common import create_tables, report, use_temporary_database
+
+use_temporary_database()
+
+from app.db.async_session import AsyncSessionLocal, async_engine  # noqa: E402
+from app.db.session import SessionLocal  # noqa: E402
+from app.models.transaction import Transaction, TransactionStatus, utcnow  # noqa: E402
+from app.repositories.transaction_repository import (  # noqa: E402
+    AsyncTransactionRepository,
+)
+from app.schemas.serialization import (  # noqa: E402
+    dump_transaction_row,
+    dump_transaction_rows,
+)
+from app.schemas.transaction import TransactionCreateResponse  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+repository = AsyncTransactionRepository()
+
+
+def seed(rows: int) -> list[uuid.UUID]:
+    now = utcnow()
+    transaction_ids = []
+    with SessionLocal() as db:
+        for i in range(rows):
+            # Con letra inicial: SQLite guarda el UUID con afinidad NUMERIC
+            transaction_id = uuid.UUID(hex="a" + uuid.uuid4().hex[1:])
+            transaction_ids.append(transaction_id)
+            db.add(
+                Transaction(
+                    id=transaction_id,
+                    amount=round(random.uniform(1, 10000), 2),
+                    currency="MXN",
+                    customer_email=f"customer{i}@example.com",
+                    customer_name="José Pérez",
+                    status=random.choice(list(TransactionStatus)),
+                    created_at=now - timedelta(seconds=i),
+                )
+            )
+        db.commit()
+    return transaction_ids
+
+
+def pydantic_list_body(transactions: list[Transaction]) -> bytes:
+    """Lo que hacía FastAPI con response_model=list[TransactionCreateResponse]"""
+    models = [TransactionCreateResponse.model_validate(t) for t in transactions]
+    return JSONResponse(jsonable_encoder(models)).body
+
+
+def pydantic_single_body(transaction: Transaction) -> bytes:
+    model = TransactionCreateResponse.model_validate(transaction)
+    return model.model_dump_json().encode()
+
+
+def timed(iterations: int, func) -> tuple[list[float], float]:
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - start
+
+
+async def timed_async(iterations: int, func) -> tuple[list[float], float]:
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        await func()
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - start
+
+
+async def run(args):
+    create_tables()
+    transaction_ids = seed(args.rows)
+
+    async with AsyncSessionLocal() as db:
+        transactions, _ = await repository.list_transactions(db, limit=args.limit)
+        rows, _ = await repository.list_transaction_rows(db, limit=args.limit)
+        transaction = await repository.get_transaction(db, transaction_ids[0])
+        row = await repository.get_transaction_row(db, transaction_ids[0])
+
+    if pydantic_list_body(transactions) != dump_transaction_rows(rows):
+        raise SystemExit("list bodies differ")
+    if pydantic_single_body(transaction) != dump_transaction_row(row):
+        raise SystemExit("single bodies differ")
+
+    iterations = args.iterations
+    print(f"Serialización sola ({iterations} iteraciones, {args.limit} filas)")
+    report("list-pyd", *timed(iterations, lambda: pydantic_list_body(transactions)))
+    report("list-orj", *timed(iterations, lambda: dump_transaction_rows(rows)))
+    report("get-pyd", *timed(iterations, lambda: pydantic_single_body(transaction)))
+    report("get-orj", *timed(iterations, lambda: dump_transaction_row(row)))
+
+    async def list_pydantic():
+        async with AsyncSessionLocal() as db:
+            page, _ = await repository.list_transactions(db, limit=args.limit)
+            return pydantic_list_body(page)
+
+    async def list_orjson():
+        async with AsyncSessionLocal() as db:
+            page, _ = await repository.list_transaction_rows(db, limit=args.limit)
+            return dump_transaction_rows(page)
+
+    async def get_pydantic():
+        async with AsyncSessionLocal() as db:
+            found = await repository.get_transaction(db, random.choice(transaction_ids))
+            return pydantic_single_body(found)
+
+    async def get_orjson():
+        async with AsyncSessionLocal() as db:
+            found = await repository.get_transaction_row(
+                db, random.choice(transaction_ids)
+            )
+            return dump_transaction_row(found)
+
+    queries = max(iterations // 10, 1)
+    print(f"\nConsulta + serialización ({queries} iteraciones)")
+    report("list-pyd", *await timed_async(queries, list_pydantic))
+    report("list-orj", *await timed_async(queries, list_orjson))
+    report("get-pyd", *await timed_async(queries, get_pydantic))
+    report("get-orj", *await timed_async(queries, get_orjson))
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
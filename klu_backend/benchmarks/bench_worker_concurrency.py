@@ -0,0 +1,106 @@
+"""
+Benchmark de cargos por segundo de un worker de Celery contra Blumonpay falso.
+
+Levanta `benchmarks.fake_blumonpay` y, para cada configuración `pool:concurrencia`,
+un worker de Celery de un solo proceso padre (lo que corre en un contenedor),
+encola `--charges` cargos en una cola exclusiva del benchmark y mide el tiempo
+hasta que ninguna transacción queda en `pending`.
+
+Necesita el Redis configurado en REDIS_* (sólo usa una cola propia, no purga
+las demás). Por defecto usa un SQLite temporal; exporta `DB_TYPE=postgres` y
+las variables `POSTGRES_*` para medir contra Postgres.
+
+Uso:
+    uv run python -m benchmarks.bench_worker_concurrency --charges 1000 \\
+        --configs prefork:2,gevent:200 --latency-ms 200
+"""
+import argparse
+import time
+import uuid
+
+from benchmarks.common import (
+    PAYMENT,
+    create_tables,
+    start_fake_blumonpay,
+    start_worker,
+    stop,
+    use_fake_blumonpay,
+    use_temporary_database,
+    wait_until,
+)
+
+use_temporary_database()
+FAKE_BLUMONPAY_URL = use_fake_blumonpay()
+
+from app.db.session import SessionLocal  # noqa: E402
+from app.models.transaction import NON_TERMINAL_STATUSES, Transaction  # noqa: E402
+from app.repositories.transaction_repository import build_transaction  # noqa: E402
+from app.schemas.transaction import CardPaymentRequest  # noqa: E402
+from app.tasks.payment_tasks import process_payment  # noqa: E402
+from app.worker import celery_app  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+
+def create_transactions(count: int) -> list[str]:
+    payment = CardPaymentRequest.model_validate(PAYMENT)
+    with SessionLocal() as db:
+        transactions = [build_transaction(payment) for _ in range(count)]
+        db.add_all(transactions)
+        db.commit()
+        return [str(transaction.id) for transaction in transactions]
+
+
+def count_pending(ids: set[str]) -> int:
+    with SessionLocal() as db:
+        return db.scalar(
+            select(func.count())
+            .select_from(Transaction)
+            .where(Transaction.status.in_(NON_TERMINAL_STATUSES))
+            .where(Transaction.id.in_([uuid.UUID(i) for i in ids]))
+        )
+
+
+def measure(pool: str, concurrency: int, charges: int) -> float:
+    queue = f"bench-payments-{uuid.uuid4().hex[:8]}"
+    worker, _ = start_worker(celery_app, pool, concurrency, queue)
+    try:
+        ids = create_transactions(charges)
+        start = time.perf_counter()
+        for transaction_id in ids:
+            process_payment.apply_async(
+                args=(transaction_id, PAYMENT), queue=queue
+            )
+        pending_ids = set(ids)
+        if not wait_until(lambda: count_pending(pending_ids) == 0, timeout=600):
+            raise RuntimeError(f"{pool} worker did not finish the charges")
+        return time.perf_counter() - start
+    finally:
+        stop(worker)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--charges", type=int, default=1000)
+    parser.add_argument("--configs", default="prefork:2,gevent:200")
+    parser.add_argument("--latency-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    create_tables()
+    fake_server = start_fake_blumonpay(
+        FAKE_BLUMONPAY_URL, "--latency-ms", str(args.latency_ms)
+    )
+    try:
+        print(f"latencia de Blumonpay: {args.latency_ms:.0f}ms por cargo")
+        for config in args.configs.split(","):
+            pool, concurrency = config.split(":")
+            elapsed = measure(pool, int(concurrency), args.charges)
+            print(
+                f"{config:<12} n={args.charges:<6} "
+                f"cargos/s={args.charges / elapsed:8.1f}  tiempo={elapsed:6.1f}s"
+            )
+    finally:
+        stop(fake_server)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Utilidades compartidas por los benchmarks"""
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def create_tables():
+    """
+    `create_all` con todos los modelos de `app.models`: cada benchmark sólo
+    importa los de la API o los del worker y sin esto faltan tablas (p. ej.
+    `card_bins` en el worker de bench_lanes).
+    """
+    import importlib
+    import pkgutil
+
+    import app.models
+    from app.db.session import Base, engine
+
+    for module in pkgutil.iter_modules(app.models.__path__):
+        importlib.import_module(f"app.models.{module.name}")
+    Base.metadata.create_all(bind=engine)
+
+
+def use_temporary_database():
+    """
+    Apunta la app a un SQLite temporal salvo que ya se haya configurado otra
+    base de datos. Debe llamarse antes de importar cualquier módulo de `app`.
+    """
+    if os.environ.get("DB_TYPE", "sqlite").lower() == "sqlite":
+        db_dir = tempfile.mkdtemp(prefix="klu-bench-")
+        os.environ.setdefault("SQLITE_URI", f"sqlite:///{db_dir}/bench.db")
+
+
+def disable_rate_limit():
+    """
+    Los benchmarks envían ráfagas con el mismo cliente y email: sin esto la
+    API respondería 429. Antes de importar la app.
+    """
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+
+def use_fake_blumonpay(port: int = None) -> str:
+    """
+    Apunta el cliente de Blumonpay al servidor falso de `benchmarks.fake_blumonpay`.
+    Igual que `use_temporary_database`, antes de importar la app.
+    """
+    port = port or int(os.environ.get("FAKE_BLUMONPAY_PORT", 8099))
+    base_url = f"http://127.0.0.1:{port}"
+    os.environ["BLUMONPAY_TOKEN_HOST"] = f"{base_url}/oauth/token"
+    os.environ["BLUMONPAY_CHARGE_HOST"] = f"{base_url}/ecommerce/charge"
+    return base_url
+
+
+def wait_until(condition, timeout: float, interval: float = 0.2) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(interval)
+    return False
+
+
+def start_fake_blumonpay(base_url: str, *options: str) -> subprocess.Popen:
+    """Levanta el servidor falso y espera a que responda"""
+    port = base_url.rsplit(":", 1)[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_blumonpay", "--port", port, *options]
+    )
+
+    def ready() -> bool:
+        try:
+            urllib.request.urlopen(f"{base_url}/stats", timeout=0.5)
+        except (urllib.error.URLError, ConnectionError):
+            return False
+        return True
+
+    if not wait_until(ready, timeout=30):
+        server.terminate()
+        raise RuntimeError("fake Blumonpay server did not start")
+    return server
+
+
+def start_worker(
+    celery_app, pool: str, concurrency: int, queue: str
+) -> tuple[subprocess.Popen, str]:
+    """
+    Levanta un worker de Celery que sólo consume `queue` (o varias colas
+    separadas por comas) y espera a que responda al ping. Devuelve el proceso
+    y su nombre de nodo.
+    """
+    hostname = f"bench-{queue.split(',')[0]}@{socket.gethostname()}"
+    env = {**os.environ, "PROCESS_ROLE": "worker"}
+    if pool != "prefork":
+        # Un solo proceso: el pool de la base de datos y de Blumonpay se
+        # comparte entre todos los cargos en vuelo
+        env.setdefault("BLUMONPAY_POOL_MAXSIZE", str(concurrency))
+        env.setdefault("WORKER_DB_POOL_SIZE", "10")
+        env.setdefault("WORKER_DB_MAX_OVERFLOW", "10")
+    command = [
+        sys.executable, "-m", "celery", "-A", "app.worker", "worker",
+        "-P", pool, "-c", str(concurrency), "-Q", queue, "-n", hostname,
+        "--without-gossip", "--without-mingle", "--without-heartbeat",
+        "--loglevel", "warning",
+    ]
+    worker = subprocess.Popen(command, env=env)
+    ready = wait_until(
+        lambda: bool(celery_app.control.ping([hostname], timeout=0.5)), timeout=60
+    )
+    if not ready:
+        stop(worker)
+        raise RuntimeError(f"{pool} worker did not start")
+    return worker, hostname
+
+
+class CompletionListener(threading.Thread):
+    """
+    Registra cuándo y con qué estado sale cada transacción de `pending`, con
+    los eventos que el worker publica en Redis. Se crea después de importar
+    la app.
+    """
+
+    def __init__(self):
+        import redis
+
+        from app.core.config import settings
+        from app.services.transaction_events import CHANNEL_PREFIX
+
+        super().__init__(daemon=True)
+        self.completed: dict[str, tuple[float, str]] = {}
+        self._stopped = threading.Event()
+        client = redis.Redis.from_url(settings.get_redis_url())
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe(CHANNEL_PREFIX + "*")
+
+    def run(self):
+        from app.models.transaction import NON_TERMINAL_STATUSES
+
+        while not self._stopped.is_set():
+            message = self._pubsub.get_message(timeout=0.5)
+            if message is None:
+                continue
+            body = json.loads(message["data"])
+            if body["status"] not in NON_TERMINAL_STATUSES:
+                self.completed.setdefault(
+                    body["id"], (time.perf_counter(), body["status"])
+                )
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self._pubsub.close()
+
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    process.wait(timeout=30)
+
+
+PAYMENT = {
+    "amount": 150.5,
+    "currency": "MXN",
+    "customerInformation": {
+        "firstName": "Ana",
+        "lastName": "López",
+        "email": "ana@example.com",
+        "phone1": "5512345678",
+        "city": "CDMX",
+        "address1": "Reforma 1",
+        "postalCode": "06600",
+        "state": "CDMX",
+        "country": "MX",
+    },
+    "noPresentCardData": {
+        "cardNumber": "4111111111111111",
+        "expirationMonth": "12",
+        "expirationYear": "30",
+        "cvv": "123",
+        "cardholderName": "Ana López",
+    },
+}
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def report(name: str, latencies: list[float], elapsed: float, count: int = None):
+    """Imprime throughput y percentiles de latencia (en ms)"""
+    count = len(latencies) if count is None else count
+    print(
+        f"{name:<10} n={count:<6} "
+        f"rps={count / elapsed:8.1f}  "
+        f"p50={percentile(latencies, 50) * 1000:7.1f}ms  "
+        f"p95={percentile(latencies, 95) * 1000:7.1f}ms  "
+        f"p99={percentile(latencies, 99) * 1000:7.1f}ms  "
+        f"mean={statistics.mean(latencies) * 1000:7.1f}ms"
+    )
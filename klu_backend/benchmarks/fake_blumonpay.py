@@ -0,0 +1,146 @@
+"""
+Servidor falso de Blumonpay para benchmarks locales.
+
+Expone el endpoint de token y el de cargos con las mismas formas de respuesta
+que interpreta `BlumonpayService.process_payment_sync`:
+
+- cargo aprobado: `{"status": true, "dataResponse": {...}}`
+- cargo rechazado (`--decline-rate`): HTTP 200 con `{"status": false, "error": {...}}`
+- error del procesador (`--error-rate`): HTTP 500
+- token vencido o desconocido: HTTP 401 (los tokens duran `--token-ttl` segundos)
+
+Cada cargo espera `--latency-ms` (± `--jitter-ms`) antes de responder.
+
+Uso:
+    uv run python -m benchmarks.fake_blumonpay --port 8099 --latency-ms 200 \\
+        --decline-rate 0.1 --error-rate 0.01 --token-ttl 300
+
+y apuntar la app con:
+    BLUMONPAY_TOKEN_HOST=http://127.0.0.1:8099/oauth/token
+    BLUMONPAY_CHARGE_HOST=http://127.0.0.1:8099/ecommerce/charge
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+import uvicorn
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse
+
+TOKEN_PATH = "/oauth/token"
+CHARGE_PATH = "/ecommerce/charge"
+
+BIN_INFORMATION = {
+    "bank": "BANCO FALSO",
+    "brand": "VISA",
+    "type": "CREDIT",
+    "product": "CLASSIC",
+}
+
+
+def build_app(
+    latency_ms: float = 200,
+    jitter_ms: float = 0,
+    decline_rate: float = 0,
+    error_rate: float = 0,
+    token_ttl: float = 3600,
+) -> FastAPI:
+    fake_app = FastAPI()
+    tokens: dict[str, float] = {}
+    stats = Counter()
+
+    def delay() -> float:
+        return max(latency_ms + random.uniform(-jitter_ms, jitter_ms), 0) / 1000
+
+    @fake_app.post(TOKEN_PATH)
+    async def token():
+        stats["tokens"] += 1
+        access_token = uuid.uuid4().hex
+        tokens[access_token] = time.monotonic() + token_ttl
+        return {"access_token": access_token, "expires_in": token_ttl}
+
+    @fake_app.post(CHARGE_PATH)
+    async def charge(request: Request, authorization: str = Header("")):
+        access_token = authorization.removeprefix("Bearer ")
+        if tokens.get(access_token, 0) < time.monotonic():
+            stats["unauthorized"] += 1
+            return JSONResponse(status_code=401, content={"error": "invalid_token"})
+
+        payment = await request.json()
+        await asyncio.sleep(delay())
+        now = datetime.now()
+        card_number = payment.get("noPresentCardData", {}).get("cardNumber", "")
+        response = {
+            "id": str(uuid.uuid4()),
+            "requestId": uuid.uuid4().hex,
+            "date": now.strftime("%Y-%m-%d"),
+            "time": now.strftime("%H:%M:%S"),
+        }
+
+        outcome = random.random()
+        if outcome < error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=500, content={"error": "internal_error"})
+        if outcome < error_rate + decline_rate:
+            stats["declined"] += 1
+            return {
+                **response,
+                "status": False,
+                "error": {
+                    "code": "TX_51",
+                    "description": "FONDOS INSUFICIENTES",
+                    "httpStatusCode": 200,
+                    "binInformation": BIN_INFORMATION,
+                },
+            }
+
+        stats["approved"] += 1
+        return {
+            **response,
+            "status": True,
+            "dataResponse": {
+                "authorization": f"{stats['approved'] % 1000000:06d}",
+                "description": "APROBADA",
+                "binInformation": BIN_INFORMATION,
+                "lastFour": card_number[-4:],
+            },
+        }
+
+    @fake_app.get("/stats")
+    async def read_stats():
+        return dict(stats)
+
+    return fake_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--decline-rate", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--token-ttl", type=float, default=3600)
+    args = parser.parse_args()
+    uvicorn.run(
+        build_app(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            decline_rate=args.decline_rate,
+            error_rate=args.error_rate,
+            token_ttl=args.token_ttl,
+        ),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+        backlog=2048,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,40 @@
+from contextlib import asynccontextmanager
+
 from app.api.api import api_router
+from app.api.endpoints.transactions import (
+    card_bin_lookup,
+    event_broker,
+    outbox_relay,
+    rate_limiter,
+    transaction_cache,
+)
 from app.core.config import settings
+from app.core.correlation import install_log_record_factory
+from app.core.metrics import PrometheusMiddleware, generate_metrics, register_stats
+from app.db.async_session import async_engine
+from app.db.pool import get_pool_stats
 from app.db.session import engine
+from app.services.circuit_breaker import blumonpay_circuit_breaker
 from app.models.transaction import Base
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 # Crear tablas en la base de datos (pero ya existe alembic)
 # Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El relay publica desde el arranque lo que quedó en la outbox, sin
+    # esperar a la primera petición, y termina su bloque antes de apagarse
+    outbox_relay.start()
+    yield
+    await outbox_relay.stop()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
+    lifespan=lifespan,
     docs_url="/docs",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     debug=True,
@@ -22,7 +47,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(PrometheusMiddleware)
+
+install_log_record_factory()
+# Sólo lee el estado en Redis; las tareas del worker no se importan en la API
+circuit_breaker = blumonpay_circuit_breaker()
+register_stats("api_db_pool_async", lambda: get_pool_stats(async_engine.sync_engine))
+register_stats("api_db_pool_sync", lambda: get_pool_stats(engine))
+register_stats("transaction_cache", transaction_cache.get_stats)
+register_stats("transaction_events", event_broker.get_stats)
+register_stats("rate_limiter", rate_limiter.get_stats)
+register_stats("outbox_relay", outbox_relay.get_stats)
+register_stats("card_bin_lookup", card_bin_lookup.get_stats)
+register_stats("circuit_breaker", circuit_breaker.get_state)
 
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -36,3 +75,25 @@ def read_root():
 @app.get("/healthcheck")
 def read_root():
     return {"status": "ok"}
+
+
+@app.get("/healthcheck/stats")
+def read_stats():
+    return {
+        "db_pool": {
+            "async": get_pool_stats(async_engine.sync_engine),
+            "sync": get_pool_stats(engine),
+        },
+        "transaction_cache": transaction_cache.get_stats(),
+        "transaction_events": event_broker.get_stats(),
+        "rate_limiter": rate_limiter.get_stats(),
+        "outbox_relay": outbox_relay.get_stats(),
+        "card_bin_lookup": card_bin_lookup.get_stats(),
+        "circuit_breaker": circuit_breaker.get_state(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics(request: Request):
+    body, content_type = generate_metrics(request.headers.get("accept"))
+    return Response(content=body, media_type=content_type)
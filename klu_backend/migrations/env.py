@@ -2,6 +2,12 @@ from logging.config import fileConfig
 
 from alembic import context
 from app.core.config import settings
+from app.db.partitions import default_partition_name, partition_month
+from app.models.card_bin import CardBin  # noqa: F401
+from app.models.gateway_result import TransactionGatewayResult  # noqa: F401
+from app.models.idempotency_key import IdempotencyKey  # noqa: F401
+from app.models.payment_outbox import PaymentOutbox  # noqa: F401
+from app.models.transaction_stats import TransactionStatsBucket  # noqa: F401
 from app.models.transaction import Base
 from sqlalchemy import engine_from_config, pool
 
@@ -20,6 +26,18 @@ target_metadata = Base.metadata
 config.set_main_option("sqlalchemy.url", settings.get_db_uri())
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    Las particiones de transactions (y las separadas por un archivado en
+    curso) no están en los modelos: autogenerate no debe borrarlas
+    """
+    if type_ == "table" and reflected and compare_to is None:
+        table = "transactions"
+        if name == default_partition_name(table) or partition_month(table, name):
+            return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode."""
     url = config.get_main_option("sqlalchemy.url")
@@ -28,6 +46,7 @@ def run_migrations_offline():
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -44,7 +63,9 @@ def run_migrations_online():
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,36 @@
+"""Transaction stats rollup
+
+Revision ID: 2fcbb16b0e45
+Revises: 587150149cab
+Create Date: 2026-10-18 14:47:49.812032
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2fcbb16b0e45'
+down_revision: Union[str, None] = '587150149cab'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('transaction_stats',
+    sa.Column('granularity', sa.String(length=8), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('currency', sa.String(length=8), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.Column('amount_total', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('granularity', 'bucket_start', 'currency', 'status')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('transaction_stats')
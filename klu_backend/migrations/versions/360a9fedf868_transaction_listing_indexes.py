@@ -0,0 +1,47 @@
+"""Transaction listing indexes
+
+Revision ID: 360a9fedf868
+Revises: fff6e8645c55
+Create Date: 2026-10-18 13:55:05.820634
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '360a9fedf868'
+down_revision: Union[str, None] = 'fff6e8645c55'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_transactions_created_at_id', 'transactions', ['created_at', 'id']
+    )
+    op.create_index(
+        'ix_transactions_status_created_at_id',
+        'transactions',
+        ['status', 'created_at', 'id'],
+    )
+    op.create_index(
+        'ix_transactions_currency_created_at_id',
+        'transactions',
+        ['currency', 'created_at', 'id'],
+    )
+    op.create_index(
+        'ix_transactions_customer_email_created_at_id',
+        'transactions',
+        ['customer_email', 'created_at', 'id'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_customer_email_created_at_id', table_name='transactions')
+    op.drop_index('ix_transactions_currency_created_at_id', table_name='transactions')
+    op.drop_index('ix_transactions_status_created_at_id', table_name='transactions')
+    op.drop_index('ix_transactions_created_at_id', table_name='transactions')
@@ -0,0 +1,61 @@
+"""Transaction status enum
+
+Revision ID: 4c1d7e2a9b3f
+Revises: 9e1ae25b0b66
+Create Date: 2026-10-18 14:52:40.118302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1d7e2a9b3f'
+down_revision: Union[str, None] = '9e1ae25b0b66'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATUSES = (
+    'pending', 'processing', 'completed', 'declined', 'failed', 'unreconciled'
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Antes se guardaba como estado la descripción de Blumonpay: la de la
+    # autorización ("APROBADA" si no enviaba otra) o el motivo del rechazo.
+    # No se guardaban el id de pago ni el código de autorización, así que
+    # sólo "APROBADA" prueba que el cargo se aprobó; cualquier otra
+    # descripción puede ser de una aprobación o de un rechazo y queda para
+    # conciliar con Blumonpay en lugar de adivinar
+    op.execute(
+        "UPDATE transactions SET status = 'completed' WHERE status = 'APROBADA'"
+    )
+    op.execute(
+        "UPDATE transactions SET status = 'unreconciled' "
+        "WHERE status NOT IN ('pending', 'completed', 'failed')"
+    )
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.alter_column(
+            'status',
+            existing_type=sa.String(),
+            type_=sa.String(length=16),
+            existing_nullable=False,
+        )
+        batch_op.create_check_constraint(
+            'transaction_status', sa.column('status').in_(STATUSES)
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_constraint('transaction_status', type_='check')
+        batch_op.alter_column(
+            'status',
+            existing_type=sa.String(length=16),
+            type_=sa.String(),
+            existing_nullable=False,
+        )
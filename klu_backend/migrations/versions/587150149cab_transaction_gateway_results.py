@@ -0,0 +1,49 @@
+"""Transaction gateway results
+
+Revision ID: 587150149cab
+Revises: 4c1d7e2a9b3f
+Create Date: 2026-10-18 14:41:49.831551
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '587150149cab'
+down_revision: Union[str, None] = '4c1d7e2a9b3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('transaction_gateway_results',
+    sa.Column('transaction_id', sa.UUID(), nullable=False),
+    sa.Column('blumonpay_transaction_id', sa.String(length=64), nullable=True),
+    sa.Column('request_id', sa.String(length=64), nullable=True),
+    sa.Column('authorization_code', sa.String(length=32), nullable=True),
+    sa.Column('error_code', sa.String(length=32), nullable=True),
+    sa.Column('message', sa.String(length=255), nullable=True),
+    sa.Column('card_brand', sa.String(length=32), nullable=True),
+    sa.Column('card_bank', sa.String(length=64), nullable=True),
+    sa.Column('card_type', sa.String(length=32), nullable=True),
+    sa.Column('card_product', sa.String(length=64), nullable=True),
+    sa.Column('card_last_four', sa.String(length=4), nullable=True),
+    sa.Column('gateway_timestamp', sa.String(length=32), nullable=True),
+    sa.Column('raw_response', sa.JSON().with_variant(postgresql.JSONB(astext_type=sa.Text()), 'postgresql'), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('transaction_id')
+    )
+    op.create_index('ix_transaction_gateway_results_authorization_code', 'transaction_gateway_results', ['authorization_code'], unique=False)
+    op.create_index('ix_transaction_gateway_results_card_brand_created_at', 'transaction_gateway_results', ['card_brand', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transaction_gateway_results_card_brand_created_at', table_name='transaction_gateway_results')
+    op.drop_index('ix_transaction_gateway_results_authorization_code', table_name='transaction_gateway_results')
+    op.drop_table('transaction_gateway_results')
@@ -0,0 +1,64 @@
+"""Redact card data in payment outbox
+
+Revision ID: 8b1fb3676815
+Revises: 91c42c978f7a
+Create Date: 2026-10-18 16:09:31.403491
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1fb3676815'
+down_revision: Union[str, None] = '91c42c978f7a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+payment_outbox = sa.table(
+    'payment_outbox',
+    sa.column('id', sa.BigInteger()),
+    sa.column('payload', sa.JSON()),
+)
+
+
+def redact(payload: dict) -> dict:
+    """Tarjeta enmascarada (6 y 4 dígitos) y sin CVV"""
+    card = {
+        field: value
+        for field, value in payload.get('noPresentCardData', {}).items()
+        if field != 'cvv'
+    }
+    number = card.get('cardNumber') or ''
+    if len(number) >= 10:
+        card['cardNumber'] = number[:6] + '*' * (len(number) - 10) + number[-4:]
+    return {**payload, 'noPresentCardData': card}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Las filas escritas antes de CardVault llevan la tarjeta completa. Sin
+    # ella sus cargos ya no se pueden cobrar: el worker los marca como
+    # fallidos (card_data_expired). Despliega con la outbox vacía
+    # (`python -m app.tasks.outbox_tasks status`)
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(payment_outbox.c.id, payment_outbox.c.payload)
+    ).all()
+    for row in rows:
+        if 'cvv' not in row.payload.get('noPresentCardData', {}):
+            continue
+        connection.execute(
+            payment_outbox.update()
+            .where(payment_outbox.c.id == row.id)
+            .values(payload=redact(row.payload))
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Los datos borrados no se recuperan
+    pass
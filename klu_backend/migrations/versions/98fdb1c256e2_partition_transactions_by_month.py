@@ -0,0 +1,210 @@
+"""Partition transactions by month
+
+Revision ID: 98fdb1c256e2
+Revises: 2fcbb16b0e45
+Create Date: 2026-10-18 16:05:12.530418
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '98fdb1c256e2'
+down_revision: Union[str, None] = '2fcbb16b0e45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATUSES = (
+    'pending', 'processing', 'completed', 'declined', 'failed', 'unreconciled'
+)
+INDEXES = {
+    'ix_transactions_created_at_id': ['created_at', 'id'],
+    'ix_transactions_status_created_at_id': ['status', 'created_at', 'id'],
+    'ix_transactions_currency_created_at_id': ['currency', 'created_at', 'id'],
+    'ix_transactions_customer_email_created_at_id': [
+        'customer_email', 'created_at', 'id'
+    ],
+}
+# Tablas con clave foránea a transactions.id
+DEPENDENTS = ('idempotency_keys', 'transaction_gateway_results')
+# Particiones creadas después del mes actual (TRANSACTION_PARTITIONS_AHEAD);
+# el job de Celery beat crea las siguientes
+PARTITIONS_AHEAD = 3
+COLUMNS = (
+    'id, amount, currency, customer_email, customer_name, status, '
+    'blumonpay_transaction_id, created_at'
+)
+# Nombres de las FK sin nombre en SQLite
+NAMING_CONVENTION = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+    'pk': 'pk_%(table_name)s',
+}
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def month_start(value: datetime) -> datetime:
+    value = value.astimezone(timezone.utc) if value.tzinfo else value
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def create_transactions_table(name: str, primary_key: list[str], **kw):
+    op.create_table(name,
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('currency', sa.String(), nullable=False),
+    sa.Column('customer_email', sa.String(), nullable=False),
+    sa.Column('customer_name', sa.String(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('blumonpay_transaction_id', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+    sa.CheckConstraint(sa.column('status').in_(STATUSES), name='transaction_status'),
+    sa.PrimaryKeyConstraint(*primary_key, name=f'{name}_pkey'),
+    **kw
+    )
+
+
+def create_indexes(table: str):
+    for index, columns in INDEXES.items():
+        op.create_index(index, table, columns)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # created_at es la clave de partición: no puede ser nulo
+    op.execute(
+        "UPDATE transactions SET created_at = CURRENT_TIMESTAMP "
+        "WHERE created_at IS NULL"
+    )
+    if op.get_bind().dialect.name != 'postgresql':
+        upgrade_sqlite()
+        return
+
+    # Una FK sólo puede apuntar a una tabla particionada con una clave
+    # que incluya la columna de partición
+    for table in DEPENDENTS:
+        op.drop_constraint(
+            f'{table}_transaction_id_fkey', table, type_='foreignkey'
+        )
+    op.rename_table('transactions', 'transactions_unpartitioned')
+    op.execute(
+        'ALTER TABLE transactions_unpartitioned '
+        'RENAME CONSTRAINT transactions_pkey TO transactions_unpartitioned_pkey'
+    )
+    for index in INDEXES:
+        op.drop_index(index, table_name='transactions_unpartitioned')
+
+    create_transactions_table(
+        'transactions',
+        ['id', 'created_at'],
+        postgresql_partition_by='RANGE (created_at)',
+    )
+    create_indexes('transactions')
+
+    # Una partición por mes desde la transacción más antigua; la default
+    # recibe las filas de meses sin partición
+    op.execute('CREATE TABLE transactions_default PARTITION OF transactions DEFAULT')
+    first = op.get_bind().scalar(
+        sa.text('SELECT min(created_at) FROM transactions_unpartitioned')
+    )
+    now = datetime.now(timezone.utc)
+    month = month_start(first or now)
+    while month <= add_months(month_start(now), PARTITIONS_AHEAD):
+        end = add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE transactions_p{month:%Y%m} PARTITION OF transactions "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        month = end
+
+    # Copia en la misma transacción de la migración: en tablas grandes
+    # conviene una ventana de mantenimiento
+    op.execute(
+        f'INSERT INTO transactions ({COLUMNS}) '
+        f'SELECT {COLUMNS} FROM transactions_unpartitioned'
+    )
+    op.drop_table('transactions_unpartitioned')
+
+
+def upgrade_sqlite() -> None:
+    for table in DEPENDENTS:
+        with op.batch_alter_table(
+            table, naming_convention=NAMING_CONVENTION
+        ) as batch_op:
+            batch_op.drop_constraint(
+                f'fk_{table}_transaction_id_transactions', type_='foreignkey'
+            )
+    with op.batch_alter_table(
+        'transactions', naming_convention=NAMING_CONVENTION, recreate='always'
+    ) as batch_op:
+        batch_op.alter_column(
+            'created_at',
+            existing_type=sa.DateTime(timezone=True),
+            nullable=False,
+        )
+        batch_op.drop_constraint('pk_transactions', type_='primary')
+        batch_op.create_primary_key('pk_transactions', ['id', 'created_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        downgrade_sqlite()
+        return
+
+    # Las particiones ya archivadas no se recuperan
+    create_transactions_table('transactions_unpartitioned', ['id'])
+    op.execute(
+        f'INSERT INTO transactions_unpartitioned ({COLUMNS}) '
+        f'SELECT {COLUMNS} FROM transactions'
+    )
+    # Borra también las particiones
+    op.drop_table('transactions')
+    op.rename_table('transactions_unpartitioned', 'transactions')
+    op.execute(
+        'ALTER TABLE transactions '
+        'RENAME CONSTRAINT transactions_unpartitioned_pkey TO transactions_pkey'
+    )
+    create_indexes('transactions')
+    for table in DEPENDENTS:
+        op.execute(
+            f'DELETE FROM {table} WHERE transaction_id NOT IN '
+            f'(SELECT id FROM transactions)'
+        )
+        op.create_foreign_key(
+            f'{table}_transaction_id_fkey',
+            table,
+            'transactions',
+            ['transaction_id'],
+            ['id'],
+            ondelete='CASCADE',
+        )
+
+
+def downgrade_sqlite() -> None:
+    with op.batch_alter_table(
+        'transactions', naming_convention=NAMING_CONVENTION, recreate='always'
+    ) as batch_op:
+        batch_op.drop_constraint('pk_transactions', type_='primary')
+        batch_op.create_primary_key('pk_transactions', ['id'])
+        batch_op.alter_column(
+            'created_at',
+            existing_type=sa.DateTime(timezone=True),
+            nullable=True,
+        )
+    for table in DEPENDENTS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.create_foreign_key(
+                f'fk_{table}_transaction_id_transactions',
+                'transactions',
+                ['transaction_id'],
+                ['id'],
+                ondelete='CASCADE',
+            )
@@ -0,0 +1,44 @@
+"""Payment outbox
+
+Revision ID: c41e9a7d2b58
+Revises: 98fdb1c256e2
+Create Date: 2026-10-18 18:21:37.604113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41e9a7d2b58'
+down_revision: Union[str, None] = '98fdb1c256e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('payment_outbox',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+    sa.Column('transaction_id', sa.UUID(), nullable=False),
+    sa.Column('transaction_created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('queue', sa.String(length=255), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('published_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_payment_outbox_transaction_id', 'payment_outbox', ['transaction_id'], unique=False)
+    op.create_index('ix_payment_outbox_unpublished', 'payment_outbox', ['id'], unique=False, postgresql_where=sa.text('published_at IS NULL'), sqlite_where=sa.text('published_at IS NULL'))
+    op.create_index('ix_payment_outbox_published_at', 'payment_outbox', ['published_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payment_outbox_published_at', table_name='payment_outbox')
+    op.drop_index('ix_payment_outbox_unpublished', table_name='payment_outbox', postgresql_where=sa.text('published_at IS NULL'), sqlite_where=sa.text('published_at IS NULL'))
+    op.drop_index('ix_payment_outbox_transaction_id', table_name='payment_outbox')
+    op.drop_table('payment_outbox')
@@ -0,0 +1,41 @@
+"""Card bins and card brand/type on transactions
+
+Revision ID: d744e5cd6b1a
+Revises: c41e9a7d2b58
+Create Date: 2026-10-18 15:45:00.763675
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd744e5cd6b1a'
+down_revision: Union[str, None] = 'c41e9a7d2b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('card_bins',
+    sa.Column('bin', sa.String(length=8), nullable=False),
+    sa.Column('bank', sa.String(length=64), nullable=True),
+    sa.Column('brand', sa.String(length=32), nullable=True),
+    sa.Column('type', sa.String(length=32), nullable=True),
+    sa.Column('product', sa.String(length=64), nullable=True),
+    sa.Column('source', sa.String(length=16), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('bin')
+    )
+    op.add_column('transactions', sa.Column('card_brand', sa.String(length=32), nullable=True))
+    op.add_column('transactions', sa.Column('card_type', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('transactions', 'card_type')
+    op.drop_column('transactions', 'card_brand')
+    op.drop_table('card_bins')
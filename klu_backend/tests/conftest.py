@@ -0,0 +1,100 @@
+"""
+Las pruebas corren con un SQLite temporal y un Redis en memoria (fakeredis,
+con Lua para los scripts del rate limiter y del circuit breaker). El entorno
+se fija antes de importar cualquier módulo de `app`.
+"""
+import asyncio
+import importlib
+import os
+import pkgutil
+import tempfile
+
+os.environ["DB_TYPE"] = "sqlite"
+os.environ["SQLITE_URI"] = (
+    f"sqlite:///{tempfile.mkdtemp(prefix='klu-test-')}/test.db"
+)
+os.environ["REDIS_PASSWORD"] = ""
+
+import fakeredis  # noqa: E402
+import pytest  # noqa: E402
+
+import app.models  # noqa: E402
+from app.db import redis as app_redis  # noqa: E402
+from app.db.async_session import async_engine  # noqa: E402
+from app.db.session import Base, SessionLocal, engine  # noqa: E402
+
+# create_all necesita todos los modelos, también los que sólo usa el worker
+for module in pkgutil.iter_modules(app.models.__path__):
+    importlib.import_module(f"app.models.{module.name}")
+
+
+@pytest.fixture(autouse=True)
+def redis_server(monkeypatch):
+    """Un Redis vacío por prueba, compartido por los clientes sync y asyncio"""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(app_redis, "_redis", fakeredis.FakeRedis(server=server))
+    monkeypatch.setattr(
+        app_redis, "_async_redis", fakeredis.aioredis.FakeRedis(server=server)
+    )
+    return server
+
+
+@pytest.fixture
+def tables():
+    Base.metadata.create_all(bind=engine)
+    yield
+    # aiosqlite deja un hilo por conexión del pool: sin cerrarlas el proceso
+    # no termina
+    asyncio.run(async_engine.dispose())
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def db(tables):
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def make_transaction(db):
+    """Inserta una transacción y devuelve su id"""
+    from app.models.transaction import Transaction, TransactionStatus, utcnow, uuid7
+
+    def make(
+        status=TransactionStatus.PENDING,
+        created_at=None,
+        currency="MXN",
+        amount=100.0,
+    ):
+        transaction = Transaction(
+            id=uuid7(),
+            amount=amount,
+            currency=currency,
+            customer_email="ana@example.com",
+            customer_name="Ana López",
+            status=status,
+            created_at=created_at or utcnow(),
+        )
+        db.add(transaction)
+        db.commit()
+        return transaction.id
+
+    return make
+
+
+@pytest.fixture
+def published(monkeypatch) -> list[tuple[str, str]]:
+    """(cola, transaction_id) de cada mensaje publicado, sin broker"""
+    from app.services import outbox
+
+    messages = []
+
+    def publish_payment(transaction_id, payment_data, queue=None):
+        messages.append((queue, transaction_id))
+
+    def dispatch_payment_batch(payments, queue=None, **kwargs):
+        messages.extend((queue, transaction_id) for transaction_id, _ in payments)
+
+    monkeypatch.setattr(outbox, "publish_payment", publish_payment)
+    monkeypatch.setattr(outbox, "dispatch_payment_batch", dispatch_payment_batch)
+    return messages
@@ -0,0 +1,124 @@
+"""
+POST /transactions/ con Idempotency-Key: la misma clave con el mismo cuerpo
+devuelve la respuesta original, con otro cuerpo se rechaza.
+"""
+import copy
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app.api import clients
+from app.api.endpoints import transactions
+from app.core.config import settings
+from app.models.transaction import Transaction
+from app.services.idempotency import IdempotencyStore
+from main import app
+
+URL = f"{settings.API_V1_STR}/transactions/"
+PAYMENT = {
+    "amount": 150.5,
+    "currency": "MXN",
+    "customerInformation": {
+        "firstName": "Ana",
+        "lastName": "López",
+        "email": "ana@example.com",
+        "phone1": "5555555555",
+        "city": "CDMX",
+        "address1": "Reforma 1",
+        "postalCode": "06600",
+        "state": "CDMX",
+        "country": "MX",
+    },
+    "noPresentCardData": {
+        "cardNumber": "4111111111111111",
+        "expirationMonth": "12",
+        "expirationYear": "30",
+        "cvv": "123",
+        "cardholderName": "Ana López",
+    },
+}
+
+
+@pytest.fixture
+def client(tables, published, monkeypatch):
+    # El script del rate limiter se registró en el Redis de otra prueba
+    monkeypatch.setattr(transactions.rate_limiter, "_acquire_script", None)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def post(client, payment, key="key-1", **headers):
+    return client.post(URL, json=payment, headers={"Idempotency-Key": key, **headers})
+
+
+def test_same_key_and_body_replays_the_response(client, db):
+    first = post(client, PAYMENT)
+    replay = post(client, PAYMENT)
+
+    assert first.status_code == replay.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.content == first.content
+    # Una sola transacción: la repetición no vuelve a cobrar
+    assert db.scalar(select(func.count()).select_from(Transaction)) == 1
+
+
+def test_created_and_read_bodies_match(client):
+    created = post(client, PAYMENT)
+
+    read = client.get(f"{URL}{created.json()['id']}")
+    (listed,) = client.get(URL).json()
+
+    assert read.content == created.content
+    assert listed == created.json()
+    # SQLite no guarda la zona: las tres respuestas la devuelven en UTC
+    assert created.json()["created_at"].endswith("+00:00")
+
+
+def test_same_key_with_another_body_is_rejected(client):
+    post(client, PAYMENT)
+    changed = copy.deepcopy(PAYMENT)
+    changed["amount"] = 999.0
+
+    response = post(client, changed)
+
+    assert response.status_code == 422
+    assert "different request" in response.json()["detail"]
+
+
+def test_keys_are_scoped_per_client(client, monkeypatch):
+    digest = hashlib.sha256(b"secret").hexdigest()
+    monkeypatch.setattr(settings, "API_KEYS", f"acme:{digest}")
+    clients.api_keys.cache_clear()
+    try:
+        anonymous = post(client, PAYMENT)
+        acme = post(client, PAYMENT, **{"X-API-Key": "secret"})
+    finally:
+        clients.api_keys.cache_clear()
+
+    assert acme.status_code == 201
+    assert "Idempotent-Replayed" not in acme.headers
+    assert acme.json()["id"] != anonymous.json()["id"]
+
+
+def test_request_hash_ignores_the_cvv_and_hides_the_card():
+    other_cvv = copy.deepcopy(PAYMENT)
+    other_cvv["noPresentCardData"]["cvv"] = "999"
+    other_card = copy.deepcopy(PAYMENT)
+    other_card["noPresentCardData"]["cardNumber"] = "4000000000000002"
+
+    request_hash = IdempotencyStore.hash_request(PAYMENT)
+
+    assert request_hash == IdempotencyStore.hash_request(other_cvv)
+    assert request_hash != IdempotencyStore.hash_request(other_card)
+    assert "4111111111111111" not in request_hash
+
+
+@pytest.mark.parametrize("currency", ["mxn", "PESOS", "US DOLLAR"])
+def test_invalid_currency_is_rejected(client, currency, published):
+    response = post(client, {**PAYMENT, "currency": currency})
+
+    assert response.status_code == 422
+    assert published == []
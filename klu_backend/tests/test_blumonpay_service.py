@@ -0,0 +1,92 @@
+"""
+Qué errores de Blumonpay se reintentan: sólo los que ocurren antes de que el
+cargo salga (la conexión no se abrió) o las respuestas en las que Blumonpay
+avisa que no lo procesó. Los servidores son sockets locales reales.
+"""
+import socket
+import threading
+
+import pytest
+import requests
+
+from app.services.blumonpay_service import BlumonpayAPIError, BlumonpayService
+
+PAYMENT = {"amount": 10, "currency": "MXN"}
+
+
+def serve_once(handle) -> str:
+    """URL de un servidor que atiende una conexión con `handle(conn)`"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def run():
+        conn, _ = server.accept()
+        with conn:
+            # Lee el cargo completo antes de responder o cortar
+            conn.recv(65536)
+            handle(conn)
+        server.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    return f"http://127.0.0.1:{server.getsockname()[1]}/charge"
+
+
+def charge_error(url: str) -> BlumonpayAPIError:
+    service = BlumonpayService()
+    service.charge_url = url
+    service.token = "token"
+    try:
+        with pytest.raises(BlumonpayAPIError) as error:
+            service.process_payment_sync(PAYMENT)
+    finally:
+        service.close()
+    return error.value
+
+
+def test_disconnect_after_send_is_not_retryable():
+    # Blumonpay recibió el cargo y cortó sin responder: pudo aplicarse
+    error = charge_error(serve_once(lambda conn: None))
+    assert error.retryable is False
+
+
+def test_connection_refused_is_retryable():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    error = charge_error(f"http://127.0.0.1:{port}/charge")
+    assert error.retryable is True
+
+
+def test_connect_timeout_is_retryable(monkeypatch):
+    def timeout(self, payment_data, token):
+        raise requests.exceptions.ConnectTimeout("connect timed out")
+
+    monkeypatch.setattr(BlumonpayService, "_post_charge", timeout)
+    error = charge_error("http://127.0.0.1/charge")
+    assert error.retryable is True
+
+
+def status_response(status_code: int) -> bytes:
+    return (
+        f"HTTP/1.1 {status_code} Unavailable\r\n"
+        "Content-Length: 0\r\nConnection: close\r\n\r\n"
+    ).encode()
+
+
+@pytest.mark.parametrize("status_code", [429, 503])
+def test_unavailable_responses_are_retryable(status_code):
+    response = status_response(status_code)
+    error = charge_error(serve_once(lambda conn: conn.sendall(response)))
+    assert error.status_code == status_code
+    assert error.retryable is True
+
+
+@pytest.mark.parametrize("status_code", [500, 502, 504])
+def test_gateway_errors_are_not_retryable(status_code):
+    # El proxy o Blumonpay pudieron recibir el cargo antes de fallar
+    response = status_response(status_code)
+    error = charge_error(serve_once(lambda conn: conn.sendall(response)))
+    assert error.status_code == status_code
+    assert error.retryable is False
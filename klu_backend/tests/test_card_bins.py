@@ -0,0 +1,116 @@
+"""
+Datos del BIN: caché LRU de la API, consulta a card_bins y BIN aprendidos de
+las respuestas de Blumonpay en el worker.
+"""
+import asyncio
+
+from sqlalchemy import select
+
+from app.db.async_session import AsyncSessionLocal
+from app.models.card_bin import CardBin
+from app.repositories.card_bin_repository import (
+    GATEWAY,
+    IMPORT,
+    CardBinRepository,
+    card_bin_values,
+)
+from app.services.card_bins import (
+    MISSING,
+    CardBinCache,
+    CardBinInfo,
+    CardBinLookup,
+    learned_bin,
+)
+from app.tasks import payment_tasks
+
+VISA = CardBinInfo("411111", "Bank", "VISA", "CREDIT", "Classic")
+VISA_DEBIT = CardBinInfo("41111122", "Bank", "VISA", "DEBIT", None)
+
+
+def test_cache_evicts_the_least_recently_used():
+    cache = CardBinCache(max_size=2, ttl=60, negative_ttl=60)
+    cache.put("1", VISA)
+    cache.put("2", VISA)
+    cache.get("1")
+
+    cache.put("3", VISA)
+
+    assert cache.get("2") is MISSING
+    assert cache.get("1") == VISA
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_unknown_bins_use_the_negative_ttl():
+    cache = CardBinCache(max_size=10, ttl=60, negative_ttl=0)
+    cache.put("known", VISA)
+    cache.put("unknown", None)
+
+    assert cache.get("known") == VISA
+    assert cache.get("unknown") is MISSING
+
+
+def test_learned_bin():
+    card_info = {"bank": "Bank", "brand": "VISA", "type": "CREDIT", "product": ""}
+
+    info = learned_bin("4111111111111111", card_info)
+
+    assert info == CardBinInfo("411111", "Bank", "VISA", "CREDIT", None)
+    assert learned_bin("4111111111111111", None) is None
+    assert learned_bin("4111111111111111", {"product": "Classic"}) is None
+
+
+def add_bins(db, *infos):
+    CardBinRepository().upsert_bins(db, [card_bin_values(i, IMPORT) for i in infos])
+
+
+def test_lookup_prefers_the_longest_bin(db):
+    add_bins(db, VISA, VISA_DEBIT)
+    lookup = CardBinLookup(CardBinCache(max_size=10, ttl=60, negative_ttl=60))
+
+    async def lookup_many(card_numbers):
+        async with AsyncSessionLocal() as session:
+            return await lookup.lookup_many(session, card_numbers)
+
+    found = asyncio.run(
+        lookup_many(["4111112233334444", "4111119999999999", "5555555555554444"])
+    )
+
+    assert found == [VISA_DEBIT, VISA, None]
+    # La segunda vez todo sale de la caché, también el BIN desconocido
+    asyncio.run(lookup_many(["4111112233334444", "5555555555554444"]))
+    assert lookup.get_stats()["queries"] == 1
+
+
+def test_blocked_brands_and_types_are_rejected(monkeypatch):
+    monkeypatch.setattr(
+        "app.core.config.settings.CARD_BIN_BLOCKED_TYPES", "debit, prepaid"
+    )
+    lookup = CardBinLookup()
+
+    assert lookup.rejection(VISA) is None
+    assert lookup.rejection(None) is None
+    assert lookup.rejection(VISA_DEBIT) == "Card type DEBIT is not accepted"
+
+
+def test_worker_learns_bins_from_blumonpay(db):
+    payment_data = {"noPresentCardData": {"cardNumber": "5204730000001003"}}
+    result = {"card_info": {"bank": "Banco", "brand": "MASTERCARD", "type": "DEBIT"}}
+
+    payment_tasks.learn_card_bin(payment_data, result)
+    payment_tasks.card_bins.flush()
+
+    row = db.scalars(select(CardBin).where(CardBin.bin == "520473")).one()
+    assert (row.brand, row.type, row.source) == ("MASTERCARD", "DEBIT", GATEWAY)
+
+
+def test_learned_bins_do_not_replace_imported_ones(db):
+    add_bins(db, VISA)
+
+    payment_tasks.learn_card_bin(
+        {"noPresentCardData": {"cardNumber": "4111111111111111"}},
+        {"card_info": {"bank": "Other", "brand": "VISA", "type": "DEBIT"}},
+    )
+    payment_tasks.card_bins.flush()
+
+    row = db.scalars(select(CardBin).where(CardBin.bin == "411111")).one()
+    assert (row.type, row.source) == ("CREDIT", IMPORT)
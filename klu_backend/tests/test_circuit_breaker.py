@@ -0,0 +1,82 @@
+"""
+Circuit breaker compartido en Redis: se abre con las fallas de la ventana,
+deja pasar una sola prueba en half-open y se cierra si funciona.
+"""
+import pytest
+
+from app.core.config import settings
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch) -> list[int]:
+    """Hora del circuito en ms; la prueba la avanza a mano"""
+    now = [1_000_000]
+    monkeypatch.setattr(CircuitBreaker, "_now_ms", staticmethod(lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def breaker(monkeypatch, clock) -> CircuitBreaker:
+    monkeypatch.setattr(settings, "CIRCUIT_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "CIRCUIT_FAILURE_RATIO", 0.5)
+    monkeypatch.setattr(settings, "CIRCUIT_OPEN_SECONDS", 10)
+    return CircuitBreaker("test", probe_seconds=5)
+
+
+def open_circuit(breaker: CircuitBreaker):
+    for _ in range(3):
+        breaker.allow()
+        breaker.record_failure()
+
+
+def test_opens_after_enough_failures(breaker):
+    breaker.allow()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.get_state()["state"] == "closed"
+
+    breaker.record_failure()
+
+    assert breaker.get_state()["state"] == "open"
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.allow()
+    assert exc_info.value.retry_after == pytest.approx(10)
+
+
+def test_stays_closed_below_the_failure_ratio(breaker):
+    for _ in range(4):
+        breaker.record_success()
+    for _ in range(3):
+        breaker.record_failure()
+
+    assert breaker.get_state()["state"] == "closed"
+
+
+def test_half_open_allows_a_single_probe(breaker, clock):
+    open_circuit(breaker)
+    clock[0] += 10_000
+
+    breaker.allow()
+    assert breaker.get_state()["state"] == "half_open"
+    # Mientras la prueba está en vuelo las demás llamadas esperan
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    breaker.record_success()
+
+    assert breaker.get_state()["state"] == "closed"
+    breaker.allow()
+
+
+def test_failed_probe_reopens_the_circuit(breaker, clock):
+    open_circuit(breaker)
+    clock[0] += 10_000
+    breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.get_state()["state"] == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
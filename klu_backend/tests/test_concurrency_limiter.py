@@ -0,0 +1,85 @@
+"""
+Límite de concurrencia AIMD de los cargos a Blumonpay.
+"""
+import pytest
+
+from app.services.concurrency_limiter import (
+    AdaptiveConcurrencyLimiter,
+    ConcurrencyLimitExceeded,
+)
+
+
+def make_limiter(initial=4) -> AdaptiveConcurrencyLimiter:
+    return AdaptiveConcurrencyLimiter(
+        initial=initial, minimum=1, maximum=8, latency_target=1.0, backoff_ratio=0.5
+    )
+
+
+def test_acquire_times_out_at_the_limit():
+    limiter = make_limiter(initial=2)
+    limiter.acquire(timeout=0)
+    limiter.acquire(timeout=0)
+
+    with pytest.raises(ConcurrencyLimitExceeded):
+        limiter.acquire(timeout=0.01)
+
+    assert limiter.get_stats()["rejected"] == 1
+    assert limiter.get_stats()["in_flight"] == 2
+
+
+@pytest.mark.parametrize(
+    "latency, overloaded", [(2.0, False), (0.1, True)]
+)
+def test_slow_or_overloaded_calls_decrease_the_limit(latency, overloaded):
+    limiter = make_limiter(initial=4)
+    limiter.acquire(timeout=0)
+
+    limiter.release(latency=latency, overloaded=overloaded)
+
+    assert limiter.limit == 2
+    assert limiter.get_stats()["in_flight"] == 0
+
+
+def test_limit_never_goes_below_the_minimum():
+    limiter = make_limiter(initial=1)
+    for _ in range(3):
+        limiter.acquire(timeout=0)
+        limiter.release(latency=0.1, overloaded=True)
+
+    assert limiter.limit == 1
+
+
+def test_fast_calls_at_the_limit_increase_it():
+    limiter = make_limiter(initial=2)
+    for _ in range(3):
+        limiter.acquire(timeout=0)
+        limiter.acquire(timeout=0)
+        limiter.release(latency=0.1)
+        limiter.release(latency=0.1)
+
+    assert limiter.limit == 3
+    # Con el límite más alto entra una llamada más
+    for _ in range(3):
+        limiter.acquire(timeout=0)
+
+
+def test_limit_does_not_grow_with_free_slots():
+    limiter = make_limiter(initial=4)
+    for _ in range(20):
+        limiter.acquire(timeout=0)
+        limiter.release(latency=0.1)
+
+    assert limiter.limit == 4
+    assert limiter.get_stats()["increases"] == 0
+
+
+def test_cancel_does_not_change_the_limit():
+    limiter = make_limiter(initial=2)
+    limiter.acquire(timeout=0)
+    limiter.acquire(timeout=0)
+
+    limiter.cancel()
+    limiter.acquire(timeout=0)
+
+    assert limiter.limit == 2
+    assert limiter.get_stats()["in_flight"] == 2
@@ -0,0 +1,92 @@
+"""
+Reenvío de la dead-letter queue y vigencia de las tarjetas en Redis.
+"""
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings, settings
+from app.models.transaction import TransactionStatus
+from app.services.card_data import CardVault
+from app.tasks import dead_letter
+from app.tasks.payment_tasks import dead_letter_queue, transaction_repo
+
+
+@pytest.fixture
+def dispatched(monkeypatch) -> list:
+    payments = []
+    monkeypatch.setattr(
+        dead_letter,
+        "dispatch_payment_batch",
+        lambda batch, queue=None: payments.extend(batch),
+    )
+    return payments
+
+
+def dead_letter_payment(make_transaction, reason: str, card: bool = True):
+    """Transacción fallida con su entrada en la dead-letter queue"""
+    transaction_id = make_transaction(status=TransactionStatus.FAILED)
+    (payment_data,) = asyncio.run(
+        CardVault().seal_many(
+            [{"noPresentCardData": {"cardNumber": "4111111111111111", "cvv": "1"}}]
+        )
+    )
+    if not card:
+        CardVault().discard_sync(payment_data)
+    dead_letter_queue.push_sync(transaction_id, payment_data, reason, "boom", 1)
+    return transaction_id
+
+
+def test_replay_reports_unreplayable_entries(db, make_transaction, dispatched):
+    replayable = dead_letter_payment(make_transaction, "retries_exhausted")
+    expired = dead_letter_payment(make_transaction, "retries_exhausted", card=False)
+    dead_letter_payment(make_transaction, "gateway_error")
+
+    result = dead_letter.replay(limit=10)
+
+    assert result == {
+        "replayed": 1,
+        "discarded": 0,
+        "unconfirmed": 1,
+        "expired": [str(expired)],
+        "charged": [],
+    }
+    assert [transaction_id for transaction_id, _ in dispatched] == [str(replayable)]
+    db.expire_all()
+    assert transaction_repo.get_transaction(db, replayable).status == (
+        TransactionStatus.PENDING
+    )
+    assert transaction_repo.get_transaction(db, expired).status == (
+        TransactionStatus.FAILED
+    )
+    # Las que no se reenviaron siguen en la lista
+    assert dead_letter_queue.count() == 2
+
+
+def test_list_marks_expired_cards(db, make_transaction, capsys):
+    dead_letter_payment(make_transaction, "retries_exhausted")
+    dead_letter_payment(make_transaction, "card_data_expired", card=False)
+
+    dead_letter.list_entries(limit=10)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert "(expired)" not in lines[1]
+    assert "card=****1111 (expired)" in lines[2]
+
+
+def test_card_data_ttl_covers_retries_and_redeliveries():
+    min_ttl = settings.get_card_data_min_ttl()
+
+    assert min_ttl >= (
+        settings.OUTBOX_REDELIVER_AFTER_SECONDS * settings.OUTBOX_MAX_ATTEMPTS
+        + settings.CHARGE_DEFER_MAX_SECONDS
+    )
+    assert settings.CARD_DATA_TTL_SECONDS == (
+        min_ttl + settings.CARD_DATA_TTL_MARGIN_SECONDS
+    )
+
+
+def test_card_data_ttl_below_the_longest_wait_is_rejected():
+    with pytest.raises(ValidationError, match="CARD_DATA_TTL_SECONDS"):
+        Settings(CARD_DATA_TTL_SECONDS=600)
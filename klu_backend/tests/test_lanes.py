@@ -0,0 +1,69 @@
+"""
+Carriles de la cola de cargos y el orden en que el worker los lee.
+"""
+from collections import Counter
+
+from app.core.config import settings
+from app.tasks.lanes import (
+    BULK,
+    INTERACTIVE,
+    LEGACY_QUEUE,
+    RETRY,
+    WeightedLaneCycle,
+    bulk_queue,
+    lane_queue,
+    payment_queues,
+    queue_lane,
+)
+
+
+def test_queue_lane():
+    assert queue_lane(lane_queue(INTERACTIVE)) == INTERACTIVE
+    assert queue_lane(f"{lane_queue(BULK)}-3") == BULK
+    assert queue_lane(LEGACY_QUEUE) == INTERACTIVE
+    assert queue_lane("celery") is None
+    assert queue_lane(f"{settings.PAYMENT_QUEUE_PREFIX}-other") is None
+
+
+def test_bulk_shards_are_stable_per_client(monkeypatch):
+    assert bulk_queue("key:acme") == lane_queue(BULK)
+
+    monkeypatch.setattr(settings, "PAYMENT_BULK_SHARDS", 4)
+
+    queue = bulk_queue("key:acme")
+    assert queue == bulk_queue("key:acme")
+    assert queue in payment_queues()
+    assert queue_lane(queue) == BULK
+    assert len({bulk_queue(f"key:client-{i}") for i in range(50)}) > 1
+
+
+def reads(cycle: WeightedLaneCycle, count: int) -> Counter:
+    """Carril leído en cada BRPOP con todas las colas llenas"""
+    lanes = Counter()
+    for _ in range(count):
+        queue = cycle.consume(len(cycle.items))[0]
+        lanes[queue_lane(queue)] += 1
+        cycle.rotate(queue)
+    return lanes
+
+
+def test_full_lanes_are_read_in_proportion_to_their_weight():
+    cycle = WeightedLaneCycle(
+        {lane_queue(INTERACTIVE), lane_queue(BULK), lane_queue(RETRY)}
+    )
+
+    assert reads(cycle, 110) == {INTERACTIVE: 80, BULK: 10, RETRY: 20}
+
+
+def test_bulk_shards_take_turns(monkeypatch):
+    monkeypatch.setattr(settings, "PAYMENT_BULK_SHARDS", 2)
+    shards = [f"{lane_queue(BULK)}-0", f"{lane_queue(BULK)}-1"]
+    cycle = WeightedLaneCycle(shards)
+
+    read = []
+    for _ in range(4):
+        queue = cycle.consume(2)[0]
+        read.append(queue)
+        cycle.rotate(queue)
+
+    assert read == [shards[0], shards[1], shards[0], shards[1]]
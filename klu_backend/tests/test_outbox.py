@@ -0,0 +1,113 @@
+"""
+Outbox de cargos: el relay publica cada fila una vez, el sweeper vuelve a
+publicar las que ningún worker tomó y falla las que ya no tienen tarjeta.
+"""
+import asyncio
+import json
+from datetime import timedelta
+
+from sqlalchemy import insert, select
+
+from app.core.config import settings
+from app.db.async_session import AsyncSessionLocal
+from app.db.redis import get_redis
+from app.models.payment_outbox import PaymentOutbox
+from app.models.transaction import TransactionStatus, utcnow
+from app.repositories.outbox_repository import OutboxRepository, outbox_values
+from app.services import outbox
+from app.tasks.lanes import BULK, INTERACTIVE, lane_queue
+from app.tasks.outbox_tasks import sweep_payment_outbox
+from app.tasks.payment_tasks import dead_letter_queue, transaction_repo
+
+
+def add_outbox_row(db, transaction_id, queue=None, **values) -> PaymentOutbox:
+    created_at = transaction_repo.get_transaction(db, transaction_id).created_at
+    row = {
+        **outbox_values(
+            transaction_id,
+            created_at,
+            queue or lane_queue(INTERACTIVE),
+            {"cardRef": "ref"},
+        ),
+        **values,
+    }
+    db.execute(insert(PaymentOutbox), row)
+    db.commit()
+
+
+def test_relay_publishes_each_row_once(db, make_transaction, published):
+    first, second = make_transaction(), make_transaction()
+    add_outbox_row(db, first)
+    add_outbox_row(db, second, queue=lane_queue(BULK))
+
+    assert outbox.relay_outbox(db, OutboxRepository(), limit=10) == 2
+    assert sorted(published) == sorted(
+        [(lane_queue(INTERACTIVE), str(first)), (lane_queue(BULK), str(second))]
+    )
+    assert outbox.relay_outbox(db, OutboxRepository(), limit=10) == 0
+
+
+def test_api_relay_publishes_pending_rows(db, make_transaction, published):
+    transaction_id = make_transaction()
+    add_outbox_row(db, transaction_id)
+    relay = outbox.OutboxRelay(AsyncSessionLocal)
+
+    assert asyncio.run(relay.relay_once()) == 1
+    assert published == [(lane_queue(INTERACTIVE), str(transaction_id))]
+    assert relay.get_stats()["published"] == 1
+
+
+def test_sweeper_republishes_lost_messages(db, make_transaction, published):
+    transaction_id = make_transaction()
+    lost_at = utcnow() - timedelta(seconds=settings.OUTBOX_REDELIVER_AFTER_SECONDS + 1)
+    add_outbox_row(db, transaction_id, published_at=lost_at, attempts=1)
+
+    result = sweep_payment_outbox()
+
+    assert result["rearmed"] == 1
+    assert published == [(lane_queue(INTERACTIVE), str(transaction_id))]
+
+
+def test_sweeper_waits_while_the_queue_has_messages(db, make_transaction, published):
+    transaction_id = make_transaction()
+    lost_at = utcnow() - timedelta(seconds=settings.OUTBOX_REDELIVER_AFTER_SECONDS + 1)
+    add_outbox_row(db, transaction_id, published_at=lost_at, attempts=1)
+    # El cargo sólo está atrasado detrás de otros mensajes
+    get_redis().lpush(lane_queue(INTERACTIVE), "message")
+
+    assert sweep_payment_outbox()["rearmed"] == 0
+    assert published == []
+
+
+def test_sweeper_fails_rows_whose_card_expired(db, make_transaction, published):
+    transaction_id = make_transaction()
+    expired_at = utcnow() - timedelta(seconds=settings.CARD_DATA_TTL_SECONDS + 1)
+    add_outbox_row(db, transaction_id, created_at=expired_at)
+
+    assert sweep_payment_outbox()["expired"] == 1
+
+    db.expire_all()
+    assert transaction_repo.get_transaction(db, transaction_id).status == (
+        TransactionStatus.FAILED
+    )
+    assert db.scalars(select(PaymentOutbox)).all() == []
+    ((_, entry),) = dead_letter_queue.peek(10)
+    assert entry["reason"] == "card_data_expired"
+    assert entry["transaction_id"] == str(transaction_id)
+    assert published == []
+
+
+def test_dead_letter_entries_are_redacted(make_transaction, db):
+    transaction_id = make_transaction()
+    payment_data = {
+        "amount": 100.0,
+        "noPresentCardData": {"cardNumber": "4111111111111111", "cvv": "123"},
+        "cardRef": "ref",
+    }
+
+    dead_letter_queue.push_sync(transaction_id, payment_data, "error", "boom", 1)
+
+    raw = get_redis().lrange(dead_letter_queue.key, 0, -1)[0]
+    assert b"4111111111111111" not in raw
+    assert b"123" not in json.dumps(json.loads(raw)["payment_data"]).encode()
+    assert json.loads(raw)["payment_data"]["cardRef"] == "ref"
@@ -0,0 +1,219 @@
+"""
+Tarea de cargos del worker: reintentos, cargos pospuestos y la llamada de
+prueba del circuit breaker. Blumonpay se reemplaza por respuestas fijas; las
+ejecuciones de Celery son eager (`apply`), los reintentos corren en línea.
+"""
+import asyncio
+from concurrent.futures import Future
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.db.redis import get_redis
+from app.models.transaction import TransactionStatus
+from app.services.blumonpay_service import BlumonpayAPIError
+from app.services.card_data import CardVault
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.concurrency_limiter import (
+    AdaptiveConcurrencyLimiter,
+    ConcurrencyLimitExceeded,
+)
+from app.tasks import dead_letter, payment_tasks
+
+APPROVED = {"success": True, "transaction_id": "bp-1", "message": "Approved"}
+
+
+@pytest.fixture(autouse=True)
+def circuit_breaker(monkeypatch):
+    # Los scripts se registraron en el Redis de otra prueba
+    monkeypatch.setattr(payment_tasks.circuit_breaker, "_allow_script", None)
+    monkeypatch.setattr(payment_tasks.circuit_breaker, "_record_script", None)
+
+
+@pytest.fixture
+def payment(db, make_transaction) -> tuple:
+    """(transaction_id, payment_data enmascarado) de un cargo por cobrar"""
+    (sealed,) = asyncio.run(
+        CardVault().seal_many(
+            [
+                {
+                    "amount": 100.0,
+                    "noPresentCardData": {
+                        "cardNumber": "4111111111111111",
+                        "cvv": "123",
+                    },
+                }
+            ]
+        )
+    )
+    return make_transaction(), sealed
+
+
+class Outcomes(list):
+    """Respuestas (o errores) de Blumonpay en orden; la última se repite"""
+
+    calls: list
+
+
+@pytest.fixture
+def gateway(monkeypatch) -> Outcomes:
+    outcomes = Outcomes()
+    calls = []
+
+    def process_payment_sync(payment_data):
+        calls.append(payment_data)
+        outcome = outcomes[min(len(calls), len(outcomes)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(
+        payment_tasks.blumonpay_service, "process_payment_sync", process_payment_sync
+    )
+    outcomes.calls = calls
+    return outcomes
+
+
+@pytest.fixture
+def limiter(monkeypatch) -> AdaptiveConcurrencyLimiter:
+    limiter = AdaptiveConcurrencyLimiter(
+        initial=1, minimum=1, maximum=1, latency_target=10
+    )
+    monkeypatch.setattr(payment_tasks, "charge_limiter", limiter)
+    monkeypatch.setattr(settings, "BLUMONPAY_CONCURRENCY_WAIT_SECONDS", 0.01)
+    return limiter
+
+
+def run(transaction_id, payment_data):
+    payment_tasks.process_payment.apply(args=(str(transaction_id), payment_data))
+
+
+def status(db, transaction_id) -> TransactionStatus:
+    db.expire_all()
+    return payment_tasks.transaction_repo.get_transaction(db, transaction_id).status
+
+
+def test_gateway_retries_do_not_count_as_deferrals(db, payment, gateway, monkeypatch):
+    monkeypatch.setattr(settings, "PAYMENT_MAX_RETRIES", 5)
+    monkeypatch.setattr(settings, "CHARGE_MAX_DEFERRALS", 2)
+    unavailable = BlumonpayAPIError("Service unavailable", 503, retryable=True)
+    gateway.extend(
+        [unavailable] * 3 + [CircuitOpenError("blumonpay", 1)] * 2 + [APPROVED]
+    )
+
+    run(*payment)
+
+    assert status(db, payment[0]) == TransactionStatus.COMPLETED
+    assert len(gateway.calls) == 6
+
+
+def test_deferrals_are_limited(db, payment, gateway, monkeypatch):
+    monkeypatch.setattr(settings, "CHARGE_MAX_DEFERRALS", 2)
+    gateway.append(CircuitOpenError("blumonpay", 1))
+
+    run(*payment)
+
+    assert status(db, payment[0]) == TransactionStatus.FAILED
+    assert len(gateway.calls) == 3
+    ((_, entry),) = payment_tasks.dead_letter_queue.peek(10)
+    assert entry["reason"] == "deferrals_exhausted"
+
+
+def set_circuit(state: str, until: int):
+    get_redis().hset(
+        payment_tasks.circuit_breaker.state_key,
+        mapping={"state": state, "until": until},
+    )
+
+
+def test_waiting_for_a_slot_does_not_spend_the_probe(gateway, limiter):
+    gateway.append(APPROVED)
+    # Abierto y vencido: la siguiente llamada es la prueba de half-open
+    set_circuit("open", 0)
+    limiter.acquire(timeout=0)
+
+    with pytest.raises(ConcurrencyLimitExceeded):
+        payment_tasks.charge({})
+    assert payment_tasks.circuit_breaker.get_state()["state"] == "open"
+
+    limiter.cancel()
+    assert payment_tasks.charge({}) == APPROVED
+    assert payment_tasks.circuit_breaker.get_state()["state"] == "closed"
+
+
+def test_open_circuit_returns_the_slot(gateway, limiter):
+    set_circuit("open", 2**62)
+
+    with pytest.raises(CircuitOpenError):
+        payment_tasks.charge({})
+
+    assert gateway.calls == []
+    assert limiter.get_stats()["in_flight"] == 0
+    assert limiter.get_stats()["decreases"] == 0
+
+
+@pytest.fixture
+def failing_status_writes(monkeypatch) -> set:
+    """Estados cuya escritura falla, en bloque y por separado"""
+    failing = set()
+    update_transaction_status = payment_tasks.transaction_repo.update_transaction_status
+
+    def submit(update):
+        future = Future()
+        future.set_exception(OperationalError("UPDATE", {}, Exception("down")))
+        return future
+
+    def update_status(db, transaction_id, status, **kwargs):
+        if status in failing:
+            raise OperationalError("UPDATE", {}, Exception("down"))
+        return update_transaction_status(db, transaction_id, status, **kwargs)
+
+    monkeypatch.setattr(payment_tasks.status_updates, "submit", submit)
+    monkeypatch.setattr(
+        payment_tasks.transaction_repo, "update_transaction_status", update_status
+    )
+    return failing
+
+
+def test_charged_payment_whose_status_is_lost_is_held(
+    db, payment, gateway, failing_status_writes
+):
+    gateway.append(APPROVED)
+    failing_status_writes.add(TransactionStatus.COMPLETED)
+
+    result = payment_tasks.process_payment.apply(args=(str(payment[0]), payment[1]))
+
+    assert result.successful()
+    transaction = payment_tasks.transaction_repo.get_transaction(db, payment[0])
+    assert transaction.status == TransactionStatus.UNRECONCILED
+    assert transaction.blumonpay_transaction_id == "bp-1"
+    ((_, entry),) = payment_tasks.dead_letter_queue.peek(10)
+    assert entry["reason"] == "status_update_failed"
+    assert "completed" in entry["error"]
+    assert "bp-1" in entry["error"]
+
+
+def test_charged_payments_are_never_replayed(
+    db, payment, gateway, failing_status_writes, monkeypatch
+):
+    gateway.append(APPROVED)
+    # Sin base de datos: ni siquiera se puede marcar como unreconciled
+    failing_status_writes.update(
+        {TransactionStatus.COMPLETED, TransactionStatus.UNRECONCILED}
+    )
+    monkeypatch.setattr(
+        dead_letter, "dispatch_payment_batch", lambda *args, **kwargs: None
+    )
+
+    assert payment_tasks.process_payment.apply(
+        args=(str(payment[0]), payment[1])
+    ).successful()
+    assert status(db, payment[0]) == TransactionStatus.PROCESSING
+
+    result = dead_letter.replay(limit=10, include_gateway_errors=True)
+
+    assert result["charged"] == [str(payment[0])]
+    assert result["replayed"] == 0
+    assert payment_tasks.dead_letter_queue.count() == 1
+    assert len(gateway.calls) == 1
@@ -0,0 +1,79 @@
+"""
+Token buckets del rate limiter (script Lua en Redis): cada petición descuenta
+de todas sus cubetas o de ninguna.
+"""
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.rate_limiter import (
+    Bucket,
+    RateLimitExceeded,
+    TokenBucketRateLimiter,
+    transaction_buckets,
+)
+
+
+@pytest.fixture
+def limiter(monkeypatch) -> TokenBucketRateLimiter:
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    return TokenBucketRateLimiter()
+
+
+def bucket(scope, capacity=2, cost=1) -> Bucket:
+    return Bucket(
+        scope=scope,
+        key=f"{scope}:test",
+        capacity=capacity,
+        refill_per_second=0.001,
+        cost=cost,
+    )
+
+
+def test_bucket_runs_out_of_tokens(limiter):
+    client = bucket("client")
+
+    asyncio.run(limiter.acquire([client]))
+    asyncio.run(limiter.acquire([client]))
+    with pytest.raises(RateLimitExceeded) as exc_info:
+        asyncio.run(limiter.acquire([client]))
+
+    assert exc_info.value.scope == "client"
+    assert exc_info.value.retry_after > 0
+    assert limiter.get_stats()["allowed"] == 2
+    assert limiter.get_stats()["limited_client"] == 1
+
+
+def test_limited_request_takes_no_tokens(limiter):
+    client = bucket("client", capacity=10)
+    customer = bucket("customer", capacity=1)
+
+    asyncio.run(limiter.acquire([client, customer]))
+    with pytest.raises(RateLimitExceeded) as exc_info:
+        asyncio.run(limiter.acquire([client, customer]))
+    assert exc_info.value.scope == "customer"
+
+    # La petición rechazada no descontó de la cubeta del cliente: quedan 9
+    asyncio.run(limiter.acquire([bucket("client", capacity=10, cost=9)]))
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(limiter.acquire([client]))
+
+
+def test_disabled_limiter_allows_everything(limiter, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+
+    for _ in range(5):
+        asyncio.run(limiter.acquire([bucket("client", capacity=1)]))
+
+
+def test_transaction_buckets_group_customer_emails():
+    client, customer = transaction_buckets(
+        "ip:127.0.0.1", ["Ana@Example.com", "ana@example.com "]
+    )
+
+    assert client.cost == 2
+    assert customer.scope == "customer"
+    assert customer.cost == 2
+    # Los emails no se guardan en claro en Redis
+    assert "example" not in customer.key
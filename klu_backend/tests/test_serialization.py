@@ -0,0 +1,70 @@
+"""
+La ruta rápida de lectura (orjson sobre tuplas de columnas) produce los
+mismos bytes que la serialización anterior con TransactionCreateResponse.
+"""
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.models.transaction import TransactionStatus
+from app.repositories.transaction_repository import TransactionRepository
+from app.schemas.serialization import (
+    TRANSACTION_RESPONSE_FIELDS,
+    dump_transaction,
+    dump_transaction_row,
+    dump_transaction_rows,
+)
+from app.schemas.transaction import TransactionCreateResponse
+
+repo = TransactionRepository()
+
+
+def test_single_transaction_matches_pydantic(db, make_transaction):
+    transaction = repo.get_transaction(
+        db, make_transaction(status=TransactionStatus.COMPLETED, amount=1234.5)
+    )
+    transaction.blumonpay_transaction_id = "bp-1"
+    transaction.card_brand = "VISA"
+
+    expected = TransactionCreateResponse.model_validate(transaction).model_dump_json()
+
+    assert dump_transaction(transaction) == expected.encode()
+
+
+def test_list_matches_pydantic(db, make_transaction):
+    transactions = [
+        repo.get_transaction(db, make_transaction(amount=amount))
+        for amount in (1.0, 99.99, 100000.0)
+    ]
+
+    models = [TransactionCreateResponse.model_validate(t) for t in transactions]
+    expected = JSONResponse(jsonable_encoder(models)).body
+
+    assert dump_transaction_rows(
+        [
+            [getattr(t, field) for field in TRANSACTION_RESPONSE_FIELDS]
+            for t in transactions
+        ]
+    ) == expected
+
+
+def test_row_keeps_the_time_zone():
+    created_at = datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+
+    body = dump_transaction_row(
+        [
+            10.0,
+            "MXN",
+            "ana@example.com",
+            "Ana López",
+            "0190e1f6-0000-7000-8000-000000000000",
+            TransactionStatus.PENDING,
+            None,
+            created_at,
+            None,
+            None,
+        ]
+    )
+
+    assert b'"created_at":"2026-01-02T03:04:05.678901+00:00"' in body
@@ -0,0 +1,171 @@
+"""
+Máquina de estados de las transacciones (UPDATE condicional con RETURNING),
+toma y reencolado con la outbox, y paginación keyset.
+"""
+import base64
+import json
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.models.payment_outbox import PaymentOutbox
+from app.models.transaction import (
+    ALLOWED_TRANSITIONS,
+    TransactionStatus,
+    source_statuses,
+    utcnow,
+)
+from app.repositories.outbox_repository import outbox_values
+from app.repositories.transaction_repository import (
+    InvalidCursorError,
+    TransactionRepository,
+    decode_cursor,
+    encode_cursor,
+)
+
+repo = TransactionRepository()
+
+
+def outbox_rows(db, transaction_id) -> list[PaymentOutbox]:
+    return list(
+        db.scalars(
+            select(PaymentOutbox).where(PaymentOutbox.transaction_id == transaction_id)
+        ).all()
+    )
+
+
+def test_final_statuses_have_no_transitions():
+    assert ALLOWED_TRANSITIONS[TransactionStatus.COMPLETED] == set()
+    assert ALLOWED_TRANSITIONS[TransactionStatus.DECLINED] == set()
+    assert source_statuses(TransactionStatus.COMPLETED) == {
+        TransactionStatus.PROCESSING,
+        TransactionStatus.UNRECONCILED,
+    }
+
+
+def test_status_update_follows_allowed_transitions(db, make_transaction):
+    transaction_id = make_transaction()
+
+    row = repo.update_transaction_status(
+        db, transaction_id, TransactionStatus.PROCESSING
+    )
+    assert row.status == TransactionStatus.PROCESSING
+
+    row = repo.update_transaction_status(
+        db, transaction_id, TransactionStatus.COMPLETED, blumonpay_transaction_id="bp-1"
+    )
+    assert row.status == TransactionStatus.COMPLETED
+    assert row.blumonpay_transaction_id == "bp-1"
+
+
+def test_status_update_cannot_leave_a_final_status(db, make_transaction):
+    transaction_id = make_transaction(status=TransactionStatus.COMPLETED)
+
+    assert repo.update_transaction_status(
+        db, transaction_id, TransactionStatus.FAILED
+    ) is None
+    transaction = repo.get_transaction(db, transaction_id)
+    assert transaction.status == TransactionStatus.COMPLETED
+
+
+def test_batched_status_updates_skip_disallowed_rows(db, make_transaction):
+    processing = make_transaction(status=TransactionStatus.PROCESSING)
+    declined = make_transaction(status=TransactionStatus.DECLINED)
+
+    updated = repo.update_transaction_statuses(
+        db,
+        [
+            {"transaction_id": processing, "status": TransactionStatus.COMPLETED},
+            {"transaction_id": declined, "status": TransactionStatus.COMPLETED},
+        ],
+    )
+
+    assert [row.id for row in updated] == [processing]
+    assert repo.get_transaction(db, declined).status == TransactionStatus.DECLINED
+
+
+def test_claim_takes_a_pending_transaction_once(db, make_transaction):
+    transaction_id = make_transaction()
+    created_at = repo.get_transaction(db, transaction_id).created_at
+    db.execute(
+        insert(PaymentOutbox),
+        outbox_values(transaction_id, created_at, "payments-interactive", {}),
+    )
+    db.commit()
+
+    assert repo.claim_transaction(db, transaction_id).status == (
+        TransactionStatus.PROCESSING
+    )
+    # El mensaje llegó: la fila de la outbox ya no se vuelve a publicar
+    assert outbox_rows(db, transaction_id) == []
+    # Una entrega repetida no toma la transacción otra vez
+    assert repo.claim_transaction(db, transaction_id) is None
+
+
+def test_requeue_returns_to_pending_with_an_outbox_row(db, make_transaction):
+    transaction_id = make_transaction(status=TransactionStatus.PROCESSING)
+    available_at = utcnow() + timedelta(seconds=30)
+
+    row = repo.requeue_transaction(
+        db, transaction_id, {"cardRef": "ref"}, "payments-retry", available_at
+    )
+
+    assert row.status == TransactionStatus.PENDING
+    (outbox,) = outbox_rows(db, transaction_id)
+    assert outbox.queue == "payments-retry"
+    assert outbox.payload == {"cardRef": "ref"}
+    # Ya publicada por la tarea: el relay no la repite, el sweeper sí si se pierde
+    assert outbox.published_at is not None
+    assert outbox.attempts == 1
+
+
+def test_requeue_does_not_touch_a_final_status(db, make_transaction):
+    transaction_id = make_transaction(status=TransactionStatus.COMPLETED)
+
+    assert repo.requeue_transaction(
+        db, transaction_id, {}, "payments-retry", utcnow()
+    ) is None
+    assert outbox_rows(db, transaction_id) == []
+
+
+def test_cursor_round_trip(make_transaction, db):
+    transaction = repo.get_transaction(db, make_transaction())
+
+    cursor = encode_cursor(transaction.created_at, transaction.id)
+
+    assert decode_cursor(cursor) == (transaction.created_at, transaction.id)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not-base64!",
+        base64.urlsafe_b64encode(b'["2026-01-01T00:00:00"]').decode(),
+        base64.urlsafe_b64encode(
+            json.dumps(["yesterday", "0" * 32]).encode()
+        ).decode(),
+    ],
+)
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+def test_pages_through_equal_created_at(db, make_transaction):
+    created_at = utcnow().replace(microsecond=0)
+    ids = {make_transaction(created_at=created_at) for _ in range(5)}
+    older = make_transaction(created_at=created_at - timedelta(seconds=1))
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = repo.list_transactions(db, limit=2, cursor=cursor)
+        seen.extend(transaction.id for transaction in page)
+        if cursor is None:
+            break
+
+    # Cada transacción una sola vez, aunque compartan created_at
+    assert len(seen) == 6
+    assert set(seen[:5]) == ids
+    assert seen[-1] == older
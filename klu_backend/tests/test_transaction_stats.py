@@ -0,0 +1,101 @@
+"""
+Rollup de transaction_stats: buckets por minuto y hora recalculados desde
+transactions, y minutos con datos inválidos aislados del resto del rango.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.exc import DataError
+
+from app.models.transaction import TransactionStatus
+from app.models.transaction_stats import TransactionStatsBucket
+from app.services.transaction_stats import MINUTE
+from app.tasks import stats_tasks
+from app.tasks.stats_tasks import contiguous_ranges, rebuild_range
+
+HOUR_START = datetime(2026, 3, 1, 10, tzinfo=timezone.utc)
+
+
+def buckets(db, granularity: str) -> dict[tuple, tuple]:
+    rows = db.scalars(
+        select(TransactionStatsBucket).where(
+            TransactionStatsBucket.granularity == granularity
+        )
+    )
+    return {
+        (
+            row.bucket_start.replace(tzinfo=timezone.utc),
+            row.currency,
+            row.status,
+        ): (row.count, row.amount_total)
+        for row in rows
+    }
+
+
+def add_transactions(make_transaction):
+    first, second = HOUR_START + 5 * MINUTE, HOUR_START + 6 * MINUTE
+    make_transaction(created_at=first + timedelta(seconds=1), amount=10.0)
+    make_transaction(created_at=first + timedelta(seconds=59), amount=15.0)
+    make_transaction(
+        created_at=second, amount=7.0, status=TransactionStatus.COMPLETED
+    )
+    make_transaction(created_at=second, amount=3.0, currency="USD")
+    return first, second
+
+
+def test_contiguous_ranges():
+    minutes = {HOUR_START, HOUR_START + MINUTE, HOUR_START + 5 * MINUTE}
+
+    assert contiguous_ranges(minutes) == [
+        (HOUR_START, HOUR_START + 2 * MINUTE),
+        (HOUR_START + 5 * MINUTE, HOUR_START + 6 * MINUTE),
+    ]
+
+
+def test_rebuild_minute_and_hour_buckets(db, make_transaction):
+    first, second = add_transactions(make_transaction)
+
+    assert rebuild_range(db, HOUR_START, HOUR_START + 10 * MINUTE) == []
+
+    assert buckets(db, "minute") == {
+        (first, "MXN", "pending"): (2, 25.0),
+        (second, "MXN", "completed"): (1, 7.0),
+        (second, "USD", "pending"): (1, 3.0),
+    }
+    assert buckets(db, "hour") == {
+        (HOUR_START, "MXN", "pending"): (2, 25.0),
+        (HOUR_START, "MXN", "completed"): (1, 7.0),
+        (HOUR_START, "USD", "pending"): (1, 3.0),
+    }
+
+
+def test_rebuild_replaces_stale_buckets(db, make_transaction):
+    first, _ = add_transactions(make_transaction)
+    rebuild_range(db, HOUR_START, HOUR_START + 10 * MINUTE)
+    make_transaction(created_at=first, amount=5.0)
+
+    rebuild_range(db, first, first + MINUTE)
+
+    assert buckets(db, "minute")[(first, "MXN", "pending")] == (3, 30.0)
+    assert buckets(db, "hour")[(HOUR_START, "MXN", "pending")] == (3, 30.0)
+
+
+def test_invalid_minute_is_skipped(db, make_transaction, monkeypatch):
+    first, second = add_transactions(make_transaction)
+    rebuild = stats_tasks.stats_repo.rebuild
+
+    def rebuild_rejecting_first(db, start, end):
+        # Como PostgreSQL con una moneda que no cabe en VARCHAR(8)
+        if start <= first < end:
+            raise DataError("INSERT", {}, Exception("value too long"))
+        rebuild(db, start, end)
+
+    monkeypatch.setattr(stats_tasks.stats_repo, "rebuild", rebuild_rejecting_first)
+
+    skipped = rebuild_range(db, HOUR_START + 4 * MINUTE, HOUR_START + 8 * MINUTE)
+
+    assert skipped == [first]
+    assert set(buckets(db, "minute")) == {
+        (second, "MXN", "completed"),
+        (second, "USD", "pending"),
+    }